@@ -0,0 +1,184 @@
+# accounts/authentication.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from health.metrics import CACHE_REQUESTS
+
+from .models import UserProfile
+
+# 登录时写进 token 的 claim（user_id 由 simplejwt 自己放）
+CLAIM_USERNAME = "username"
+CLAIM_USER_TYPE = "user_type"
+CLAIM_PROFILE_ID = "profile_id"
+CLAIM_TOKEN_VERSION = "tv"
+
+
+def _token_version_key(user_id):
+    return f"auth:tv:{user_id}"
+
+
+def token_version_cache_timeout():
+    """
+    tv 在 cache 里存多久（TOKEN_VERSION_CACHE_SECONDS）。
+    用 Redis 时改角色 / 停用后 cache_token_version 直接写新值，所有 worker 立即生效；
+    LocMem 下各 worker 各有一份，别的 worker 最多要这么久才看到新版本，期间旧 access token 还能用。
+    refresh 不走这个缓存，总是查库。
+    """
+    return getattr(settings, "TOKEN_VERSION_CACHE_SECONDS", 60)
+
+
+def get_token_version(user_id, use_cache=True):
+    """
+    当前 user 的 token_version，没有 profile 时返回 None。
+    use_cache=False 时直接查库（refresh 用）。
+    """
+    key = _token_version_key(user_id)
+    version = cache.get(key) if use_cache else None
+    if use_cache:
+        CACHE_REQUESTS.inc(cache="token_version", result="miss" if version is None else "hit")
+    if version is None:
+        version = (
+            UserProfile.objects
+            .filter(user_id=user_id)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+        if version is not None:
+            cache.set(key, version, timeout=token_version_cache_timeout())
+    return version
+
+
+def cache_token_version(user_id, version):
+    transaction.on_commit(
+        lambda: cache.set(_token_version_key(user_id), version, timeout=token_version_cache_timeout())
+    )
+
+
+# ===== /me =====
+
+ME_CACHE_TIMEOUT = 60
+
+
+def _me_key(user_id):
+    return f"auth:me:{user_id}"
+
+
+def get_me(user):
+    """
+    {"username", "user_type"}：token 带 claim 时直接用 claim，否则查一次后短暂缓存。
+    只读，不会建 profile。
+    """
+    if isinstance(user, ClaimsUser):
+        return {"username": user.username, "user_type": user.user_type}
+
+    key = _me_key(user.pk)
+    me = cache.get(key)
+    CACHE_REQUESTS.inc(cache="me", result="miss" if me is None else "hit")
+    if me is None:
+        user_type = (
+            UserProfile.objects
+            .filter(user_id=user.pk)
+            .values_list("user_type", flat=True)
+            .first()
+        )
+        me = {"username": user.username, "user_type": user_type or "customer"}
+        cache.set(key, me, timeout=ME_CACHE_TIMEOUT)
+    return me
+
+
+def invalidate_me(user_id):
+    transaction.on_commit(lambda: cache.delete(_me_key(user_id)))
+
+
+def add_user_claims(token, user):
+    """
+    把 username / user_type / profile_id / tv 写进 token。
+    没有 profile 的老账号不加，认证时走普通的查库路径。
+    """
+    token[CLAIM_USERNAME] = user.username
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        return token
+    token[CLAIM_USER_TYPE] = profile.user_type
+    token[CLAIM_PROFILE_ID] = profile.pk
+    token[CLAIM_TOKEN_VERSION] = profile.token_version
+    return token
+
+
+def check_token_version(token, use_cache=True):
+    """
+    token 里的 tv 跟当前版本对不上 → 已作废。
+    """
+    if CLAIM_TOKEN_VERSION not in token:
+        return
+    user_id = token[api_settings.USER_ID_CLAIM]
+    if get_token_version(user_id, use_cache=use_cache) != token[CLAIM_TOKEN_VERSION]:
+        raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    直接由 token claim 构造的 user。
+
+    id / pk / username / user_type / profile_id 不查库；
+    访问 profile 只查 UserProfile 一张表；
+    其它属性（或者拿去给 FK 赋值）才会真正 load User。
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        user_model = get_user_model()
+        # simplejwt 把 user_id 存成字符串，转回 model 字段的类型
+        user_id = user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(
+            token[api_settings.USER_ID_CLAIM]
+        )
+        super().__init__(lambda: user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+        # LazyObject 的 __setattr__ 会触发 load，所以直接写 __dict__
+        self.__dict__.update(
+            id=user_id,
+            pk=user_id,
+            username=token[CLAIM_USERNAME],
+            user_type=token[CLAIM_USER_TYPE],
+            profile_id=token[CLAIM_PROFILE_ID],
+            token=token,
+        )
+
+    def __bool__(self):
+        return True
+
+    @property
+    def profile(self):
+        if "_profile" not in self.__dict__:
+            self.__dict__["_profile"] = UserProfile.objects.get(pk=self.profile_id)
+        return self.__dict__["_profile"]
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    带齐 claim 的 token 不查 User；tv 通过缓存校验，角色变更/停用后旧 token 失效。
+    老 token（没有这些 claim）退回 JWTAuthentication 的查库逻辑。
+    """
+
+    def get_user(self, validated_token):
+        if not all(
+            claim in validated_token
+            for claim in (
+                api_settings.USER_ID_CLAIM,
+                CLAIM_USERNAME,
+                CLAIM_USER_TYPE,
+                CLAIM_PROFILE_ID,
+                CLAIM_TOKEN_VERSION,
+            )
+        ):
+            return super().get_user(validated_token)
+
+        check_token_version(validated_token)
+        return ClaimsUser(validated_token)
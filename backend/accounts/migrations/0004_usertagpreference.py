@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_userprofile_gender'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTagPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('cuisine', 'cuisine'), ('flavor', 'flavor'), ('nutrition', 'nutrition'), ('protein', 'protein'), ('spice', 'spice'), ('meal_type', 'meal_type'), ('allergen', 'allergen')], max_length=20)),
+                ('tag_id', models.PositiveIntegerField()),
+                ('score', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_prefs', to='accounts.userprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usertagpreference',
+            constraint=models.UniqueConstraint(fields=('profile', 'dimension', 'tag_id'), name='user_tag_pref_unique'),
+        ),
+    ]
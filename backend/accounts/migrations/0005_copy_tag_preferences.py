@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:51
+
+from django.db import migrations
+
+# dimension -> 旧的 through model
+OLD_PREF_MODELS = {
+    "cuisine": "UserCuisinePreference",
+    "flavor": "UserFlavorPreference",
+    "nutrition": "UserNutritionPreference",
+    "protein": "UserProteinPreference",
+    "spice": "UserSpicePreference",
+    "meal_type": "UserMealTypePreference",
+    "allergen": "UserAllergenPreference",
+}
+
+BATCH_SIZE = 1000
+
+
+def copy_forward(apps, schema_editor):
+    UserTagPreference = apps.get_model("accounts", "UserTagPreference")
+    for dim, model_name in OLD_PREF_MODELS.items():
+        old_model = apps.get_model("accounts", model_name)
+        rows = old_model.objects.values_list("profile_id", "tag_id", "score").iterator()
+        UserTagPreference.objects.bulk_create(
+            (
+                UserTagPreference(profile_id=profile_id, dimension=dim, tag_id=tag_id, score=score)
+                for profile_id, tag_id, score in rows
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def copy_backward(apps, schema_editor):
+    UserTagPreference = apps.get_model("accounts", "UserTagPreference")
+    for dim, model_name in OLD_PREF_MODELS.items():
+        old_model = apps.get_model("accounts", model_name)
+        rows = (
+            UserTagPreference.objects
+            .filter(dimension=dim)
+            .values_list("profile_id", "tag_id", "score")
+            .iterator()
+        )
+        old_model.objects.bulk_create(
+            (
+                old_model(profile_id=profile_id, tag_id=tag_id, score=score)
+                for profile_id, tag_id, score in rows
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_usertagpreference'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_forward, copy_backward),
+    ]
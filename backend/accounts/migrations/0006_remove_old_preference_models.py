@@ -0,0 +1,134 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_copy_tag_preferences'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_allergens',
+        ),
+        migrations.AlterUniqueTogether(
+            name='usercuisinepreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='usercuisinepreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='usercuisinepreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_cuisines',
+        ),
+        migrations.AlterUniqueTogether(
+            name='userflavorpreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='userflavorpreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='userflavorpreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_flavors',
+        ),
+        migrations.AlterUniqueTogether(
+            name='usermealtypepreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='usermealtypepreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='usermealtypepreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_meal_types',
+        ),
+        migrations.AlterUniqueTogether(
+            name='usernutritionpreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='usernutritionpreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='usernutritionpreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_nutritions',
+        ),
+        migrations.AlterUniqueTogether(
+            name='userproteinpreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='userproteinpreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='userproteinpreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_proteins',
+        ),
+        migrations.AlterUniqueTogether(
+            name='userspicepreference',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='userspicepreference',
+            name='profile',
+        ),
+        migrations.RemoveField(
+            model_name='userspicepreference',
+            name='tag',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='past_spice_levels',
+        ),
+        migrations.DeleteModel(
+            name='UserAllergenPreference',
+        ),
+        migrations.DeleteModel(
+            name='UserCuisinePreference',
+        ),
+        migrations.DeleteModel(
+            name='UserFlavorPreference',
+        ),
+        migrations.DeleteModel(
+            name='UserMealTypePreference',
+        ),
+        migrations.DeleteModel(
+            name='UserNutritionPreference',
+        ),
+        migrations.DeleteModel(
+            name='UserProteinPreference',
+        ),
+        migrations.DeleteModel(
+            name='UserSpicePreference',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:10
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # 以前 profile 是在 /me、/profile 里 get_or_create 的，这里给老账号一次性补齐
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    UserProfile = apps.get_model("accounts", "UserProfile")
+    missing = User.objects.filter(profile__isnull=True).values_list("id", flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id, user_type="customer") for user_id in missing],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_userprofile_token_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
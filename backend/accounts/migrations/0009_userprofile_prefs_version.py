@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_backfill_user_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='prefs_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
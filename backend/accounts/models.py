@@ -65,204 +65,72 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # ===== Preferences（全部 through，有 score，命名统一 past_xxx） =====
-
-    past_cuisines = models.ManyToManyField(
-        CuisineTag,
-        through="UserCuisinePreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_flavors = models.ManyToManyField(
-        FlavorTag,
-        through="UserFlavorPreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_nutritions = models.ManyToManyField(
-        NutritionTag,
-        through="UserNutritionPreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_proteins = models.ManyToManyField(
-        ProteinTag,
-        through="UserProteinPreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_spice_levels = models.ManyToManyField(
-        SpicinessTag,
-        through="UserSpicePreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_allergens = models.ManyToManyField(
-        AllergenTag,
-        through="UserAllergenPreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
-
-    past_meal_types = models.ManyToManyField(
-        MealTypeTag,
-        through="UserMealTypePreference",
-        related_name="past_by_profiles",
-        blank=True,
-    )
+    # JWT 里带的 tv claim，跟这里对不上的 token 直接作废（改角色 / 停用账号时 +1）
+    token_version = models.PositiveIntegerField(default=0)
+    # 偏好（UserTagPreference）每变一次 +1，拼 prefs summary 的缓存 key 和 profile 的 ETag
+    prefs_version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_user_type = instance.__dict__.get("user_type")
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_user_type", None)
+        if loaded is not None and loaded != self.user_type:
+            # 角色变了，旧 token 里的 user_type claim 不能再信
+            self.token_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+        self._loaded_user_type = self.user_type
 
     def __str__(self):
         return f"{self.user.username} ({self.user_type})"
 
 
+# ===== Preferences（一张表，dimension 区分 tag 种类，有 score） =====
 
-class UserCuisinePreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="cuisine_prefs",
-    )
-    tag = models.ForeignKey(
-        CuisineTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        unique_together = [("profile", "tag")]
-
-    def __str__(self):
-        return f"{self.profile.user.username} - cuisine:{self.tag.key} ({self.score})"
-
-
-class UserFlavorPreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="flavor_prefs",
-    )
-    tag = models.ForeignKey(
-        FlavorTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
+# dimension -> tag model
+PREF_TAG_MODELS = {
+    "cuisine": CuisineTag,
+    "flavor": FlavorTag,
+    "nutrition": NutritionTag,
+    "protein": ProteinTag,
+    "spice": SpicinessTag,
+    "meal_type": MealTypeTag,
+    "allergen": AllergenTag,
+}
 
-    class Meta:
-        unique_together = [("profile", "tag")]
 
-    def __str__(self):
-        return f"{self.profile.user.username} - flavor:{self.tag.key} ({self.score})"
+class UserTagPreference(models.Model):
+    """
+    用户对某个 tag 的历史偏好分数。
 
+    tag_id 指向 PREF_TAG_MODELS[dimension] 对应的 tag 表，
+    所以这里不用 ForeignKey；tag 删除时由 accounts.signals 清理。
+    """
+    DIMENSION_CHOICES = [(d, d) for d in PREF_TAG_MODELS]
 
-class UserNutritionPreference(models.Model):
     profile = models.ForeignKey(
         UserProfile,
         on_delete=models.CASCADE,
-        related_name="nutrition_prefs",
-    )
-    tag = models.ForeignKey(
-        NutritionTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        unique_together = [("profile", "tag")]
-
-    def __str__(self):
-        return f"{self.profile.user.username} - nutrition:{self.tag.key} ({self.score})"
-
-
-class UserProteinPreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="protein_prefs",
-    )
-    tag = models.ForeignKey(
-        ProteinTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        unique_together = [("profile", "tag")]
-
-    def __str__(self):
-        return f"{self.profile.user.username} - protein:{self.tag.key} ({self.score})"
-
-
-class UserSpicePreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="spice_prefs",
-    )
-    tag = models.ForeignKey(
-        SpicinessTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        unique_together = [("profile", "tag")]
-
-    def __str__(self):
-        return f"{self.profile.user.username} - spice:{self.tag.key} ({self.score})"
-
-
-class UserAllergenPreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="allergen_prefs",
-    )
-    tag = models.ForeignKey(
-        AllergenTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
-    )
-    score = models.IntegerField(default=0)
-    updated_at = models.DateTimeField(auto_now=True)
-
-    class Meta:
-        unique_together = [("profile", "tag")]
-
-    def __str__(self):
-        return f"{self.profile.user.username} - allergen:{self.tag.key} ({self.score})"
-
-
-class UserMealTypePreference(models.Model):
-    profile = models.ForeignKey(
-        UserProfile,
-        on_delete=models.CASCADE,
-        related_name="mealtype_prefs",
-    )
-    tag = models.ForeignKey(
-        MealTypeTag,
-        on_delete=models.CASCADE,
-        related_name="user_prefs",
+        related_name="tag_prefs",
     )
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    tag_id = models.PositiveIntegerField()
     score = models.IntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = [("profile", "tag")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "dimension", "tag_id"],
+                name="user_tag_pref_unique",
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.profile.user.username} - mealtype:{self.tag.key} ({self.score})"
\ No newline at end of file
+        return f"{self.profile.user.username} - {self.dimension}:{self.tag_id} ({self.score})"
@@ -1,7 +1,79 @@
 # accounts/permissions.py
 from rest_framework.permissions import BasePermission
 
+from .models import UserProfile
+
+# 历史上商家账号有 "merchant" / "owner" 两种写法，统一按商家处理
+MERCHANT_USER_TYPES = ("merchant", "owner")
+
+
+class AccountAccess:
+    """
+    当前请求用户的 profile / 角色 / 名下餐厅，一次查询取齐，挂在 request 上复用。
+    """
+
+    def __init__(self, profile_id, user_type, restaurant_ids):
+        self.profile_id = profile_id
+        self.user_type = user_type
+        self.restaurant_ids = restaurant_ids
+
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def is_customer(self):
+        return self.user_type == "customer"
+
+    @property
+    def is_merchant(self):
+        return self.user_type in MERCHANT_USER_TYPES
+
+    def owns(self, rest_id):
+        try:
+            return int(rest_id) in self.restaurant_ids
+        except (TypeError, ValueError):
+            return False
+
+
+def get_account_access(request):
+    access = getattr(request, "_account_access", None)
+    if access is not None:
+        return access
+
+    user = request.user
+    profile_id = user_type = None
+    restaurant_ids = set()
+    if user and user.is_authenticated:
+        rows = UserProfile.objects.filter(user_id=user.id).values_list(
+            "id",
+            "user_type",
+            "user__owned_restaurants__id",
+        )
+        for profile_id, user_type, rest_id in rows:
+            if rest_id is not None:
+                restaurant_ids.add(rest_id)
+
+    access = AccountAccess(profile_id, user_type, frozenset(restaurant_ids))
+    request._account_access = access
+    return access
+
+
 class IsCustomerUser(BasePermission):
     def has_permission(self, request, view):
         u = request.user
-        return bool(u and u.is_authenticated and hasattr(u, "profile") and u.profile.user_type == "customer")
+        return bool(u and u.is_authenticated and get_account_access(request).is_customer)
+
+
+class IsMerchantUser(BasePermission):
+    message = "Only merchant users can access this resource."
+
+    def has_permission(self, request, view):
+        u = request.user
+        if not (u and u.is_authenticated):
+            return False
+        access = get_account_access(request)
+        if not access.has_profile:
+            self.message = "Profile not found."
+            return False
+        return access.is_merchant
@@ -0,0 +1,138 @@
+# accounts/preferences.py
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from health.metrics import CACHE_REQUESTS, PREFERENCE_UPDATES
+from restaurants.tags import get_tag_registry
+
+from .models import PREF_TAG_MODELS, UserProfile, UserTagPreference
+
+PREFS_CACHE_TIMEOUT = 60 * 10
+
+
+def load_pref_rows(profile, positive_only=False):
+    """
+    一次查询取出 profile 的全部偏好（走 (profile, dimension, tag_id) 索引），
+    label 从进程内的 tag registry 里取，不再查 tag 表。
+
+    返回 {dimension: [{"id", "label", "score"}, ...]}，每个维度按 score 降序、label 升序。
+    已被删除的 tag 会被跳过。
+    """
+    qs = UserTagPreference.objects.filter(profile=profile)
+    if positive_only:
+        qs = qs.filter(score__gt=0)
+
+    registry = get_tag_registry()
+    out = {dim: [] for dim in PREF_TAG_MODELS}
+    for dim, tag_id, score in qs.values_list("dimension", "tag_id", "score"):
+        label = registry.for_model(PREF_TAG_MODELS[dim]).label(tag_id)
+        if label is None:
+            continue
+        out[dim].append({"id": tag_id, "label": label, "score": score})
+
+    for rows in out.values():
+        rows.sort(key=lambda r: (-r["score"], r["label"]))
+    return out
+
+
+# ===== per-profile 缓存 =====
+
+def prefs_version(profile):
+    """
+    当前 profile 偏好的版本号，用来拼缓存 key 和 ETag。
+    两部分都在库里（各 worker 一致）：profile.prefs_version（偏好变动时 +1），
+    tag registry 的版本（tag label 改了 / 删了时 +1）。
+    """
+    return f"{profile.prefs_version}.{get_tag_registry().version}"
+
+
+def bump_prefs_version(profile):
+    """
+    偏好改动后调用（一条 UPDATE，跟着当前事务）。内存里的 profile 同步 +1。
+    """
+    UserProfile.objects.filter(pk=profile.pk).update(prefs_version=F("prefs_version") + 1)
+    profile.prefs_version += 1
+
+
+def get_pref_summary(profile):
+    """
+    profile 页用的 “score > 0” 偏好，按 version 缓存。
+    """
+    key = f"prefs:summary:{profile.pk}:{prefs_version(profile)}"
+    summary = cache.get(key)
+    CACHE_REQUESTS.inc(cache="pref_summary", result="miss" if summary is None else "hit")
+    if summary is None:
+        summary = load_pref_rows(profile, positive_only=True)
+        cache.set(key, summary, timeout=PREFS_CACHE_TIMEOUT)
+    return summary
+
+
+def profile_etag(profile):
+    raw = f"{profile.pk}:{profile.user_type}:{profile.updated_at.isoformat()}:{prefs_version(profile)}"
+    return '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+
+
+def add_pref_scores(profile, deltas):
+    """
+    deltas: {(dimension, tag_id): delta}
+
+    先 bulk insert 不存在的行（score=0），再按 delta 分组做 score = score + delta，
+    不管涉及多少 tag，都是 1 + len(set(deltas.values())) 条语句。
+    """
+    if not deltas:
+        return
+
+    UserTagPreference.objects.bulk_create(
+        [
+            UserTagPreference(profile=profile, dimension=dim, tag_id=tag_id, score=0)
+            for dim, tag_id in deltas
+        ],
+        ignore_conflicts=True,
+    )
+
+    keys_by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        keys_by_delta[delta].append(key)
+
+    for delta, keys in keys_by_delta.items():
+        UserTagPreference.objects.filter(
+            pref_keys_q(keys),
+            profile=profile,
+        ).update(score=F("score") + delta)
+
+    PREFERENCE_UPDATES.inc(len(deltas), op="score")
+    bump_prefs_version(profile)
+
+
+def mute_prefs(profile, ids_by_dim):
+    """
+    ids_by_dim: {dimension: [tag_id, ...]}，把这些 tag 的 score 置 0（一条 UPDATE）。
+    """
+    keys = [(dim, tag_id) for dim, ids in ids_by_dim.items() for tag_id in ids]
+    if not keys:
+        return 0
+    updated = UserTagPreference.objects.filter(
+        pref_keys_q(keys),
+        profile=profile,
+    ).update(score=0)
+    if updated:
+        PREFERENCE_UPDATES.inc(updated, op="mute")
+        bump_prefs_version(profile)
+    return updated
+
+
+def pref_keys_q(keys):
+    """
+    [(dimension, tag_id), ...] -> Q(dimension=.., tag_id__in=[..]) | ...
+    """
+    ids_by_dim = defaultdict(set)
+    for dim, tag_id in keys:
+        ids_by_dim[dim].add(tag_id)
+
+    q = Q()
+    for dim, ids in ids_by_dim.items():
+        q |= Q(dimension=dim, tag_id__in=sorted(ids))
+    return q
@@ -1,17 +1,32 @@
 # accounts/serializers.py
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import add_user_claims, check_token_version
 from .models import UserProfile
-from .models import (
-    UserProfile,
-    UserCuisinePreference,
-    UserFlavorPreference,
-    UserNutritionPreference,
-    UserProteinPreference,
-    UserSpicePreference,
-    UserMealTypePreference,
-    UserAllergenPreference,
-)
+from .preferences import get_pref_summary, mute_prefs
+
+# serializer 字段名 -> UserTagPreference.dimension
+PREFS_OUTPUT_KEYS = {
+    "cuisines": "cuisine",
+    "flavors": "flavor",
+    "nutritions": "nutrition",
+    "proteins": "protein",
+    "spices": "spice",
+    "meal_types": "meal_type",
+    "allergens": "allergen",
+}
+MUTED_FIELDS = {
+    "muted_cuisine_ids": "cuisine",
+    "muted_flavor_ids": "flavor",
+    "muted_nutrition_ids": "nutrition",
+    "muted_protein_ids": "protein",
+    "muted_spice_ids": "spice",
+    "muted_meal_type_ids": "meal_type",
+    "muted_allergen_ids": "allergen",
+}
 
 class CustomerRegisterSerializer(serializers.Serializer):
     username = serializers.CharField()
@@ -22,15 +37,9 @@ class CustomerRegisterSerializer(serializers.Serializer):
         password = validated["password"]
         if User.objects.filter(username=username).exists():
             raise serializers.ValidationError("Username already exists.")
-        user = User.objects.create_user(username=username, password=password)
-        # 强制 customer
-        if not hasattr(user, "profile"):
-            UserProfile.objects.create(user=user, user_type="customer")
-        else:
-            user.profile.user_type = "customer"
-            user.profile.save()
-        return user
-    
+        # profile 由 accounts.signals 在建 user 时创建，默认就是 customer
+        return User.objects.create_user(username=username, password=password)
+
 class MerchantRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -39,13 +48,38 @@ class MerchantRegisterSerializer(serializers.ModelSerializer):
         fields = ["username", "password"]
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            password=validated_data["password"],
-        )
-        UserProfile.objects.create(user=user, user_type="owner")
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data["username"],
+                password=validated_data["password"],
+            )
+            # signal 已经建好了 customer profile，这里改成商家
+            profile = user.profile
+            profile.user_type = "owner"
+            profile.save(update_fields=["user_type", "updated_at"])
         return user
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    登录：token 里带上 username / user_type / profile_id / tv，认证时不用再查 User。
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    refresh：tv 已经过期的 refresh token 不再换新的 access token。
+    这里直接查库（不用 cache 里的 tv），别的 worker 改了角色 / 停用了账号也立即拒绝。
+    """
+
+    def validate(self, attrs):
+        check_token_version(RefreshToken(attrs["refresh"]), use_cache=False)
+        return super().validate(attrs)
+
+
 class MeSerializer(serializers.Serializer):
     username = serializers.CharField()
     user_type = serializers.CharField()
@@ -121,62 +155,27 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def get_prefs(self, obj: UserProfile):
         """
         返回用户“目前喜欢的 tag”（score > 0），前端只显示这些。
+        走 per-profile 缓存，偏好或 mute 变动后失效。
         """
-        def build(through_model):
-            qs = (
-                through_model.objects
-                .filter(profile=obj, score__gt=0)
-                .select_related("tag")
-                .order_by("-score", "tag__label")
-            )
-            return [
-                {
-                    "id": r.tag.id,
-                    "label": r.tag.label,
-                    "score": r.score,
-                }
-                for r in qs
-            ]
-
-        return {
-            "cuisines": build(UserCuisinePreference),
-            "flavors": build(UserFlavorPreference),
-            "nutritions": build(UserNutritionPreference),
-            "proteins": build(UserProteinPreference),
-            "spices": build(UserSpicePreference),
-            "meal_types": build(UserMealTypePreference),
-            "allergens": build(UserAllergenPreference),
-        }
+        rows = get_pref_summary(obj)
+        return {key: rows[dim] for key, dim in PREFS_OUTPUT_KEYS.items()}
 
     def update(self, instance: UserProfile, validated_data):
         # 先处理基本字段
-        for field in [
-            "height_cm",
-            "weight_kg",
-            "age",
-            "gender",
-            "activity_level",
-            "memo",
-        ]:
-            if field in validated_data:
-                setattr(instance, field, validated_data[field])
-        instance.save()
+        fields = [
+            field
+            for field in ["height_cm", "weight_kg", "age", "gender", "activity_level", "memo"]
+            if field in validated_data
+        ]
+        for field in fields:
+            setattr(instance, field, validated_data[field])
+        # 只写这几列：prefs_version 是别的请求用 F() 加的，整行写回会把它改回旧值
+        instance.save(update_fields=[*fields, "updated_at"])
 
         # 再处理“被点灰”的 tag，把他们的 score 置 0
-        def mute(field_name, model_cls):
-            ids = validated_data.pop(field_name, [])
-            if ids:
-                model_cls.objects.filter(
-                    profile=instance,
-                    tag_id__in=ids,
-                ).update(score=0)
-
-        mute("muted_cuisine_ids", UserCuisinePreference)
-        mute("muted_flavor_ids", UserFlavorPreference)
-        mute("muted_nutrition_ids", UserNutritionPreference)
-        mute("muted_protein_ids", UserProteinPreference)
-        mute("muted_spice_ids", UserSpicePreference)
-        mute("muted_meal_type_ids", UserMealTypePreference)
-        mute("muted_allergen_ids", UserAllergenPreference)
-
-        return instance
\ No newline at end of file
+        mute_prefs(
+            instance,
+            {dim: validated_data.pop(field, []) for field, dim in MUTED_FIELDS.items()},
+        )
+
+        return instance
@@ -0,0 +1,54 @@
+# accounts/signals.py
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from .authentication import cache_token_version, invalidate_me
+from .models import PREF_TAG_MODELS, UserProfile, UserTagPreference
+
+
+def _make_tag_cleanup(dimension):
+    def cleanup(sender, instance, **kwargs):
+        # UserTagPreference.tag_id 不是 FK，tag 删掉后手动清掉对应偏好
+        # summary 缓存跟着 tag registry 的版本走（restaurants.signals 里 +1），不用另外失效
+        UserTagPreference.objects.filter(dimension=dimension, tag_id=instance.pk).delete()
+    return cleanup
+
+
+def _profile_saved(sender, instance, **kwargs):
+    cache_token_version(instance.user_id, instance.token_version)
+    invalidate_me(instance.user_id)
+
+
+def _user_saved(sender, instance, created, **kwargs):
+    if created:
+        # 建 user 时就把 profile 建好，读接口不用再 get_or_create
+        UserProfile.objects.get_or_create(user=instance, defaults={"user_type": "customer"})
+        return
+
+    invalidate_me(instance.pk)
+    # 账号被停用：作废已经发出去的 token
+    if instance.is_active:
+        return
+    UserProfile.objects.filter(user_id=instance.pk).update(token_version=F("token_version") + 1)
+    version = (
+        UserProfile.objects
+        .filter(user_id=instance.pk)
+        .values_list("token_version", flat=True)
+        .first()
+    )
+    if version is not None:
+        cache_token_version(instance.pk, version)
+
+
+def connect_signals():
+    post_save.connect(_profile_saved, sender=UserProfile, dispatch_uid="accounts.profile_token_version")
+    post_save.connect(_user_saved, sender=User, dispatch_uid="accounts.user_token_version")
+
+    for dim, tag_model in PREF_TAG_MODELS.items():
+        post_delete.connect(
+            _make_tag_cleanup(dim),
+            sender=tag_model,
+            weak=False,
+            dispatch_uid=f"accounts.tag_pref_cleanup.{dim}",
+        )
@@ -1,3 +1,282 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from benchmarks.budgets import QueryBudgetMixin
+from restaurants.models import CuisineTag, FlavorTag, Item, Restaurant, SpicinessTag
+from restaurants.tags import get_tag_registry
+
+from .models import UserProfile
+from .permissions import IsMerchantUser, get_account_access
+from .preferences import add_pref_scores
+from .serializers import ClaimsTokenObtainPairSerializer
+
+# 预算对应的数据规模：每个偏好维度 PREFS_PER_DIMENSION 条偏好
+PREFS_PER_DIMENSION = 6
+
+
+class AccountQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    先打一次热身请求再量（量的是稳态：me / prefs 缓存、tag registry 已就绪），
+    写接口每次换一份 body，避免第二次请求什么都没改。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = {
+            "cuisine": [CuisineTag.objects.create(key=f"c{n}", label=f"Cuisine {n}") for n in range(PREFS_PER_DIMENSION)],
+            "flavor": [FlavorTag.objects.create(key=f"f{n}", label=f"Flavor {n}") for n in range(PREFS_PER_DIMENSION)],
+            "spice": [SpicinessTag.objects.create(key=f"s{n}", label=f"Spice {n}") for n in range(PREFS_PER_DIMENSION)],
+        }
+        cls.user = User.objects.create_user("budget-user", password="x")
+        add_pref_scores(
+            cls.user.profile,
+            {(dim, tag.pk): n + 1 for dim, tags in cls.tags.items() for n, tag in enumerate(tags)},
+        )
+
+    def setUp(self):
+        cache.clear()
+        get_tag_registry(force=True)
+        self.api = APIClient()
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def measure(self, view, method, request):
+        request()
+        with self.assertQueryBudget(view, method):
+            return request()
+
+    def test_register_customer(self):
+        names = iter(["budget-new-1", "budget-new-2"])
+        r = self.measure(
+            "register_customer", "POST",
+            lambda: self.client.post(
+                "/api/auth/register/", {"username": next(names), "password": "secret-123"},
+                content_type="application/json",
+            ),
+        )
+        self.assertEqual(r.status_code, 201)
+
+    def test_register_merchant(self):
+        names = iter(["budget-owner-1", "budget-owner-2"])
+        r = self.measure(
+            "register_merchant", "POST",
+            lambda: self.client.post(
+                "/api/auth/merchant/register/", {"username": next(names), "password": "secret-123"},
+                content_type="application/json",
+            ),
+        )
+        self.assertEqual(r.status_code, 201)
+
+    def test_me(self):
+        r = self.measure("me", "GET", lambda: self.api.get("/api/auth/me/?include=profile,tags"))
+        self.assertEqual(r.json()["username"], "budget-user")
+
+    def test_profile_get(self):
+        r = self.measure("profile_detail", "GET", lambda: self.api.get("/api/auth/profile/"))
+        self.assertEqual(r.status_code, 200)
+
+    def test_profile_put(self):
+        bodies = iter([
+            {"age": 30, "muted_flavor_ids": [self.tags["flavor"][0].pk]},
+            {"age": 31, "memo": "less salt", "muted_cuisine_ids": [t.pk for t in self.tags["cuisine"][:3]]},
+        ])
+        r = self.measure("profile_detail", "PUT", lambda: self.api.put("/api/auth/profile/", next(bodies), format="json"))
+        self.assertEqual(r.status_code, 200)
+
+
+class ProfileETagTests(TestCase):
+    """
+    profile 的 ETag：偏好版本在库里，别的 worker 改了偏好（本 worker 的 cache 里还是旧 summary）也要换 ETag。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = CuisineTag.objects.create(key="etag", label="ETag")
+        cls.user = User.objects.create_user("etag-user", password="x")
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.api.get("/api/auth/profile/", **headers)
+
+    def test_not_modified(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(etag).status_code, 304)
+        self.assertEqual(self.get(f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.get('"other"').status_code, 200)
+
+    def test_pref_change_from_other_worker(self):
+        first = self.get()
+        add_pref_scores(self.user.profile, {("cuisine", self.tag.pk): 3})
+        r = self.get(first["ETag"])
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], first["ETag"])
+        self.assertEqual([row["id"] for row in r.json()["prefs"]["cuisines"]], [self.tag.pk])
+
+    @override_settings(CORS_ALLOWED_ORIGINS=["http://localhost:5173"])
+    def test_cross_origin_revalidation(self):
+        # 前端跨域：预检要放行 If-None-Match，响应里的 ETag 要能被 JS 读到
+        preflight = self.client.options(
+            "/api/auth/profile/",
+            HTTP_ORIGIN="http://localhost:5173",
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD="GET",
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS="authorization,if-none-match",
+        )
+        self.assertIn("if-none-match", preflight["Access-Control-Allow-Headers"])
+        r = self.api.get("/api/auth/profile/", HTTP_ORIGIN="http://localhost:5173")
+        self.assertEqual(r["Access-Control-Expose-Headers"], "ETag")
+
+
+class TokenRevocationTests(TestCase):
+    """
+    改角色 / 停用账号之后，旧的 access token 和 refresh token 都不能再用。
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("revoke-user", password="x")
+        self.refresh = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+        # 先打一次，tv 进 cache
+        self.assertEqual(self.api.get("/api/auth/me/").status_code, 200)
+
+    def do_refresh(self):
+        return self.client.post("/api/auth/refresh/", {"refresh": str(self.refresh)}, content_type="application/json")
+
+    def assertRevoked(self):
+        self.assertEqual(self.api.get("/api/auth/me/").status_code, 401)
+        self.assertEqual(self.do_refresh().status_code, 401)
+
+    def test_user_type_changed(self):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.user_type = "owner"
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertRevoked()
+
+    def test_deactivated(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertRevoked()
+
+    def test_refresh_checks_db(self):
+        # 别的 worker 改的：本 worker cache 里还是旧 tv，refresh 也要拒绝
+        profile = UserProfile.objects.get(user=self.user)
+        profile.user_type = "owner"
+        profile.save()
+        self.assertEqual(self.do_refresh().status_code, 401)
+
+
+class MerchantPermissionTests(TestCase):
+    """
+    商家接口的权限：顾客一律 403，商家碰别人的餐厅 / 菜一律 404，
+    AccountAccess 一个请求只查一次库。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user("perm-customer", password="x")
+        cls.merchant = User.objects.create_user("perm-merchant", password="x")
+        cls.other = User.objects.create_user("perm-other", password="x")
+        UserProfile.objects.filter(user__in=[cls.merchant, cls.other]).update(user_type="merchant")
+        cls.own_rest = Restaurant.objects.create(
+            owner=cls.merchant, name="Mine", google_place_id="perm-mine", latitude=0, longitude=0
+        )
+        cls.other_rest = Restaurant.objects.create(
+            owner=cls.other, name="Theirs", google_place_id="perm-theirs", latitude=0, longitude=0
+        )
+        cls.own_item = Item.objects.create(restaurant=cls.own_rest, name="Mine", price="5.00")
+        cls.other_item = Item.objects.create(restaurant=cls.other_rest, name="Theirs", price="5.00")
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}")
+        return api
+
+    def test_customer_forbidden(self):
+        api = self.client_for(self.customer)
+        rest, item = self.own_rest.id, self.own_item.id
+        requests = [
+            ("get", "/api/merchant/restaurants/my/"),
+            ("get", "/api/merchant/tags/"),
+            ("get", f"/api/merchant/items/{item}/"),
+            ("put", f"/api/merchant/items/{item}/"),
+            ("get", f"/api/merchant/restaurants/{rest}/items/"),
+            ("post", f"/api/merchant/restaurants/{rest}/items/"),
+            ("post", f"/api/merchant/restaurants/{rest}/items:bulk"),
+            ("post", f"/api/merchant/restaurants/{rest}/items:batch"),
+        ]
+        for method, url in requests:
+            with self.subTest(method=method, url=url):
+                r = getattr(api, method)(url, {}, format="json")
+                self.assertEqual(r.status_code, 403)
+                self.assertEqual(r.json()["detail"], "Only merchant users can access this resource.")
+
+    def test_missing_profile_forbidden(self):
+        # 没 profile 的 token 在认证那一步就 401 了，这里直接量权限类
+        UserProfile.objects.filter(user=self.merchant).delete()
+        request = APIRequestFactory().get("/")
+        request.user = self.merchant
+        perm = IsMerchantUser()
+        self.assertFalse(perm.has_permission(request, None))
+        self.assertEqual(perm.message, "Profile not found.")
+
+    def test_other_merchant_not_found(self):
+        api = self.client_for(self.merchant)
+        rest = self.other_rest.id
+        for method, url in [
+            ("get", f"/api/merchant/restaurants/{rest}/items/"),
+            ("post", f"/api/merchant/restaurants/{rest}/items/"),
+            ("post", f"/api/merchant/restaurants/{rest}/items:bulk"),
+            ("post", f"/api/merchant/restaurants/{rest}/items:batch"),
+            ("get", "/api/merchant/restaurants/abc/items/"),
+        ]:
+            with self.subTest(method=method, url=url):
+                r = getattr(api, method)(url, {}, format="json")
+                self.assertEqual(r.status_code, 404)
+                self.assertEqual(r.json()["detail"], "Restaurant not found or not owned by you.")
+
+        for method in ("get", "put"):
+            with self.subTest(method=method):
+                r = getattr(api, method)(f"/api/merchant/items/{self.other_item.id}/", {"name": "x"}, format="json")
+                self.assertEqual(r.status_code, 404)
+        self.other_item.refresh_from_db()
+        self.assertEqual(self.other_item.name, "Theirs")
+
+        mine = api.get("/api/merchant/restaurants/my/").json()["restaurants"]
+        self.assertEqual([r["id"] for r in mine], [self.own_rest.id])
+
+    def test_access_memoized_per_request(self):
+        request = APIRequestFactory().get("/")
+        request.user = self.merchant
+        with self.assertNumQueries(1):
+            access = get_account_access(request)
+            self.assertIs(get_account_access(request), access)
+        self.assertTrue(access.is_merchant)
+        self.assertTrue(access.owns(self.own_rest.id))
+        self.assertTrue(access.owns(str(self.own_rest.id)))
+        self.assertFalse(access.owns(self.other_rest.id))
+        self.assertFalse(access.owns("abc"))
+
+        # 走完整个请求：权限类和视图共用一次 profile 查询
+        api = self.client_for(self.merchant)
+        api.get(f"/api/merchant/restaurants/{self.own_rest.id}/items/")
+        with CaptureQueriesContext(connection) as ctx:
+            r = api.get(f"/api/merchant/restaurants/{self.own_rest.id}/items/")
+        self.assertEqual(r.status_code, 200)
+        profile_queries = [q["sql"] for q in ctx.captured_queries if "accounts_userprofile" in q["sql"]]
+        self.assertEqual(len(profile_queries), 1, profile_queries)
@@ -1,14 +1,20 @@
 # accounts/views.py
+from django.utils.http import parse_etags
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import CustomerRegisterSerializer, UserProfileSerializer, MeSerializer, MerchantRegisterSerializer
 from .models import UserProfile
-from django.contrib.auth.models import User
+from .authentication import get_me
+from .preferences import profile_etag
+from restaurants.tags import build_tag_catalog
+from benchmarks.budgets import query_budget
+from server.db_router import replica_reads
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@query_budget(POST=6)
 def register_customer(request):
     s = CustomerRegisterSerializer(data=request.data)
     s.is_valid(raise_exception=True)
@@ -17,6 +23,7 @@ def register_customer(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@query_budget(POST=9)
 def register_merchant(request):
     s = MerchantRegisterSerializer(data=request.data)
     s.is_valid(raise_exception=True)
@@ -26,39 +33,69 @@ def register_merchant(request):
         status=status.HTTP_201_CREATED,
     )
 
+ME_INCLUDE_OPTIONS = ("profile", "tags")
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@query_budget(GET=2, shape="include=profile,tags")
+@replica_reads()
 def me(request):
-    user: User = request.user
-    profile, _ = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={"user_type": "customer"},
-    )
-    data = {"username": user.username, "user_type": profile.user_type}
-    s = MeSerializer(data)
-    return Response(s.data)
+    """
+    GET /api/auth/me/                       -> {username, user_type}
+    GET /api/auth/me/?include=profile,tags  -> 额外带上 profile（同 /api/auth/profile/）和 tag 目录，
+                                               前端启动时一个请求拿齐
+    """
+    include = {x for x in request.query_params.get("include", "").split(",") if x}
+    unknown = include - set(ME_INCLUDE_OPTIONS)
+    if unknown:
+        return Response(
+            {"detail": f"Unknown include: {', '.join(sorted(unknown))}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    data = MeSerializer(get_me(request.user)).data
+
+    if "profile" in include:
+        try:
+            profile = request.user.profile
+        except UserProfile.DoesNotExist:
+            data["profile"] = None
+        else:
+            data["profile"] = UserProfileSerializer(profile).data
+
+    if "tags" in include:
+        data["tags"] = build_tag_catalog()
+
+    return Response(data)
 
 
 @api_view(["GET", "PUT"])
 @permission_classes([IsAuthenticated])
+@query_budget(GET=2, PUT=6, shape="6 preferences in 3 dimensions; PUT mutes 1-3 tags")
+@replica_reads("GET")
 def profile_detail(request):
     """
-    GET  返回当前用户的完整 profile 信息
+    GET  返回当前用户的完整 profile 信息（带 ETag，没变化时返回 304）
     PUT  更新 height/weight/age/gender/activity_level/memo
     """
-    user: User = request.user
-    profile, _ = UserProfile.objects.get_or_create(
-        user=user,
-        defaults={"user_type": "customer"},
-    )
+    try:
+        profile = request.user.profile
+    except UserProfile.DoesNotExist:
+        return Response({"detail": "Profile not found."}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
+        etag = profile_etag(profile)
+        # If-None-Match 用弱比较：压缩中间件会把 ETag 改成 W/"..."，客户端原样带回来
+        if_none_match = [tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))]
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
         s = UserProfileSerializer(profile)
-        return Response(s.data)
+        return Response(s.data, headers={"ETag": etag})
 
     # PUT
     s = UserProfileSerializer(profile, data=request.data, partial=True)
     if s.is_valid():
         s.save()
-        return Response(s.data)
+        return Response(s.data, headers={"ETag": profile_etag(profile)})
     return Response(s.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
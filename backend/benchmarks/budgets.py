@@ -0,0 +1,123 @@
+# benchmarks/budgets.py
+"""
+每个 view 的 SQL 条数预算。
+
+在 view 上声明：
+
+    @api_view(["GET", "PUT"])
+    @permission_classes([IsAuthenticated])
+    @query_budget(GET=3, PUT=6, shape="item with tags in every dimension")
+    def merchant_item_detail(request, item_id): ...
+
+query_budget 只往 QUERY_BUDGETS 里登记，原样返回 view，运行时没有开销。
+shape 说明预算对应的数据规模；预算应该和数据量无关（同一个请求多几行数据
+不该多几条 SQL），测试按 shape 造数据去打 endpoint，超了就 fail。
+
+测试里：
+
+    class OrderBudgetTests(QueryBudgetMixin, TestCase):
+        def test_create_order(self):
+            with self.assertQueryBudget("create_order", "POST"):
+                self.client.post(...)
+
+跑测试时设置 QUERY_BUDGET_REPORT=<path>，实测条数会写进这个 JSON，
+再用 `manage.py query_budgets --report <path>` 对照预算出表。
+"""
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+QUERY_BUDGET_REPORT_ENV = "QUERY_BUDGET_REPORT"
+
+# {view_name: {method: QueryBudget}}
+QUERY_BUDGETS = {}
+
+# 本进程测试里实测到的条数 {(view_name, method): max count}
+MEASURED = {}
+
+
+class QueryBudget:
+    def __init__(self, view, method, max_queries, shape=""):
+        self.view = view
+        self.method = method
+        self.max_queries = max_queries
+        self.shape = shape
+
+    def __repr__(self):
+        return f"<QueryBudget {self.view} {self.method} <= {self.max_queries}>"
+
+
+def query_budget(shape="", **methods):
+    """
+    @query_budget(POST=17, shape="...")，要放在 @api_view 下面（直接贴着函数），
+    这样拿到的是原函数名。
+    """
+    if not methods:
+        raise ValueError("query_budget needs at least one METHOD=max_queries.")
+
+    def decorator(view):
+        budgets = QUERY_BUDGETS.setdefault(view.__name__, {})
+        for method, max_queries in methods.items():
+            budgets[method.upper()] = QueryBudget(view.__name__, method.upper(), max_queries, shape)
+        return view
+
+    return decorator
+
+
+def get_query_budget(view, method):
+    try:
+        return QUERY_BUDGETS[view][method.upper()]
+    except KeyError:
+        raise LookupError(f"No query budget declared for {view} {method.upper()}.") from None
+
+
+def record_measured(view, method, count):
+    key = (view, method.upper())
+    MEASURED[key] = max(count, MEASURED.get(key, 0))
+
+
+def write_measured(path):
+    """
+    合并进已有的报告文件（多个 app 的测试分别跑的时候不会互相覆盖）。
+    """
+    path = Path(path)
+    data = json.loads(path.read_text()) if path.exists() else {}
+    for (view, method), count in MEASURED.items():
+        data.setdefault(view, {})[method] = max(count, data.get(view, {}).get(method, 0))
+    path.write_text(json.dumps(data, indent=2, sort_keys=True))
+
+
+class QueryBudgetMixin:
+    """
+    给 django.test.TestCase 用。
+
+    assertQueryBudget 统计 with 块里的 SQL（包括 on_commit 回调里的缓存失效等，
+    它们在生产环境里也是这个请求付的钱），和 view 声明的预算比较。
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, view, method):
+        budget = get_query_budget(view, method)
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            yield ctx
+        count = len(ctx.captured_queries)
+        record_measured(view, method, count)
+        if count > budget.max_queries:
+            queries = "\n".join(
+                f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, start=1)
+            )
+            self.fail(
+                f"{view} {budget.method} ran {count} queries, budget is {budget.max_queries}"
+                f" ({budget.shape or 'no shape given'}):\n{queries}"
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        path = os.environ.get(QUERY_BUDGET_REPORT_ENV)
+        if path and MEASURED:
+            write_measured(path)
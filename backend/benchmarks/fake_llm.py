@@ -0,0 +1,112 @@
+# benchmarks/fake_llm.py
+"""
+本地假的 OpenAI chat completions 服务，压测 ai_order 时不走网络。
+
+把 OPENAI_BASE_URL 指到 FakeLLMServer.base_url，openai SDK 就会请求这里。
+回复按 prompt 里的餐厅/菜品挑：第一家有 item 的餐厅，前 1~2 个菜。
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def pick_order(payload):
+    for rest in payload.get("restaurants") or []:
+        items = rest.get("items") or []
+        if items:
+            return {
+                "restaurant_id": rest["id"],
+                "items": [{"item_id": it["id"], "quantity": 1} for it in items[:2]],
+                "comment": "benchmark stub",
+            }
+    return {"restaurant_id": None, "items": [], "comment": "no items"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        server = self.server
+        delay = server.latency + (random.uniform(-server.jitter, server.jitter) if server.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        user_msg = next(
+            (m["content"] for m in body.get("messages", []) if m.get("role") == "user"),
+            "{}",
+        )
+        try:
+            content = json.dumps(pick_order(json.loads(user_msg)))
+        except (TypeError, ValueError):
+            content = json.dumps({"restaurant_id": None, "items": [], "comment": "bad prompt"})
+
+        with server.lock:
+            server.requests += 1
+            server.prompt_bytes += len(user_msg)
+
+        out = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(user_msg) // 4, "completion_tokens": 20, "total_tokens": len(user_msg) // 4 + 20},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLLMServer:
+    """
+    with FakeLLMServer(latency_ms=800) as llm:
+        os.environ["OPENAI_BASE_URL"] = llm.base_url
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000
+        self.httpd.jitter = jitter_ms / 1000
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.prompt_bytes = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def stats(self):
+        return {"requests": self.httpd.requests, "prompt_bytes": self.httpd.prompt_bytes}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
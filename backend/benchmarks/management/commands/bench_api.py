@@ -0,0 +1,159 @@
+# benchmarks/management/commands/bench_api.py
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.runner import LocalServer, run_scenario
+from benchmarks.scenarios import SCENARIOS, BenchContext
+from restaurants.models import Item, Order, Restaurant
+
+
+class Command(BaseCommand):
+    help = (
+        "HTTP benchmark for every API route against the current database "
+        "(use a generate_dataset database, it writes orders/items/users). "
+        "ai_order talks to a local fake LLM, no network needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--only",
+            type=str,
+            default="",
+            help="Comma separated scenario names (default: all). Available: "
+            + ", ".join(s.name for s in SCENARIOS),
+        )
+        parser.add_argument("--llm-latency-ms", type=int, default=500)
+        parser.add_argument("--llm-jitter-ms", type=int, default=100)
+        parser.add_argument("--user", type=str, default="gen-user-0")
+        parser.add_argument("--password", type=str, default="bench-pass-123")
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            default=None,
+            help="Benchmark an already running server instead of the in-process one "
+            "(query counts are only reported by the in-process server). The server "
+            "must share this database and have OPENAI_BASE_URL pointed at a fake LLM.",
+        )
+        parser.add_argument("--output", type=str, default="bench-results", help="Directory for JSON results.")
+        parser.add_argument("--compare", type=str, default=None, help="Previous results JSON to diff against.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        only = {n.strip() for n in options["only"].split(",") if n.strip()}
+        unknown = only - {s.name for s in SCENARIOS}
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [s for s in SCENARIOS if not only or s.name in only]
+
+        with FakeLLMServer(options["llm_latency_ms"], options["llm_jitter_ms"]) as llm:
+            os.environ["OPENAI_BASE_URL"] = llm.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+            if options["base_url"]:
+                results = self.run_all(options["base_url"].rstrip("/"), scenarios, options)
+            else:
+                with LocalServer(get_wsgi_application()) as server:
+                    results = self.run_all(server.base_url, scenarios, options)
+            llm_stats = llm.stats
+
+        report = {
+            "meta": self.meta(options, llm_stats),
+            "endpoints": results,
+        }
+        self.print_table(results)
+
+        out_dir = Path(options["output"])
+        out_dir.mkdir(parents=True, exist_ok=True)
+        out_path = out_dir / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        out_path.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Saved {out_path}"))
+
+        if options["compare"]:
+            self.print_compare(json.loads(Path(options["compare"]).read_text()), report)
+
+    def run_all(self, base_url, scenarios, options):
+        ctx = BenchContext(base_url, options["user"], options["password"])
+        results = {}
+        for scenario in scenarios:
+            self.stdout.write(f"{scenario.name} ...", ending="")
+            self.stdout.flush()
+            summary, error = run_scenario(
+                base_url, scenario, ctx,
+                total=options["requests"],
+                concurrency=options["concurrency"],
+                seed=options["seed"],
+            )
+            results[scenario.name] = summary
+            self.stdout.write(f" {summary['rps']} req/s, p95 {summary['p95_ms']} ms")
+            if error:
+                summary["first_error"] = error
+                self.stdout.write(self.style.ERROR(f"  first error: {error}"))
+        return results
+
+    def meta(self, options, llm_stats):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": commit,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "db_vendor": connection.vendor,
+            "dataset": {
+                "restaurants": Restaurant.objects.count(),
+                "items": Item.objects.count(),
+                "orders": Order.objects.count(),
+            },
+            "requests_per_endpoint": options["requests"],
+            "concurrency": options["concurrency"],
+            "llm_latency_ms": options["llm_latency_ms"],
+            "llm_jitter_ms": options["llm_jitter_ms"],
+            "llm": llm_stats,
+            "base_url": options["base_url"] or "in-process",
+        }
+
+    def print_table(self, results):
+        cols = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_mean", "errors")
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<26}" + "".join(f"{c:>14}" for c in cols))
+        for name, r in results.items():
+            self.stdout.write(f"{name:<26}" + "".join(f"{str(r[c]):>14}" for c in cols))
+
+    def print_compare(self, old, new):
+        self.stdout.write("")
+        self.stdout.write(f"compared with {old['meta'].get('git_commit')} ({old['meta'].get('started_at')})")
+        self.stdout.write(f"{'endpoint':<26}{'p95_ms':>22}{'rps':>22}{'queries_mean':>22}")
+        for name, r in new["endpoints"].items():
+            prev = old["endpoints"].get(name)
+            if not prev:
+                continue
+            self.stdout.write(
+                f"{name:<26}"
+                + "".join(f"{_delta(prev.get(c), r.get(c)):>22}" for c in ("p95_ms", "rps", "queries_mean"))
+            )
+
+
+def _delta(old, new):
+    if old is None or new is None:
+        return f"{old} -> {new}"
+    if not old:
+        return f"{old} -> {new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.0f}%)"
@@ -0,0 +1,100 @@
+# benchmarks/management/commands/bench_json.py
+import io
+import json
+import timeit
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import parsers, renderers
+
+from accounts.models import UserProfile
+from restaurants.models import Item, Restaurant
+from restaurants.serializers import ItemSerializer
+from restaurants.views import build_restaurant_bundle, build_user_context
+from server import jsoncodec
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's stdlib JSON renderer/parser with server.jsoncodec on the big payloads: "
+        "a menu listing (ItemSerializer) and the ai_order prompt bundle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=5000, help="Items in the menu payload.")
+        parser.add_argument("--restaurants", type=int, default=20, help="Restaurants in the ai_order bundle.")
+        parser.add_argument("--rounds", type=int, default=5, help="Timing rounds (best one is reported).")
+        parser.add_argument("--output", type=str, default=None, help="Write the results JSON here.")
+
+    def handle(self, *args, **options):
+        items = Item.objects.filter(is_active=True).order_by("id")[: options["items"]]
+        menu = ItemSerializer(items, many=True).data
+        if not menu:
+            raise CommandError("No items; run generate_dataset first.")
+
+        profile = UserProfile.objects.filter(user_type="customer").order_by("id").first()
+        if profile is None:
+            raise CommandError("No customer account; run generate_dataset first.")
+        restaurants = Restaurant.objects.filter(is_active=True).order_by("id")[: options["restaurants"]]
+        bundle = {"user": build_user_context(profile), "restaurants": build_restaurant_bundle(restaurants)}
+
+        self.stdout.write(f"codec: {jsoncodec.CODEC}")
+        results = {}
+        for name, data in (("menu", menu), ("bundle", bundle)):
+            results[name] = self.bench_payload(name, data, options["rounds"])
+
+        self.stdout.write("")
+        self.stdout.write(f"{'payload':<10}{'op':<10}{'bytes':>10}{'stdlib_ms':>12}{'codec_ms':>12}{'speedup':>10}  same")
+        for name, ops in results.items():
+            for op, r in ops.items():
+                self.stdout.write(
+                    f"{name:<10}{op:<10}{r['bytes']:>10}{r['stdlib_ms']:>12}{r['codec_ms']:>12}"
+                    f"{r['speedup']:>9}x  {'yes' if r['same'] else 'NO'}"
+                )
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({"codec": jsoncodec.CODEC, "results": results}, indent=2))
+
+    def bench_payload(self, name, data, rounds):
+        drf_renderer = renderers.JSONRenderer()
+        renderer = jsoncodec.JSONRenderer()
+        body = drf_renderer.render(data)
+
+        ops = {
+            # 响应：DRF 默认 renderer vs jsoncodec.JSONRenderer，输出应该逐字节一致
+            "render": (
+                lambda: drf_renderer.render(data),
+                lambda: renderer.render(data),
+                lambda a, b: a == b,
+            ),
+            # 请求体：DRF JSONParser vs jsoncodec.JSONParser
+            "parse": (
+                lambda: parsers.JSONParser().parse(io.BytesIO(body)),
+                lambda: jsoncodec.JSONParser().parse(io.BytesIO(body)),
+                lambda a, b: a == b,
+            ),
+            # ai_order 拼 prompt：原来的 json.dumps(default=float) vs dumps_str（紧凑格式，内容相同）
+            "prompt": (
+                lambda: json.dumps(data, ensure_ascii=False, default=float),
+                lambda: jsoncodec.dumps_str(data),
+                lambda a, b: json.loads(a) == json.loads(b),
+            ),
+        }
+        out = {}
+        for op, (baseline, candidate, same) in ops.items():
+            base_ms = self.best_ms(baseline, rounds)
+            codec_ms = self.best_ms(candidate, rounds)
+            out[op] = {
+                "bytes": len(body) if op != "prompt" else len(candidate().encode()),
+                "stdlib_ms": round(base_ms, 3),
+                "codec_ms": round(codec_ms, 3),
+                "speedup": round(base_ms / codec_ms, 1) if codec_ms else None,
+                "same": same(baseline(), candidate()),
+            }
+            self.stdout.write(f"{name} {op}: {base_ms:.3f} ms -> {codec_ms:.3f} ms")
+        return out
+
+    def best_ms(self, fn, rounds):
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=rounds, number=number)) / number * 1000
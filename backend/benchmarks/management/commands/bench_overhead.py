@@ -0,0 +1,123 @@
+# benchmarks/management/commands/bench_overhead.py
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = {
+    # API 模式：session / CSRF / auth / messages 只给 /admin/
+    "api": {"API_ONLY_MIDDLEWARE": "true"},
+    # 所有请求都经过完整的中间件
+    "full": {"API_ONLY_MIDDLEWARE": "false"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Cold start (process spawn -> first response) and per-request overhead, with the "
+        "API-only middleware stack and with the full stack. Each sample is a fresh process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per path per process.")
+        parser.add_argument("--modes", type=str, default=",".join(MODES))
+        parser.add_argument("--output", type=str, default=None, help="Write the summary JSON here.")
+        # 内部用：子进程
+        parser.add_argument("--worker", action="store_true", help="(internal)")
+        parser.add_argument("--spawned-at", type=float, default=0.0, help="(internal)")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return self.run_worker(options)
+
+        modes = [m for m in options["modes"].split(",") if m]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        summary = {}
+        for mode in modes:
+            samples = [self.spawn(mode, options) for _ in range(options["runs"])]
+            summary[mode] = {
+                "startup_ms": round(statistics.median(s["startup_ms"] for s in samples), 1),
+                "openai_loaded_at_startup": any(s["openai_loaded"] for s in samples),
+                "per_request_us": {
+                    path: round(statistics.median(s["per_request_us"][path] for s in samples), 1)
+                    for path in samples[0]["per_request_us"]
+                },
+            }
+
+        paths = list(next(iter(summary.values()))["per_request_us"])
+        self.stdout.write(f"{'mode':<8}{'startup_ms':>12}{'openai':>8}" + "".join(f"{p:>34}" for p in paths))
+        for mode, r in summary.items():
+            self.stdout.write(
+                f"{mode:<8}{r['startup_ms']:>12}{'yes' if r['openai_loaded_at_startup'] else 'no':>8}"
+                + "".join(f"{str(r['per_request_us'][p]) + ' us':>34}" for p in paths)
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(summary, indent=2))
+
+    def spawn(self, mode, options):
+        env = {**os.environ, **MODES[mode]}
+        spawned_at = time.time()
+        proc = subprocess.run(
+            [
+                sys.executable, sys.argv[0], "bench_overhead", "--worker",
+                "--requests", str(options["requests"]),
+                "--spawned-at", str(spawned_at),
+            ],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode:
+            raise CommandError(f"{mode} worker exited with {proc.returncode}:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # ===== 子进程 =====
+
+    def run_worker(self, options):
+        from django.core.wsgi import get_wsgi_application
+        from django.test import Client
+
+        from accounts.models import UserProfile
+        from accounts.serializers import ClaimsTokenObtainPairSerializer
+        from restaurants.models import Restaurant
+
+        get_wsgi_application()
+        client = Client()
+        first = client.get("/healthz")
+        startup_ms = (time.time() - options["spawned_at"]) * 1000
+        if first.status_code != 200:
+            raise CommandError(f"/healthz returned {first.status_code}")
+        openai_loaded = "openai" in sys.modules
+
+        paths = {"/healthz": {}}
+        rest_id = Restaurant.objects.filter(is_active=True).values_list("id", flat=True).first()
+        if rest_id is not None:
+            paths[f"/api/restaurants/{rest_id}/items"] = {}
+        profile = UserProfile.objects.select_related("user").order_by("id").first()
+        if profile is not None:
+            token = ClaimsTokenObtainPairSerializer.get_token(profile.user).access_token
+            paths["/api/auth/me/"] = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+        per_request = {}
+        for path, headers in paths.items():
+            client.get(path, **headers)   # 热身（缓存、registry）
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                client.get(path, **headers)
+            per_request[path] = (time.perf_counter() - started) / options["requests"] * 1e6
+        # 路径里的 id 每个库不一样，输出时统一成模板
+        per_request = {
+            ("/api/restaurants/<id>/items" if "/items" in p else p): v for p, v in per_request.items()
+        }
+        self.stdout.write(json.dumps({
+            "startup_ms": startup_ms,
+            "openai_loaded": openai_loaded,
+            "per_request_us": per_request,
+        }))
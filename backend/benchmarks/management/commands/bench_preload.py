@@ -0,0 +1,186 @@
+# benchmarks/management/commands/bench_preload.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = {
+    # worker fork 之后各自 warm up（tag registry、缓存里的菜单）
+    "lazy": {"PRELOAD_SHARED_CACHES": "false"},
+    # master 里 import server.wsgi 时预加载，worker 共享（restaurants/preload.py）
+    "preload": {"PRELOAD_SHARED_CACHES": "true"},
+    # 菜单从 mmap 的快照文件里读（restaurants/snapshot.py），MENU_SNAPSHOT_PATH 运行时填
+    "snapshot": {"PRELOAD_SHARED_CACHES": "false"},
+}
+ROLLUP_FIELDS = ("Rss", "Pss", "Private_Clean", "Private_Dirty")
+
+
+def read_rollup(pid):
+    """
+    /proc/<pid>/smaps_rollup 里的 Rss / Pss / Private_*，单位 kB。
+    """
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ROLLUP_FIELDS:
+                out[name] = int(rest.split()[0])
+    return out
+
+
+class Command(BaseCommand):
+    help = (
+        "Memory of N forked workers (like gunicorn --preload -w N) after each one has served "
+        "every menu and resolved every restaurant, with and without the preloaded shared caches. "
+        "Reports summed RSS, PSS (shared pages split between processes) and private memory. "
+        "The snapshot mode builds a menu snapshot file first and serves menus from its mmap."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--modes", type=str, default=",".join(MODES))
+        parser.add_argument("--output", type=str, default=None, help="Write the results JSON here.")
+        # 内部用：模拟 gunicorn master 的子进程
+        parser.add_argument("--master", action="store_true", help="(internal)")
+
+    def handle(self, *args, **options):
+        if not Path("/proc/self/smaps_rollup").exists():
+            raise CommandError("Needs Linux /proc/<pid>/smaps_rollup.")
+        if options["master"]:
+            return self.run_master(options)
+
+        modes = [m for m in options["modes"].split(",") if m]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        tmp = tempfile.TemporaryDirectory()
+        snapshot_path = os.path.join(tmp.name, "menus.snap")
+        if "snapshot" in modes:
+            from restaurants.snapshot import write_snapshot
+
+            stats = write_snapshot(snapshot_path)
+            self.stdout.write(f"snapshot: {stats['bytes'] / 1024 / 1024:.1f} MB in {stats['seconds']} s")
+
+        results = {}
+        for mode in modes:
+            env = {**os.environ, **MODES[mode]}
+            if mode == "snapshot":
+                env["MENU_SNAPSHOT_PATH"] = snapshot_path
+            proc = subprocess.run(
+                [sys.executable, sys.argv[0], "bench_preload", "--master", "--workers", str(options["workers"])],
+                env=env, capture_output=True, text=True,
+            )
+            if proc.returncode:
+                raise CommandError(f"{mode} exited with {proc.returncode}:\n{proc.stderr[-2000:]}")
+            results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f"{'mode':<9}{'workers':>8}{'startup_s':>11}{'warmup_s':>10}"
+            f"{'rss_mb':>10}{'pss_mb':>10}{'private_mb':>12}{'private/worker':>16}"
+        )
+        for mode, r in results.items():
+            self.stdout.write(
+                f"{mode:<9}{r['workers']:>8}{r['startup_s']:>11}{r['warmup_s']:>10}"
+                f"{r['rss_mb']:>10}{r['pss_mb']:>10}{r['private_mb']:>12}{r['private_per_worker_mb']:>16}"
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+        tmp.cleanup()
+
+    # ===== 子进程：master + fork 出来的 worker =====
+
+    def run_master(self, options):
+        from django.db import connections
+
+        from restaurants.models import Restaurant
+
+        started = time.perf_counter()
+        import server.wsgi  # noqa: F401  PRELOAD_SHARED_CACHES 打开时在这里预加载
+        startup_s = time.perf_counter() - started
+
+        rest_ids = list(Restaurant.objects.filter(is_active=True).order_by("id").values_list("id", flat=True))
+        place_ids = list(Restaurant.objects.filter(is_active=True).order_by("id").values_list("google_place_id", flat=True))
+        if not rest_ids:
+            raise CommandError("No restaurants; run generate_dataset first.")
+        connections.close_all()
+
+        workers = []
+        for _ in range(options["workers"]):
+            ready_r, ready_w = os.pipe()
+            stop_r, stop_w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(ready_r)
+                os.close(stop_w)
+                code = 0
+                try:
+                    elapsed = self.warm_up(rest_ids, place_ids)
+                    os.write(ready_w, f"{elapsed}\n".encode())
+                    os.read(stop_r, 1)   # 等 master 量完内存
+                except BaseException:
+                    code = 1
+                finally:
+                    os._exit(code)
+            os.close(ready_w)
+            os.close(stop_r)
+            workers.append((pid, ready_r, stop_w))
+
+        warmups = []
+        for pid, ready_r, _ in workers:
+            line = os.read(ready_r, 64)
+            if not line:
+                raise CommandError(f"worker {pid} died during warm-up")
+            warmups.append(float(line))
+
+        # 所有 worker 都 warm up 完、还活着的时候量
+        master = read_rollup(os.getpid())
+        rollups = [read_rollup(pid) for pid, _, _ in workers]
+        for pid, ready_r, stop_w in workers:
+            os.write(stop_w, b"x")
+            os.close(stop_w)
+            os.close(ready_r)
+            os.waitpid(pid, 0)
+
+        def mb(kb):
+            return round(kb / 1024, 1)
+
+        private = sum(r["Private_Clean"] + r["Private_Dirty"] for r in rollups)
+        self.stdout.write(json.dumps({
+            "workers": len(workers),
+            "startup_s": round(startup_s, 2),
+            "warmup_s": round(max(warmups), 2),
+            "master_rss_mb": mb(master["Rss"]),
+            # worker 加起来（master 的 PSS 也算上，才是这一组进程实际占的内存）
+            "rss_mb": mb(sum(r["Rss"] for r in rollups)),
+            "pss_mb": mb(sum(r["Pss"] for r in rollups) + master["Pss"]),
+            "private_mb": mb(private),
+            "private_per_worker_mb": mb(private / len(rollups)),
+        }))
+
+    def warm_up(self, rest_ids, place_ids):
+        """
+        每个菜单（原文 + gzip）都取一遍，每个餐厅 resolve 一遍，tag registry 用一次。
+        """
+        from django.test import Client
+
+        from restaurants.tags import get_tag_registry
+
+        started = time.perf_counter()
+        client = Client()
+        get_tag_registry()
+        for rest_id in rest_ids:
+            for headers in ({}, {"HTTP_ACCEPT_ENCODING": "gzip"}):
+                r = client.get(f"/api/restaurants/{rest_id}/items", **headers)
+                if r.status_code != 200:
+                    raise RuntimeError(f"menu {rest_id}: {r.status_code}")
+        for i in range(0, len(place_ids), 100):
+            client.post(
+                "/api/restaurants/resolve", {"place_ids": place_ids[i:i + 100]}, content_type="application/json"
+            )
+        return time.perf_counter() - started
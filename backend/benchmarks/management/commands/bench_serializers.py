@@ -0,0 +1,66 @@
+# benchmarks/management/commands/bench_serializers.py
+import json
+import timeit
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import renderers
+
+from restaurants.models import Item, Restaurant
+from restaurants.serializers import ITEM_LEAN, RESTAURANT_LEAN, ItemSerializer, RestaurantSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "ModelSerializer vs the values_list() based lean serializers (restaurants/lean.py) "
+        "on the hot read paths: a large item list and a 100-restaurant resolve. "
+        "Times include the query; output is checked to render byte-identically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Items to serialize.")
+        parser.add_argument("--restaurants", type=int, default=100, help="Restaurants in the resolve payload.")
+        parser.add_argument("--rounds", type=int, default=5, help="Timing rounds (best one is reported).")
+        parser.add_argument("--output", type=str, default=None, help="Write the results JSON here.")
+
+    def handle(self, *args, **options):
+        items = Item.objects.order_by("id")[: options["rows"]]
+        restaurants = Restaurant.objects.order_by("id")[: options["restaurants"]]
+        if items.count() < options["rows"] or restaurants.count() < options["restaurants"]:
+            raise CommandError(
+                f"Need at least {options['rows']} items and {options['restaurants']} restaurants; "
+                "run generate_dataset with a bigger --restaurants / --items-per-restaurant."
+            )
+
+        cases = (
+            ("items", ItemSerializer, ITEM_LEAN, items),
+            ("restaurants", RestaurantSerializer, RESTAURANT_LEAN, restaurants),
+        )
+        results = {}
+        renderer = renderers.JSONRenderer()
+        for name, serializer_class, lean, qs in cases:
+            # 每次都是新的 queryset，时间里包括查库
+            model_ms = self.best_ms(lambda: serializer_class(qs.all(), many=True).data, options["rounds"])
+            lean_ms = self.best_ms(lambda: lean.serialize(qs.all()), options["rounds"])
+            same = renderer.render(lean.serialize(qs.all())) == renderer.render(serializer_class(qs.all(), many=True).data)
+            results[name] = {
+                "rows": qs.count(),
+                "model_serializer_ms": round(model_ms, 2),
+                "lean_ms": round(lean_ms, 2),
+                "speedup": round(model_ms / lean_ms, 1) if lean_ms else None,
+                "identical": same,
+            }
+
+        self.stdout.write(f"{'payload':<14}{'rows':>8}{'model_ms':>12}{'lean_ms':>10}{'speedup':>10}  identical")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<14}{r['rows']:>8}{r['model_serializer_ms']:>12}{r['lean_ms']:>10}"
+                f"{r['speedup']:>9}x  {'yes' if r['identical'] else 'NO'}"
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+
+    def best_ms(self, fn, rounds):
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=rounds, number=number)) / number * 1000
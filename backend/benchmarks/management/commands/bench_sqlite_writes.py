@@ -0,0 +1,216 @@
+# benchmarks/management/commands/bench_sqlite_writes.py
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+
+from accounts.models import UserProfile
+from accounts.serializers import ClaimsTokenObtainPairSerializer
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.runner import percentile
+from restaurants.models import Item
+
+MODES = ("default", "production")
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent create_order / ai_order + menu read load against copies of the SQLite database, "
+        "once with the stock settings and once with SQLITE_PRODUCTION (WAL, pragmas, "
+        "BEGIN IMMEDIATE, write queue). Reports lock errors and latency per mode."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8, help="Threads per process.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode.")
+        parser.add_argument("--write-ratio", type=float, default=0.5)
+        parser.add_argument(
+            "--ai-ratio", type=float, default=0.3,
+            help="Fraction of writes sent to ai_order (fake LLM, no latency) instead of create_order.",
+        )
+        parser.add_argument("--modes", type=str, default=",".join(MODES))
+        parser.add_argument("--output", type=str, default=None, help="Write the summary JSON here.")
+        # 内部用：子进程
+        parser.add_argument("--worker", action="store_true", help="(internal)")
+        parser.add_argument("--start-at", type=float, default=0.0, help="(internal)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return self.run_worker(options)
+
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark only makes sense on SQLite.")
+        modes = [m for m in options["modes"].split(",") if m]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        source = settings.DATABASES["default"]["NAME"]
+        summary = {}
+        with tempfile.TemporaryDirectory(prefix="bench-sqlite-") as tmp:
+            for mode in modes:
+                path = Path(tmp) / f"{mode}.sqlite3"
+                self.copy_database(source, path, wal=mode == "production")
+                summary[mode] = self.run_mode(mode, path, options)
+
+        self.stdout.write("")
+        cols = ("writes_ok", "lock_errors", "other_errors", "writes_per_s", "write_p50_ms", "write_p95_ms",
+                "write_p99_ms", "read_p50_ms", "read_p95_ms", "read_p99_ms")
+        self.stdout.write(f"{'mode':<12}" + "".join(f"{c:>14}" for c in cols))
+        for mode, r in summary.items():
+            self.stdout.write(f"{mode:<12}" + "".join(f"{str(r[c]):>14}" for c in cols))
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({"options": {
+                k: options[k] for k in ("processes", "threads", "duration", "write_ratio", "ai_ratio")
+            }, "modes": summary}, indent=2))
+
+    def copy_database(self, source, target, wal):
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target)
+        with dst:
+            src.backup(dst)
+        src.close()
+        # journal_mode 是存在文件里的，对照组显式改回 rollback journal
+        dst.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        dst.close()
+
+    def run_mode(self, mode, path, options):
+        env = {
+            **os.environ,
+            "SQLITE_PATH": str(path),
+            "SQLITE_PRODUCTION": "true" if mode == "production" else "false",
+        }
+        start_at = time.time() + 2.0
+        procs = [
+            subprocess.Popen(
+                [
+                    sys.executable, sys.argv[0], "bench_sqlite_writes", "--worker",
+                    "--threads", str(options["threads"]),
+                    "--duration", str(options["duration"]),
+                    "--write-ratio", str(options["write_ratio"]),
+                    "--ai-ratio", str(options["ai_ratio"]),
+                    "--start-at", str(start_at),
+                    "--seed", str(options["seed"] * 1000 + n),
+                ],
+                # 失败请求的 traceback 会被 django.request 打到 stderr，只在子进程出错时显示
+                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for n in range(options["processes"])
+        ]
+        results = []
+        for proc in procs:
+            out, err = proc.communicate()
+            if proc.returncode:
+                raise CommandError(f"{mode} worker exited with {proc.returncode}:\n{err[-2000:]}")
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+        writes = sorted(x for r in results for x in r["writes"])
+        reads = sorted(x for r in results for x in r["reads"])
+        wall = max(r["wall_s"] for r in results)
+        summary = {
+            "writes_ok": len(writes),
+            "lock_errors": sum(r["lock_errors"] for r in results),
+            "other_errors": sum(r["other_errors"] for r in results),
+            "first_error": next((r["first_error"] for r in results if r["first_error"]), None),
+            "writes_per_s": round(len(writes) / wall, 1) if wall else None,
+            "reads": len(reads),
+        }
+        for name, values in (("write", writes), ("read", reads)):
+            for pct in (50, 95, 99):
+                value = percentile(values, pct)
+                summary[f"{name}_p{pct}_ms"] = round(value, 1) if value is not None else None
+        self.stdout.write(f"{mode}: {summary['writes_ok']} orders, {summary['lock_errors']} lock errors")
+        return summary
+
+    # ===== 子进程 =====
+
+    def run_worker(self, options):
+        profile = (
+            UserProfile.objects.filter(user_type="customer").select_related("user").order_by("id").first()
+        )
+        if profile is None:
+            raise CommandError("No customer account; run generate_dataset first.")
+        token = str(ClaimsTokenObtainPairSerializer.get_token(profile.user).access_token)
+
+        menus = {}
+        for rest_id, item_id in (
+            Item.objects.filter(is_active=True, restaurant__is_active=True)
+            .order_by("restaurant_id", "id")
+            .values_list("restaurant_id", "id")[:5000]
+        ):
+            menus.setdefault(rest_id, []).append(item_id)
+        if not menus:
+            raise CommandError("No items; run generate_dataset first.")
+        rest_ids = list(menus)
+        connections.close_all()
+
+        lock = threading.Lock()
+        out = {"writes": [], "reads": [], "lock_errors": 0, "other_errors": 0, "first_error": None}
+
+        def worker(idx):
+            rng = random.Random(f"{options['seed']}:{idx}")
+            client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f"Bearer {token}")
+            writes, reads, lock_errors, other_errors, first_error = [], [], 0, 0, None
+            deadline = options["start_at"] + options["duration"]
+            time.sleep(max(0.0, options["start_at"] - time.time()))
+            while time.time() < deadline:
+                rest_id = rng.choice(rest_ids)
+                started = time.perf_counter()
+                if rng.random() < options["write_ratio"]:
+                    if rng.random() < options["ai_ratio"]:
+                        # ai_order 在一个事务里先读后写（create_order_with_prefs 包在 atomic 里）
+                        body = {"restaurant_ids": rng.sample(rest_ids, k=min(3, len(rest_ids)))}
+                        resp = client.post("/api/restaurants/ai_order/", body, content_type="application/json")
+                    else:
+                        items = menus[rest_id]
+                        body = {
+                            "restaurant_id": rest_id,
+                            "items": [{"item_id": i, "quantity": 1} for i in rng.sample(items, k=min(3, len(items)))],
+                        }
+                        resp = client.post("/api/restaurants/orders/", body, content_type="application/json")
+                    bucket = writes
+                else:
+                    resp = client.get(f"/api/restaurants/{rest_id}/items")
+                    bucket = reads
+                elapsed = (time.perf_counter() - started) * 1000
+                if resp.status_code in (200, 201):
+                    bucket.append(elapsed)
+                    continue
+                error = repr(resp.exc_info[1]) if getattr(resp, "exc_info", None) else f"HTTP {resp.status_code}"
+                if "locked" in error:
+                    lock_errors += 1
+                else:
+                    other_errors += 1
+                first_error = first_error or error
+            connections.close_all()
+            with lock:
+                out["writes"].extend(writes)
+                out["reads"].extend(reads)
+                out["lock_errors"] += lock_errors
+                out["other_errors"] += other_errors
+                out["first_error"] = out["first_error"] or first_error
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+        with FakeLLMServer() as llm:
+            os.environ["OPENAI_BASE_URL"] = llm.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "bench")
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        out["wall_s"] = options["duration"]
+        self.stdout.write(json.dumps(out))
@@ -0,0 +1,45 @@
+# benchmarks/management/commands/query_budgets.py
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver
+
+from benchmarks.budgets import QUERY_BUDGET_REPORT_ENV, QUERY_BUDGETS
+
+
+class Command(BaseCommand):
+    help = (
+        "List the per-view SQL query budgets. With --report, compare them against the counts "
+        f"measured by the test suite (run tests with {QUERY_BUDGET_REPORT_ENV}=<path>)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--report", type=str, default=None, help="JSON written by the budget tests.")
+
+    def handle(self, *args, **options):
+        # 加载 urlconf，view 模块被 import 后预算才会登记进来
+        get_resolver().url_patterns
+
+        measured = {}
+        if options["report"]:
+            path = Path(options["report"])
+            if not path.exists():
+                raise CommandError(f"{path} not found.")
+            measured = json.loads(path.read_text())
+
+        over = []
+        self.stdout.write(f"{'view':<30}{'method':<8}{'budget':>8}{'measured':>10}  shape")
+        for view in sorted(QUERY_BUDGETS):
+            for method, budget in sorted(QUERY_BUDGETS[view].items()):
+                actual = measured.get(view, {}).get(method)
+                line = f"{view:<30}{method:<8}{budget.max_queries:>8}{'-' if actual is None else actual:>10}  {budget.shape}"
+                if actual is not None and actual > budget.max_queries:
+                    over.append(budget)
+                    line = self.style.ERROR(line)
+                elif options["report"] and actual is None:
+                    line = self.style.WARNING(line)
+                self.stdout.write(line)
+
+        if over:
+            raise CommandError(f"{len(over)} view(s) over budget: " + ", ".join(f"{b.view} {b.method}" for b in over))
@@ -0,0 +1,47 @@
+# benchmarks/management/commands/sync_sqlite_replicas.py
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Local replica testing: copy the primary SQLite database into every SQLite replica "
+        "(SQLITE_REPLICA_PATHS). With --interval it keeps copying, so replicas lag the "
+        "primary by up to that many seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0.0, help="Repeat every N seconds (0 = once).")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        replicas = [
+            (alias, settings.DATABASES[alias]) for alias in getattr(settings, "REPLICA_DATABASES", [])
+        ]
+        replicas = [(alias, db) for alias, db in replicas if db["ENGINE"].endswith("sqlite3")]
+        if not primary["ENGINE"].endswith(("sqlite3", "sqlite_backend")):
+            raise CommandError("The primary database is not SQLite.")
+        if not replicas:
+            raise CommandError("No SQLite replicas configured; set SQLITE_REPLICA_PATHS.")
+
+        while True:
+            started = time.perf_counter()
+            src = sqlite3.connect(primary["NAME"])
+            try:
+                for alias, db in replicas:
+                    dst = sqlite3.connect(db["NAME"])
+                    with dst:
+                        src.backup(dst)
+                    dst.close()
+            finally:
+                src.close()
+            self.stdout.write(
+                f"synced {', '.join(alias for alias, _ in replicas)} "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
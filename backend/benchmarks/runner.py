@@ -0,0 +1,163 @@
+# benchmarks/runner.py
+"""
+压测跑法：进程内起一个多线程 WSGI server（带查询计数），按 endpoint 逐个用
+N 个线程打固定数量的请求，统计吞吐、延迟分位数、每个请求的 SQL 条数。
+"""
+import math
+import random
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from django.db import connection
+
+QUERY_COUNT_HEADER = "X-Bench-Queries"
+
+
+class QueryCountingApp:
+    """
+    包一层 WSGI app：统计本次请求在当前线程连接上执行的 SQL 条数，放进响应头。
+    Django 在 start_response 之前就已经跑完 view，所以这时的计数是完整的。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, [*headers, (QUERY_COUNT_HEADER, str(count[0]))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return self.app(environ, counting_start_response)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    def __init__(self, app, host="127.0.0.1", port=0):
+        self.httpd = make_server(
+            host, port, QueryCountingApp(app),
+            server_class=_ThreadingWSGIServer,
+            handler_class=_QuietHandler,
+        )
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def percentile(sorted_values, pct):
+    """
+    nearest-rank 分位数，sorted_values 已排序。
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, wall):
+    """
+    samples: [(latency_s, ok, queries or None)]
+    """
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[2] for s in samples if s[2] is not None]
+    ok = sum(1 for s in samples if s[1])
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - ok,
+        "wall_s": round(wall, 3),
+        "rps": round(len(samples) / wall, 2) if wall else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": _round(percentile(latencies, 50)),
+        "p95_ms": _round(percentile(latencies, 95)),
+        "p99_ms": _round(percentile(latencies, 99)),
+        "max_ms": _round(latencies[-1] if latencies else None),
+        "queries_mean": round(sum(queries) / len(queries), 2) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def _error_text(resp):
+    """
+    DEBUG=True 时 500 是整页 HTML，只取 <title>（异常类型 + 路径）。
+    """
+    text = resp.text
+    if "<title>" in text:
+        text = text.split("<title>", 1)[1].split("</title>", 1)[0]
+    return " ".join(text.split())[:200]
+
+
+def run_scenario(base_url, scenario, ctx, total, concurrency, seed=0):
+    """
+    total 个请求平均分给 concurrency 个线程，每个线程一个 Session（keep-alive）。
+    返回 (summary, 第一个失败请求的描述或 None)。
+    """
+    samples = []
+    lock = threading.Lock()
+    first_error = []
+
+    def worker(thread_idx, count):
+        rng = random.Random(f"{seed}:{scenario.name}:{thread_idx}")
+        session = requests.Session()
+        local = []
+        for i in range(count):
+            method, path, body, headers = scenario.build(ctx, rng, f"{thread_idx}-{i}")
+            started = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path, json=body, headers=headers, timeout=120)
+            except requests.RequestException as e:
+                local.append((time.perf_counter() - started, False, None))
+                if not first_error:
+                    first_error.append(f"{method} {path}: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            ok = resp.status_code in scenario.expect
+            q = resp.headers.get(QUERY_COUNT_HEADER)
+            local.append((elapsed, ok, int(q) if q is not None else None))
+            if not ok and not first_error:
+                first_error.append(f"{method} {path}: {resp.status_code} {_error_text(resp)}")
+        with lock:
+            samples.extend(local)
+
+    concurrency = max(1, min(concurrency, total))
+    per_thread = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return summarize(samples, wall), (first_error[0] if first_error else None)
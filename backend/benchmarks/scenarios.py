@@ -0,0 +1,188 @@
+# benchmarks/scenarios.py
+"""
+server/urls.py 里每个 API 一个压测场景（admin/ 是 HTML 后台，不测）。
+
+场景需要的账号 / 餐厅 / 菜品在 BenchContext 里准备好：
+- customer：用 --user/--password 登录（默认 generate_dataset 生成的 gen-user-0），
+  登录失败就现注册一个
+- merchant：每次现注册一个 bench 商家，把数据集里前几家餐厅划给它
+- metrics：/metrics 的 METRICS_TOKEN（没设时服务端不检查）
+"""
+import time
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from restaurants.models import Item, Restaurant
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None, auth=None, expect=(200,)):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.auth = auth
+        self.expect = set(expect)
+
+    def build(self, ctx, rng, uniq):
+        path = self.path(ctx, rng, uniq) if callable(self.path) else self.path
+        body = self.body(ctx, rng, uniq) if callable(self.body) else self.body
+        headers = {}
+        if self.auth:
+            headers["Authorization"] = f"Bearer {ctx.tokens[self.auth]['access']}"
+        return self.method, path, body, headers
+
+
+class BenchContext:
+    def __init__(self, base_url, username, password, merchant_restaurants=5, sample_restaurants=200):
+        self.base_url = base_url
+        self.run_id = time.strftime("%Y%m%d%H%M%S")
+        self.password = password
+        self.tokens = {}
+
+        self.restaurant_ids = list(
+            Restaurant.objects.filter(is_active=True).order_by("id").values_list("id", flat=True)[:sample_restaurants]
+        )
+        if not self.restaurant_ids:
+            raise RuntimeError("No active restaurants; run generate_dataset first.")
+        self.place_ids = list(
+            Restaurant.objects.filter(id__in=self.restaurant_ids).values_list("google_place_id", flat=True)
+        )
+        self.items_by_restaurant = {}
+        for rest_id, item_id in (
+            Item.objects
+            .filter(restaurant_id__in=self.restaurant_ids, is_active=True)
+            .order_by("id")
+            .values_list("restaurant_id", "id")
+        ):
+            self.items_by_restaurant.setdefault(rest_id, []).append(item_id)
+        self.order_restaurant_ids = [r for r in self.restaurant_ids if self.items_by_restaurant.get(r)]
+
+        self.tokens["customer"] = self._login_or_register(username, password, "/api/auth/register/")
+        self.tokens["metrics"] = {"access": getattr(settings, "METRICS_TOKEN", "")}
+
+        merchant_name = f"bench-merchant-{self.run_id}"
+        self.tokens["merchant"] = self._login_or_register(merchant_name, password, "/api/auth/merchant/register/")
+        self.merchant_restaurant_ids = self.order_restaurant_ids[:merchant_restaurants]
+        Restaurant.objects.filter(id__in=self.merchant_restaurant_ids).update(owner_id=self.tokens["merchant"]["user_id"])
+        self.merchant_item_ids = [
+            item_id for r in self.merchant_restaurant_ids for item_id in self.items_by_restaurant[r]
+        ]
+
+    def _login_or_register(self, username, password, register_path):
+        r = requests.post(f"{self.base_url}/api/auth/login/", json={"username": username, "password": password})
+        if r.status_code != 200:
+            reg = requests.post(f"{self.base_url}{register_path}", json={"username": username, "password": password})
+            reg.raise_for_status()
+            r = requests.post(f"{self.base_url}/api/auth/login/", json={"username": username, "password": password})
+        r.raise_for_status()
+        tokens = r.json()
+        tokens["user_id"] = get_user_model().objects.values_list("id", flat=True).get(username=username)
+        tokens["username"] = username
+        return tokens
+
+
+def _order_body(ctx, rng, uniq):
+    rest_id = rng.choice(ctx.order_restaurant_ids)
+    items = ctx.items_by_restaurant[rest_id]
+    picked = rng.sample(items, k=min(len(items), rng.choice((1, 2, 3))))
+    return {"restaurant_id": rest_id, "items": [{"item_id": i, "quantity": rng.choice((1, 1, 2))} for i in picked]}
+
+
+def _bulk_rows(ctx, rng, uniq):
+    return [
+        {"name": f"bench bulk {n}", "price": f"{rng.randint(3, 30)}.99", "cuisines": "", "description": uniq}
+        for n in range(50)
+    ]
+
+
+SCENARIOS = [
+    Scenario("healthz", "GET", "/healthz"),
+    # 依赖检查结果有缓存（READINESS_CACHE_SECONDS），测的主要是命中缓存时的开销
+    Scenario("readyz", "GET", "/readyz"),
+    Scenario("metrics", "GET", "/metrics", auth="metrics"),
+
+    # customer
+    Scenario(
+        "resolve", "POST", "/api/restaurants/resolve",
+        body=lambda ctx, rng, u: {"place_ids": rng.sample(ctx.place_ids, k=min(20, len(ctx.place_ids)))},
+    ),
+    Scenario(
+        "items", "GET",
+        lambda ctx, rng, u: f"/api/restaurants/{rng.choice(ctx.order_restaurant_ids)}/items",
+    ),
+    Scenario("orders", "POST", "/api/restaurants/orders/", body=_order_body, auth="customer"),
+    Scenario(
+        "ai_order", "POST", "/api/restaurants/ai_order/",
+        body=lambda ctx, rng, u: {"restaurant_ids": rng.sample(ctx.order_restaurant_ids, k=min(5, len(ctx.order_restaurant_ids)))},
+        auth="customer", expect=(201,),
+    ),
+
+    # auth / profile
+    Scenario(
+        "register", "POST", "/api/auth/register/",
+        body=lambda ctx, rng, u: {"username": f"bench-{ctx.run_id}-{u}", "password": "bench-pass-123"},
+        expect=(201,),
+    ),
+    Scenario(
+        "login", "POST", "/api/auth/login/",
+        body=lambda ctx, rng, u: {"username": ctx.tokens["customer"]["username"], "password": ctx.password},
+    ),
+    Scenario(
+        "refresh", "POST", "/api/auth/refresh/",
+        body=lambda ctx, rng, u: {"refresh": ctx.tokens["customer"]["refresh"]},
+    ),
+    Scenario("me", "GET", "/api/auth/me/", auth="customer"),
+    Scenario("me_bootstrap", "GET", "/api/auth/me/?include=profile,tags", auth="customer"),
+    Scenario("profile_get", "GET", "/api/auth/profile/", auth="customer"),
+    Scenario(
+        "profile_put", "PUT", "/api/auth/profile/",
+        body=lambda ctx, rng, u: {"memo": f"bench {u}", "age": rng.randint(18, 70)},
+        auth="customer",
+    ),
+
+    # merchant
+    Scenario(
+        "merchant_register", "POST", "/api/auth/merchant/register/",
+        body=lambda ctx, rng, u: {"username": f"bench-m-{ctx.run_id}-{u}", "password": "bench-pass-123"},
+        expect=(201,),
+    ),
+    Scenario("merchant_my_restaurants", "GET", "/api/merchant/restaurants/my/", auth="merchant"),
+    Scenario(
+        "merchant_item_get", "GET",
+        lambda ctx, rng, u: f"/api/merchant/items/{rng.choice(ctx.merchant_item_ids)}/",
+        auth="merchant",
+    ),
+    Scenario(
+        "merchant_item_put", "PUT",
+        lambda ctx, rng, u: f"/api/merchant/items/{rng.choice(ctx.merchant_item_ids)}/",
+        body=lambda ctx, rng, u: {"price": str(Decimal(rng.randint(300, 3000)) / 100)},
+        auth="merchant",
+    ),
+    Scenario(
+        "merchant_items_list", "GET",
+        lambda ctx, rng, u: f"/api/merchant/restaurants/{rng.choice(ctx.merchant_restaurant_ids)}/items/",
+        auth="merchant",
+    ),
+    Scenario(
+        "merchant_item_create", "POST",
+        lambda ctx, rng, u: f"/api/merchant/restaurants/{rng.choice(ctx.merchant_restaurant_ids)}/items/",
+        body=lambda ctx, rng, u: {"name": f"bench item {ctx.run_id}-{u}", "price": "9.99"},
+        auth="merchant", expect=(201,),
+    ),
+    Scenario(
+        "merchant_bulk_import", "POST",
+        lambda ctx, rng, u: f"/api/merchant/restaurants/{rng.choice(ctx.merchant_restaurant_ids)}/items:bulk",
+        body=_bulk_rows, auth="merchant",
+    ),
+    Scenario(
+        "merchant_bulk_action", "POST",
+        lambda ctx, rng, u: f"/api/merchant/restaurants/{rng.choice(ctx.merchant_restaurant_ids)}/items:batch",
+        body={"filter": {"min_price": "0"}, "action": "activate"},
+        auth="merchant",
+    ),
+    Scenario("merchant_tags", "GET", "/api/merchant/tags/", auth="merchant"),
+]
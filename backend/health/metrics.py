@@ -0,0 +1,322 @@
+# health/metrics.py
+"""
+Prometheus 文本格式的指标（/metrics），不依赖 prometheus_client。
+
+    ORDERS_CREATED.inc(source="ai")
+    HTTP_LATENCY.observe(0.12, method="GET", route="api/auth/me/")
+
+存储：
+- 单进程（默认）：进程内 dict。
+- 多进程（gunicorn 多 worker）：设置 METRICS_MULTIPROC_DIR，每个进程写自己的
+  mmap 文件 <dir>/metrics-<pid>.db（只有本进程写，进程内一把锁），/metrics 读目录下
+  所有文件汇总：counter / histogram 求和（退出的 worker 的累计值也算），gauge 只算
+  还活着的进程。部署时每次启动前清空这个目录。
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+_FAMILIES = {}
+
+
+# ===== 值存储 =====
+
+class _DictStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class _MmapStore:
+    """
+    文件格式：8 字节头（前 4 字节是已用长度），之后一条条
+    [4 字节 key 长度][key，补齐到 8 字节对齐][8 字节 double]。
+    value 都是 8 字节对齐的，单次写入对读者是原子的。
+    """
+
+    INITIAL_SIZE = 1 << 16
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        fd = self._file.fileno()
+        if os.fstat(fd).st_size < self.INITIAL_SIZE:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._capacity = os.fstat(fd).st_size
+        self._mmap = mmap.mmap(fd, self._capacity)
+        self._used = struct.unpack_from("i", self._mmap, 0)[0]
+        if not self._used:
+            self._used = 8
+            struct.pack_into("i", self._mmap, 0, self._used)
+        self._positions = {key: pos for key, _, pos in _iter_entries(self._mmap, self._used)}
+
+    def _init_key(self, key):
+        encoded = key.encode()
+        padded = encoded + b" " * (-(len(encoded) + 4) % 8)
+        entry = struct.pack(f"i{len(padded)}sd", len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._mmap.close()
+            self._file.truncate(self._capacity)
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        self._mmap[self._used:self._used + len(entry)] = entry
+        pos = self._used + 4 + len(padded)
+        self._used += len(entry)
+        struct.pack_into("i", self._mmap, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def inc(self, key, amount):
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._init_key(key)
+            value = struct.unpack_from("d", self._mmap, pos)[0]
+            struct.pack_into("d", self._mmap, pos, value + amount)
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, value, _ in _iter_entries(self._mmap, self._used)]
+
+
+def _iter_entries(data, used):
+    pos = 8
+    while pos < used:
+        length = struct.unpack_from("i", data, pos)[0]
+        key = bytes(data[pos + 4:pos + 4 + length]).decode()
+        value_pos = pos + 4 + length
+        value_pos += -value_pos % 8
+        yield key, struct.unpack_from("d", data, value_pos)[0], value_pos
+        pos = value_pos + 8
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    used = struct.unpack_from("i", data, 0)[0]
+    return [(key, value) for key, value, _ in _iter_entries(data, min(used, len(data)))]
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def multiproc_dir():
+    return getattr(settings, "METRICS_MULTIPROC_DIR", "") or None
+
+
+def get_store():
+    """
+    fork 之后（gunicorn --preload）子进程第一次写时换成自己的文件。
+    """
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                directory = multiproc_dir()
+                if directory:
+                    Path(directory).mkdir(parents=True, exist_ok=True)
+                    _store = _MmapStore(Path(directory) / f"metrics-{pid}.db")
+                else:
+                    _store = _DictStore()
+                _store_pid = pid
+    return _store
+
+
+def _key(sample, labels):
+    return json.dumps([sample, sorted(labels.items())], separators=(",", ":"))
+
+
+# ===== 指标类型 =====
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in _FAMILIES:
+            raise ValueError(f"Duplicate metric {name}.")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _FAMILIES[name] = self
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}.")
+        return {k: str(v) for k, v in labels.items()}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        get_store().inc(_key(self.name + "_total", self._labels(labels)), amount)
+
+
+class Gauge(_Metric):
+    """
+    多进程时按进程求和，只算活着的进程（in-flight 这类用法）。
+    """
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        get_store().inc(_key(self.name, self._labels(labels)), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        store = get_store()
+        # 存的是每个桶自己的计数，输出时再累加成 le 语义
+        le = next(b for b in self.buckets if value <= b)
+        store.inc(_key(self.name + "_bucket", {**labels, "le": _fmt(le)}), 1)
+        store.inc(_key(self.name + "_sum", labels), value)
+        store.inc(_key(self.name + "_count", labels), 1)
+
+
+# ===== 汇总 / 输出 =====
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    {key: value}，多进程时合并目录下所有文件。
+    """
+    directory = multiproc_dir()
+    if not directory:
+        return dict(get_store().items())
+
+    gauges = {name for name, m in _FAMILIES.items() if m.type == "gauge"}
+    totals = {}
+    for path in Path(directory).glob("metrics-*.db"):
+        try:
+            pid = int(path.stem.split("-", 1)[1])
+        except ValueError:
+            continue
+        alive = _pid_alive(pid)
+        for key, value in _read_file(path):
+            if not alive and json.loads(key)[0] in gauges:
+                continue
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def _fmt(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labelstr(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render():
+    samples = {}
+    for key, value in collect().items():
+        sample, labels = json.loads(key)
+        samples.setdefault(sample, []).append((tuple(map(tuple, labels)), value))
+
+    lines = []
+    for name in sorted(_FAMILIES):
+        metric = _FAMILIES[name]
+        exposed = name + "_total" if metric.type == "counter" else name
+        lines.append(f"# HELP {exposed} {metric.documentation}")
+        lines.append(f"# TYPE {exposed} {metric.type}")
+        if metric.type == "counter":
+            for labels, value in sorted(samples.get(name + "_total", [])):
+                lines.append(f"{name}_total{_labelstr(labels)} {_fmt(value)}")
+        elif metric.type == "gauge":
+            for labels, value in sorted(samples.get(name, [])):
+                lines.append(f"{name}{_labelstr(labels)} {_fmt(value)}")
+        else:
+            lines.extend(_render_histogram(metric, samples))
+    return "\n".join(lines) + "\n"
+
+
+def _render_histogram(metric, samples):
+    name = metric.name
+    buckets = {}
+    for labels, value in samples.get(name + "_bucket", []):
+        base = tuple(kv for kv in labels if kv[0] != "le")
+        le = dict(labels)["le"]
+        buckets.setdefault(base, {})[le] = value
+
+    lines = []
+    sums = dict(samples.get(name + "_sum", []))
+    counts = dict(samples.get(name + "_count", []))
+    for base in sorted(counts):
+        cumulative = 0.0
+        for le in metric.buckets:
+            cumulative += buckets.get(base, {}).get(_fmt(le), 0.0)
+            labels = tuple(sorted(base + (("le", _fmt(le)),)))
+            lines.append(f"{name}_bucket{_labelstr(labels)} {_fmt(cumulative)}")
+        lines.append(f"{name}_sum{_labelstr(base)} {_fmt(sums.get(base, 0.0))}")
+        lines.append(f"{name}_count{_labelstr(base)} {_fmt(counts[base])}")
+    return lines
+
+
+# ===== 指标定义 =====
+
+HTTP_REQUESTS = Counter("http_requests", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+DB_QUERIES = Counter("db_queries", "SQL queries executed.", ("alias",))
+DB_QUERY_SECONDS = Counter("db_query_seconds", "Time spent in SQL queries.", ("alias",))
+
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "Outbound LLM call latency.", ("model",), buckets=LLM_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens", "LLM tokens used.", ("model", "kind"))
+LLM_ERRORS = Counter("llm_errors", "Failed or unusable LLM calls.", ("model", "reason"))
+
+ORDERS_CREATED = Counter("orders_created", "Orders created.", ("source",))
+PREFERENCE_UPDATES = Counter("preference_updates", "User tag preference rows changed.", ("op",))
+CACHE_REQUESTS = Counter("cache_requests", "Cache lookups by result (hit rate = hit / all).", ("cache", "result"))
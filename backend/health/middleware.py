@@ -0,0 +1,60 @@
+# health/middleware.py
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import DB_QUERIES, DB_QUERY_SECONDS, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+
+METRICS_PATH = "/metrics"
+
+
+class _QueryTally:
+    def __init__(self, alias):
+        self.alias = alias
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    每个请求：in-flight gauge、按路由（url pattern，不是实际 path）的延迟直方图和状态码计数、
+    各数据库的 SQL 条数 / 耗时。/metrics 自己不计。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == METRICS_PATH:
+            return self.get_response(request)
+
+        tallies = [_QueryTally(conn.alias) for conn in connections.all()]
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn, tally in zip(connections.all(), tallies):
+                    stack.enter_context(conn.execute_wrapper(tally))
+                response = self.get_response(request)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.route if match else "unmatched"
+        HTTP_LATENCY.observe(elapsed, method=request.method, route=route)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        for tally in tallies:
+            if tally.count:
+                DB_QUERIES.inc(tally.count, alias=tally.alias)
+                DB_QUERY_SECONDS.inc(tally.seconds, alias=tally.alias)
+        return response
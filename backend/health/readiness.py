@@ -0,0 +1,126 @@
+# health/readiness.py
+"""
+/readyz 用的依赖检查：数据库连通和延迟（只读副本不算关键依赖）、迁移是否跑完、cache 能否读写、LLM 配置。
+
+结果在进程内缓存 READINESS_CACHE_SECONDS 秒，探针打得再勤也只是偶尔查一次库；
+同一时刻只有一个线程在检查，其它线程直接拿上一次的结果。
+
+下线前摘流量：READINESS_DRAIN_FILE 指向的文件存在（比如 preStop 里 touch 一下），
+或者代码里调用了 start_draining()，/readyz 立即返回 503，不走缓存。
+"""
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+
+_lock = threading.Lock()
+_last = None          # (checked_at, ready, checks)
+_migrated = set()     # 迁移检查通过过的 alias，进程内代码不会变，之后不再查
+_draining = False
+
+
+def start_draining():
+    global _draining
+    _draining = True
+
+
+def is_draining():
+    if _draining:
+        return True
+    drain_file = getattr(settings, "READINESS_DRAIN_FILE", "")
+    return bool(drain_file) and os.path.exists(drain_file)
+
+
+def check_database(alias):
+    started = time.perf_counter()
+    conn = connections[alias]
+    try:
+        conn.close_if_unusable_or_obsolete()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    except DatabaseError as e:
+        # 坏掉的连接丢掉，下一次检查 / 请求会重连
+        conn.close()
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    latency_ms = (time.perf_counter() - started) * 1000
+    limit = getattr(settings, "READINESS_DB_LATENCY_MS", 500)
+    result = {"ok": latency_ms <= limit, "latency_ms": round(latency_ms, 2)}
+    if not result["ok"]:
+        result["error"] = f"latency over {limit} ms"
+    return result
+
+
+def check_migrations(alias):
+    if alias in _migrated:
+        return {"ok": True}
+    try:
+        executor = MigrationExecutor(connections[alias])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    except DatabaseError as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    if plan:
+        return {"ok": False, "error": f"{len(plan)} unapplied migration(s)", "next": str(plan[0][0])}
+    _migrated.add(alias)
+    return {"ok": True}
+
+
+def check_cache():
+    key = f"readyz:{uuid.uuid4().hex}"
+    try:
+        cache.set(key, 1, timeout=10)
+        ok = cache.get(key) == 1
+        cache.delete(key)
+    except Exception as e:  # 各 cache backend 的连接错误没有统一的基类
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": ok} if ok else {"ok": False, "error": "read back mismatch"}
+
+
+def check_llm():
+    # 没配 key 只影响 ai_order，不算 not ready
+    return {"ok": bool(os.getenv("OPENAI_API_KEY")), "critical": False}
+
+
+def run_checks():
+    checks = {}
+    replicas = getattr(settings, "REPLICA_DATABASES", [])
+    for alias in connections:
+        checks[f"db:{alias}"] = check_database(alias)
+        if alias in replicas:
+            # 副本挂了 router 会退回主库，不算 not ready
+            checks[f"db:{alias}"]["critical"] = False
+        elif checks[f"db:{alias}"]["ok"]:
+            checks[f"migrations:{alias}"] = check_migrations(alias)
+    checks["cache"] = check_cache()
+    checks["llm_config"] = check_llm()
+    ready = all(c["ok"] for c in checks.values() if c.get("critical", True))
+    return ready, checks
+
+
+def get_readiness():
+    """
+    返回 (ready, checks, age_seconds)；缓存过期时由拿到锁的那个线程重新检查。
+    """
+    global _last
+    ttl = getattr(settings, "READINESS_CACHE_SECONDS", 2.0)
+    now = time.monotonic()
+    last = _last
+    if last is not None and now - last[0] < ttl:
+        return last[1], last[2], now - last[0]
+
+    if not _lock.acquire(blocking=last is None):
+        return last[1], last[2], now - last[0]
+    try:
+        # 等锁的时候别的线程可能刚查完
+        if _last is not None and time.monotonic() - _last[0] < ttl:
+            return _last[1], _last[2], time.monotonic() - _last[0]
+        ready, checks = run_checks()
+        _last = (time.monotonic(), ready, checks)
+    finally:
+        _lock.release()
+    return ready, checks, 0.0
@@ -1,3 +1,264 @@
-from django.test import TestCase
+import json
+import os
+import pstats
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import path
+
+from server.profiling import timed
+
+from . import metrics, readiness
+
+
+def profiled_view(request):
+    # 同样的查询两次（重复），再换个参数一次（相似），外加一段 llm
+    User.objects.filter(pk=1).exists()
+    User.objects.filter(pk=1).exists()
+    User.objects.filter(pk=2).exists()
+    with timed("llm"):
+        pass
+    return HttpResponse("ok")
+
+
+# ProfilingTests 用 ROOT_URLCONF="health.tests"
+urlpatterns = [path("profiled/", profiled_view)]
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsAuthTests(TestCase):
+    def get(self, auth):
+        return self.client.get("/metrics", HTTP_AUTHORIZATION=auth)
+
+    def test_token(self):
+        self.assertEqual(self.get("Bearer s3cret").status_code, 200)
+        self.assertEqual(self.get("Bearer wrong").status_code, 401)
+
+    def test_non_ascii_header(self):
+        self.assertEqual(self.get("Bearer s3crét").status_code, 401)
+
+
+class MetricsStoreTests(TestCase):
+    """
+    指标的输出格式、mmap 存储和多进程汇总（health/metrics.py）。
+    """
+
+    def setUp(self):
+        # 测试里定义的指标不留在全局注册表里；每个测试用自己的 store
+        self.enterContext(mock.patch.dict(metrics._FAMILIES, clear=True))
+        self.enterContext(mock.patch.object(metrics, "_store", None))
+        self.enterContext(mock.patch.object(metrics, "_store_pid", None))
+
+    def multiproc_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(METRICS_MULTIPROC_DIR=tmp.name))
+        return tmp.name
+
+    def test_render_counter_gauge(self):
+        orders = metrics.Counter("t_orders", "Orders.", ("source",))
+        in_flight = metrics.Gauge("t_in_flight", "In flight.")
+        orders.inc(source="ai")
+        orders.inc(2, source='we"i\\rd\n')
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+        self.assertEqual(metrics.render(), "\n".join([
+            "# HELP t_in_flight In flight.",
+            "# TYPE t_in_flight gauge",
+            "t_in_flight 1",
+            "# HELP t_orders_total Orders.",
+            "# TYPE t_orders_total counter",
+            't_orders_total{source="ai"} 1',
+            't_orders_total{source="we\\"i\\\\rd\\n"} 2',
+        ]) + "\n")
+
+    def test_render_histogram_cumulative_buckets(self):
+        latency = metrics.Histogram("t_latency", "Latency.", ("route",), buckets=(0.05, 0.01, 1))
+        for value in (0.003, 0.02, 0.02, 7):
+            latency.observe(value, route="a")
+        latency.observe(0.5, route="b")
+        lines = metrics.render().splitlines()
+        self.assertEqual(lines[:2], ["# HELP t_latency Latency.", "# TYPE t_latency histogram"])
+        self.assertEqual(lines[2:8], [
+            't_latency_bucket{le="0.01",route="a"} 1',
+            't_latency_bucket{le="0.05",route="a"} 3',
+            't_latency_bucket{le="1",route="a"} 3',
+            't_latency_bucket{le="+Inf",route="a"} 4',
+            't_latency_sum{route="a"} 7.043',
+            't_latency_count{route="a"} 4',
+        ])
+        self.assertEqual(lines[8:], [
+            't_latency_bucket{le="0.01",route="b"} 0',
+            't_latency_bucket{le="0.05",route="b"} 0',
+            't_latency_bucket{le="1",route="b"} 1',
+            't_latency_bucket{le="+Inf",route="b"} 1',
+            't_latency_sum{route="b"} 0.5',
+            't_latency_count{route="b"} 1',
+        ])
+
+    def test_mmap_store_grows_and_reopens(self):
+        path = os.path.join(self.multiproc_dir(), "metrics-1.db")
+        store = metrics._MmapStore(path)
+        for n in range(5000):
+            store.inc(f"key-{n:05d}-" + "x" * 40, n)
+        store.inc("key-00007-" + "x" * 40, 0.5)
+        self.assertGreater(os.path.getsize(path), metrics._MmapStore.INITIAL_SIZE)
+
+        expected = {f"key-{n:05d}-" + "x" * 40: float(n) for n in range(5000)}
+        expected["key-00007-" + "x" * 40] = 7.5
+        self.assertEqual(dict(store.items()), expected)
+        self.assertEqual(dict(metrics._read_file(path)), expected)
+        # 重新打开（同一个 pid 的文件）接着累加，不重复建 key
+        reopened = metrics._MmapStore(path)
+        reopened.inc("key-04999-" + "x" * 40, 1)
+        self.assertEqual(len(reopened.items()), 5000)
+        self.assertEqual(dict(metrics._read_file(path))["key-04999-" + "x" * 40], 5000.0)
+
+    def test_collect_across_processes(self):
+        directory = self.multiproc_dir()
+        orders = metrics.Counter("t_orders", "Orders.", ("source",))
+        in_flight = metrics.Gauge("t_in_flight", "In flight.")
+        latency = metrics.Histogram("t_latency", "Latency.", buckets=(1,))
+
+        children = []
+        for n in range(3):
+            pid = os.fork()
+            if pid == 0:
+                code = 0
+                try:
+                    orders.inc(n + 1, source="web")
+                    in_flight.inc(10)
+                    latency.observe(0.5)
+                except BaseException:
+                    code = 1
+                finally:
+                    os._exit(code)
+            children.append(pid)
+        for pid in children:
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+        orders.inc(source="web")
+        in_flight.inc(2)
+        latency.observe(3)
+
+        self.assertEqual(len(os.listdir(directory)), 4)
+        totals = metrics.collect()
+        # counter / histogram 把退出的进程也算上，gauge 只算还活着的（本进程）
+        self.assertEqual(totals[metrics._key("t_orders_total", {"source": "web"})], 1 + 2 + 3 + 1)
+        self.assertEqual(totals[metrics._key("t_in_flight", {})], 2)
+        self.assertEqual(totals[metrics._key("t_latency_count", {})], 4)
+        self.assertIn('t_latency_bucket{le="1"} 3', metrics.render())
+        self.assertIn('t_latency_bucket{le="+Inf"} 4', metrics.render())
+
+
+@override_settings(READINESS_CACHE_SECONDS=60)
+class ReadinessTests(TestCase):
+    def setUp(self):
+        # 进程内的缓存结果 / 下线状态每个测试从头开始
+        self.enterContext(mock.patch.object(readiness, "_last", None))
+        self.enterContext(mock.patch.object(readiness, "_draining", False))
+
+    def get(self):
+        return self.client.get("/readyz")
+
+    def expire(self):
+        checked_at, ready, checks = readiness._last
+        readiness._last = (checked_at - 3600, ready, checks)
+
+    def test_drain_file(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        drain_file = os.path.join(tmp.name, "drain")
+
+        with override_settings(READINESS_DRAIN_FILE=drain_file):
+            self.assertEqual(self.get().status_code, 200)
+            # 缓存里是 ready，文件一出现也要立即 503
+            open(drain_file, "w").close()
+            r = self.get()
+            self.assertEqual(r.status_code, 503)
+            self.assertEqual(r.json(), {"status": "draining"})
+            os.unlink(drain_file)
+            self.assertEqual(self.get().status_code, 200)
+
+    def test_start_draining(self):
+        readiness.start_draining()
+        self.assertEqual(self.get().json(), {"status": "draining"})
+
+    def test_failed_checks_are_cached_until_ttl(self):
+        broken = {"ok": False, "error": "ConnectionError: down"}
+        with mock.patch.object(readiness, "check_cache", return_value=broken) as check:
+            r = self.get()
+            self.assertEqual(r.status_code, 503)
+            self.assertEqual(r.json()["status"], "unready")
+            self.assertEqual(r.json()["checks"]["cache"], broken)
+
+            # TTL 之内不再检查，cache 恢复了也还是上一次的失败结果
+            check.return_value = {"ok": True}
+            r = self.get()
+            self.assertEqual(r.status_code, 503)
+            self.assertEqual(r.json()["checks"]["cache"], broken)
+            self.assertEqual(check.call_count, 1)
+
+            self.expire()
+            r = self.get()
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.json()["checks"]["cache"], {"ok": True})
+            self.assertEqual(check.call_count, 2)
+
+    def test_non_critical_failure_stays_ready(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            r = self.get()
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["checks"]["llm_config"], {"ok": False, "critical": False})
+
+
+@override_settings(ROOT_URLCONF="health.tests", PROFILING_TOKEN="s3cret", PROFILING_SAMPLE_RATE=0.0)
+@modify_settings(MIDDLEWARE={"prepend": "server.profiling.ProfilingMiddleware"})
+class ProfilingTests(TestCase):
+    """
+    server/profiling.py：Server-Timing、日志里的重复 / 相似 SQL、X-Profile 强制 cProfile。
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.profile_dir = tmp.name
+        self.enterContext(override_settings(PROFILING_DIR=self.profile_dir))
+
+    def get(self, **headers):
+        with self.assertLogs("server.profiling", "INFO") as logs:
+            r = self.client.get("/profiled/", **headers)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+        return r, json.loads(logs.records[0].getMessage())
+
+    def test_server_timing_and_log(self):
+        r, record = self.get()
+        timing = [part.split(";")[0] for part in r["Server-Timing"].split(", ")]
+        self.assertEqual(timing, ["total", "db", "llm"])
+        self.assertIn('desc="3 queries"', r["Server-Timing"])
+
+        self.assertEqual(record["queries"], 3)
+        self.assertEqual(record["duplicate_queries"], 1)
+        self.assertEqual([d["count"] for d in record["duplicates"]], [2])
+        self.assertEqual(record["similar_queries"], 2)
+        self.assertEqual([d["count"] for d in record["similar"]], [3])
+        self.assertIn("llm_ms", record)
+        self.assertIsNone(record["cprofile"])
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_token_forces_cprofile_dump(self):
+        _, record = self.get(HTTP_X_PROFILE="s3cret")
+        self.assertTrue(record["cprofile"].startswith(self.profile_dir))
+        self.assertEqual(os.listdir(self.profile_dir), [os.path.basename(record["cprofile"])])
+        self.assertGreater(pstats.Stats(record["cprofile"]).total_calls, 0)
+
+    def test_wrong_or_non_ascii_token(self):
+        for value in ("wrong", "s3crét"):
+            _, record = self.get(HTTP_X_PROFILE=value)
+            self.assertIsNone(record["cprofile"])
+        self.assertEqual(os.listdir(self.profile_dir), [])
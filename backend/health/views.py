@@ -1,4 +1,40 @@
-from django.http import JsonResponse
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from .metrics import render
+from .readiness import get_readiness, is_draining
+
 
 def healthz(request):
+    """
+    liveness：进程还能响应就行，不碰任何依赖。
+    """
     return JsonResponse({"status": "ok"})
+
+
+def readyz(request):
+    """
+    readiness：依赖检查（结果短暂缓存），下线中直接 503。
+    """
+    if is_draining():
+        return JsonResponse({"status": "draining"}, status=503)
+    ready, checks, age = get_readiness()
+    return JsonResponse(
+        {"status": "ready" if ready else "unready", "checks": checks, "age_s": round(age, 3)},
+        status=200 if ready else 503,
+    )
+
+
+def metrics(request):
+    """
+    Prometheus 抓取用。设置了 METRICS_TOKEN 时要带 Authorization: Bearer <token>。
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        # 比 bytes：header 里有非 ASCII 字符时 compare_digest(str, str) 会抛 TypeError
+        if not hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+            return HttpResponse(status=401)
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from restaurants.menu import bump_menu_version
 from restaurants.models import Restaurant, Item
 
 class Command(BaseCommand):
@@ -8,6 +9,8 @@ class Command(BaseCommand):
             google_place_id="ChIJ-demo-001",
             defaults=dict(name="Demo Thai", latitude=47.620500, longitude=-122.349300, address="Seattle, WA"),
         )
-        Item.objects.get_or_create(restaurant=r, name="Spicy Chicken Bowl", defaults=dict(price=12.99))
-        Item.objects.get_or_create(restaurant=r, name="Green Curry", defaults=dict(price=13.49))
+        _, created_bowl = Item.objects.get_or_create(restaurant=r, name="Spicy Chicken Bowl", defaults=dict(price=12.99))
+        _, created_curry = Item.objects.get_or_create(restaurant=r, name="Green Curry", defaults=dict(price=13.49))
+        if created_bowl or created_curry:
+            bump_menu_version(r.id)
         self.stdout.write(self.style.SUCCESS("Seeded demo restaurant & items"))
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from restaurants.menu import bump_menu_version
 from restaurants.models import Restaurant, Item
 from decimal import Decimal
 
@@ -132,6 +133,7 @@ class Command(BaseCommand):
         created_items = 0
         skipped_items = 0
         missing_rest = []
+        touched = set()   # 新加了菜的餐厅，最后统一 bump menu_version
 
         for place_id, items in menu_seed.items():
             try:
@@ -157,6 +159,9 @@ class Command(BaseCommand):
                     is_active=True,
                 )
                 created_items += 1
+                touched.add(r.id)
+
+        bump_menu_version(*touched)
 
         print(f"menu upsert done. created={created_items}, skipped_existing={skipped_items}")
         if missing_rest:
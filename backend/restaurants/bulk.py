@@ -0,0 +1,398 @@
+# restaurants/bulk.py
+"""
+商家批量导入菜单：一次校验全部行，按 (restaurant, name) upsert item，
+每个 tag 维度的 through 表各自一条 DELETE + 一批 bulk INSERT。
+
+每行：name、price 必填；description、is_active、spiciness 和六个 tag 维度只有写了才会覆盖
+（已有 item 没写的列 / 维度保持不变，新 item 用 model 的默认值）。
+tag 可以写 id 或 key，CSV 里多个 tag 用 "|" 分隔。
+
+另外是按条件批量上下架 / 改价 / 加删 tag（apply_bulk_action）。
+"""
+import codecs
+import csv
+import io
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import DecimalField, F, Max, Value
+from django.db.models.functions import Round
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, MultiPartParser
+
+from server.jsoncodec import JSONParser
+
+from .listing import filter_items_by_tags
+from .menu import bump_menu_version
+from .models import Item
+from .tags import ITEM_M2M_TAG_FIELDS, item_tag_through, get_tag_registry
+
+BULK_IMPORT_MAX_ROWS = 20000
+BULK_BATCH_SIZE = 1000
+# CSV 里一个格子放多个 tag 时的分隔符
+CSV_TAG_SEPARATOR = "|"
+
+# 行里的可选列 -> upsert 时覆盖的 Item 字段（price 总是覆盖）
+ITEM_OPTIONAL_FIELDS = {
+    "description": "description",
+    "is_active": "is_active",
+    "spice_levels_id": "spice_levels",
+}
+
+
+class CSVParser(BaseParser):
+    """
+    text/csv：第一行是表头，返回 [{column: value}, ...]
+    """
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding") or "utf-8"
+        return read_csv_rows(decode_csv(stream.read(), encoding))
+
+
+BULK_PARSER_CLASSES = [JSONParser, CSVParser, MultiPartParser]
+
+
+def decode_csv(data, encoding="utf-8"):
+    """
+    上传的 CSV 转成 str；UTF-8 开头的 BOM（Excel 导出的常见）去掉，解不了码的返回 400。
+    """
+    if codecs.lookup(encoding).name == "utf-8":
+        encoding = "utf-8-sig"
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError as e:
+        raise ParseError(f"CSV is not valid {encoding.removesuffix('-sig')} (byte {e.start}); save it as UTF-8.")
+    except LookupError:
+        raise ParseError(f"Unknown charset: {encoding}")
+
+
+def read_csv_rows(text):
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        # 空格子当作没填
+        rows.append({k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip() != ""})
+    return rows
+
+
+def extract_bulk_rows(request):
+    """
+    支持三种上传方式：
+    - application/json: [{...}, ...] 或 {"items": [{...}, ...]}
+    - text/csv: 原始 CSV
+    - multipart: file=<csv 文件>
+    """
+    data = request.data
+    upload = request.FILES.get("file") if hasattr(request, "FILES") else None
+    if upload is not None:
+        return read_csv_rows(decode_csv(upload.read()))
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise serializers.ValidationError("Expected a list of items (or {\"items\": [...]}, or a CSV upload).")
+    return data
+
+
+# ===== 校验 =====
+
+_name_field = serializers.CharField(max_length=120)
+_description_field = serializers.CharField(max_length=255, allow_blank=True)
+_price_field = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0)
+_is_active_field = serializers.BooleanField()
+
+
+def _split_tag_values(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(CSV_TAG_SEPARATOR) if v.strip()]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _resolve_tag(table, value):
+    """
+    tag 可以写 id 也可以写 key。
+    """
+    if isinstance(value, bool):
+        return None
+    # isdecimal 而不是 isdigit："²"、"①" 之类 isdigit 为真但 int() 会抛错
+    if isinstance(value, int) or (isinstance(value, str) and value.isdecimal()):
+        entry = table.get(int(value))
+    else:
+        entry = table.by_key.get(str(value))
+    return entry.id if entry else None
+
+
+def validate_bulk_rows(rows):
+    """
+    返回 (clean_rows, report)。
+    clean_rows: [(row_index, {"name", "price", "description"?, "is_active"?, "spice_levels_id"?, "tags": {field: [ids]}})]
+    report: 每行一个 dict，校验失败的行 status="error"。
+    """
+    registry = get_tag_registry()
+    clean = []
+    report = []
+    seen_names = {}
+
+    for idx, raw in enumerate(rows):
+        errors = {}
+        row = {"tags": {}}
+
+        if not isinstance(raw, dict):
+            report.append({"row": idx, "status": "error", "errors": {"non_field_errors": ["Expected an object."]}})
+            continue
+
+        def check(key, field, required=False):
+            if key not in raw or raw[key] is None:
+                if required:
+                    errors[key] = ["This field is required."]
+                return
+            try:
+                row[key] = field.run_validation(raw[key])
+            except serializers.ValidationError as e:
+                errors[key] = e.detail
+
+        check("name", _name_field, required=True)
+        check("description", _description_field)
+        check("price", _price_field, required=True)
+        check("is_active", _is_active_field)
+
+        for field in ITEM_M2M_TAG_FIELDS:
+            if field not in raw:
+                continue
+            table = registry[field]
+            ids, bad = [], []
+            for value in _split_tag_values(raw[field]):
+                tag_id = _resolve_tag(table, value)
+                (bad if tag_id is None else ids).append(value if tag_id is None else tag_id)
+            if bad:
+                errors[field] = [f"Unknown tag: {v}" for v in bad]
+            else:
+                row["tags"][field] = sorted(set(ids))
+
+        if "spiciness" in raw:
+            values = _split_tag_values(raw["spiciness"])
+            if len(values) > 1:
+                errors["spiciness"] = ["Only one spiciness tag is allowed."]
+            elif not values:
+                row["spice_levels_id"] = None
+            else:
+                tag_id = _resolve_tag(registry["spiciness"], values[0])
+                if tag_id is None:
+                    errors["spiciness"] = [f"Unknown tag: {values[0]}"]
+                else:
+                    row["spice_levels_id"] = tag_id
+
+        name = row.get("name")
+        if name is not None and name in seen_names:
+            errors["name"] = [f"Duplicate name in upload (same as row {seen_names[name]})."]
+        elif name is not None:
+            seen_names[name] = idx
+
+        if errors:
+            report.append({"row": idx, "name": raw.get("name"), "status": "error", "errors": errors})
+        else:
+            clean.append((idx, row))
+            report.append({"row": idx, "name": name, "status": None})
+
+    return clean, report
+
+
+# ===== 写入 =====
+
+def upsert_items(restaurant_id, clean_rows):
+    """
+    在一个事务里 upsert 所有 item 和 tag。返回 {name: (item_id, created)}。
+
+    行里没写的字段（description / is_active / spiciness / 某个 tag 维度）对已有 item 保持不变。
+    """
+    with transaction.atomic():
+        existing = dict(
+            Item.objects.filter(restaurant_id=restaurant_id).values_list("name", "id")
+        )
+
+        # 按写了哪些可选列分批 upsert，每批只覆盖这些列（一般整份上传的列都一样，只有一批）
+        groups = {}
+        for _, row in clean_rows:
+            present = tuple(key for key in ITEM_OPTIONAL_FIELDS if key in row)
+            groups.setdefault(present, []).append(
+                Item(
+                    restaurant_id=restaurant_id,
+                    name=row["name"],
+                    price=row["price"],
+                    **{key: row[key] for key in present},
+                )
+            )
+
+        for present, objs in groups.items():
+            Item.objects.bulk_create(
+                objs,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["restaurant", "name"],
+                update_fields=["price", *(ITEM_OPTIONAL_FIELDS[key] for key in present)],
+            )
+
+        ids = dict(
+            Item.objects.filter(restaurant_id=restaurant_id).values_list("name", "id")
+        )
+        existing_ids = set(existing.values())
+
+        for field in ITEM_M2M_TAG_FIELDS:
+            touched = [
+                (ids[row["name"]], row["tags"][field])
+                for _, row in clean_rows
+                if field in row["tags"]
+            ]
+            if not touched:
+                continue
+            through, item_col, tag_col = item_tag_through(field)
+
+            # 已有 item 的这个维度整体替换；新 item 本来就没有 tag
+            replace_ids = [item_id for item_id, _ in touched if item_id in existing_ids]
+            for start in range(0, len(replace_ids), BULK_BATCH_SIZE):
+                through.objects.filter(
+                    **{f"{item_col}__in": replace_ids[start:start + BULK_BATCH_SIZE]}
+                ).delete()
+
+            through.objects.bulk_create(
+                [
+                    through(**{item_col: item_id, tag_col: tag_id})
+                    for item_id, tag_ids in touched
+                    for tag_id in tag_ids
+                ],
+                batch_size=BULK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+
+        bump_menu_version(restaurant_id)
+
+    return {row["name"]: (ids[row["name"]], row["name"] not in existing) for _, row in clean_rows}
+
+
+# ===== 批量操作（上下架 / 改价 / 加删 tag） =====
+
+def filter_bulk_items(restaurant_id, filters):
+    """
+    filters 是 MerchantItemBulkFilterSerializer 的 validated_data。
+    """
+    qs = Item.objects.filter(restaurant_id=restaurant_id)
+    if "ids" in filters:
+        qs = qs.filter(id__in=filters["ids"])
+    if "active" in filters:
+        qs = qs.filter(is_active=filters["active"])
+    if "min_price" in filters:
+        qs = qs.filter(price__gte=filters["min_price"])
+    if "max_price" in filters:
+        qs = qs.filter(price__lte=filters["max_price"])
+
+    tag_ids = {
+        field: [tag.pk for tag in filters[field]]
+        for field in (*ITEM_M2M_TAG_FIELDS, "spiciness")
+        if filters.get(field)
+    }
+    return filter_items_by_tags(qs, tag_ids)
+
+
+def _tag_ids(tags):
+    return {field: sorted({tag.pk for tag in values}) for field, values in tags.items() if values}
+
+
+def apply_bulk_action(restaurant_id, data):
+    """
+    data 是 MerchantItemBulkActionSerializer 的 validated_data。
+    一个事务里用集合式 UPDATE / DELETE / INSERT 完成，返回各项影响行数。
+    价格越界（超出 max_digits、item_price_nonneg 等）时整体回滚，抛 ValidationError。
+    """
+    action = data["action"]
+    qs = filter_bulk_items(restaurant_id, data["filter"])
+    report = {"action": action}
+
+    try:
+        with transaction.atomic():
+            report["matched"] = qs.count()
+
+            if action in ("activate", "deactivate"):
+                value = action == "activate"
+                report["updated"] = qs.exclude(is_active=value).update(is_active=value)
+
+            elif action == "set_price":
+                report["updated"] = qs.exclude(price=data["price"]).update(price=data["price"])
+
+            elif action == "scale_price":
+                # SQLite 不检查 max_digits，超出范围要自己先算：最贵的那道乘上系数还放得下就都放得下
+                max_price = qs.aggregate(max_price=Max("price"))["max_price"]
+                if max_price is not None and not _price_fits(max_price * data["factor"]):
+                    raise serializers.ValidationError({"price": ["Resulting price is out of range."]})
+                report["updated"] = qs.update(
+                    price=Round(
+                        F("price") * Value(data["factor"], output_field=DecimalField()),
+                        2,
+                        output_field=DecimalField(max_digits=8, decimal_places=2),
+                    )
+                )
+
+            elif action == "add_tags":
+                report["added"] = _add_tags(qs, _tag_ids(data["tags"]))
+                report["updated"] = sum(report["added"].values())
+
+            elif action == "remove_tags":
+                report["removed"] = _remove_tags(qs, _tag_ids(data["tags"]))
+                report["updated"] = sum(report["removed"].values())
+
+            if report["updated"]:
+                bump_menu_version(restaurant_id)
+    except (IntegrityError, DataError):
+        raise serializers.ValidationError({"price": ["Resulting price is out of range."]})
+
+    return report
+
+
+def _price_fits(price):
+    """
+    四舍五入到分之后放得进 Item.price（max_digits / decimal_places）。
+    """
+    field = Item._meta.get_field("price")
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+    return price.quantize(quantum, ROUND_HALF_UP) < Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def _add_tags(qs, tag_ids_by_field):
+    """
+    每个维度：一条查询找出已经有的 (item, tag)，一批 INSERT 补上缺的。返回每个维度新加的行数。
+    """
+    item_ids = list(qs.values_list("id", flat=True))
+    added = {}
+    for field, tag_ids in tag_ids_by_field.items():
+        through, item_col, tag_col = item_tag_through(field)
+        existing = set(
+            through.objects
+            .filter(**{f"{item_col}__in": qs.values("id"), f"{tag_col}__in": tag_ids})
+            .values_list(item_col, tag_col)
+        )
+        rows = [
+            through(**{item_col: item_id, tag_col: tag_id})
+            for item_id in item_ids
+            for tag_id in tag_ids
+            if (item_id, tag_id) not in existing
+        ]
+        through.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+        added[field] = len(rows)
+    return added
+
+
+def _remove_tags(qs, tag_ids_by_field):
+    """
+    每个维度一条 DELETE（item 用子查询限定）。返回每个维度删掉的行数。
+    """
+    removed = {}
+    for field, tag_ids in tag_ids_by_field.items():
+        through, item_col, tag_col = item_tag_through(field)
+        removed[field], _ = through.objects.filter(
+            **{f"{item_col}__in": qs.values("id"), f"{tag_col}__in": tag_ids}
+        ).delete()
+    return removed
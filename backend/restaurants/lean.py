@@ -0,0 +1,135 @@
+# restaurants/lean.py
+"""
+热路径上的只读序列化：不建 model 实例、不走 DRF 每行每字段的 get_attribute / to_representation，
+直接 values_list() 出 tuple，再按预先编译好的转换函数拼 dict。
+
+    ITEM_LEAN = LeanSerializer(ItemSerializer)
+    data = ITEM_LEAN.serialize(Item.objects.filter(restaurant_id=rest_id).order_by("id"))
+
+字段列表、顺序、输出格式都从对应的 ModelSerializer 编译出来（第一次用的时候），
+渲染成 JSON 后和 ModelSerializer(qs, many=True).data 逐字节一致（restaurants/tests.py 里有对照测试）：
+
+- DecimalField：和 DRF 一样按 max_digits / decimal_places quantize 后转字符串；
+- DateTimeField（ISO 8601）：转到字段的时区，isoformat，UTC 写成 "Z"；
+- Char / Integer / Boolean：数据库取出来的值原样用；
+- 其它字段类型用那个字段自己的 to_representation。
+
+只支持直接对应 model 字段的 source（不支持 "a.b"、关系字段、SerializerMethodField）。
+"""
+import decimal
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# 数据库取出来的值已经是输出要的类型
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+UNSUPPORTED_FIELDS = (serializers.RelatedField, serializers.ManyRelatedField, serializers.SerializerMethodField,
+                      serializers.BaseSerializer)
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    quantum = decimal.Decimal(".1") ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return "{:f}".format(value.quantize(quantum, rounding=rounding, context=context))
+
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        # naive datetime 等少见情况交回 DRF
+        if getattr(value, "tzinfo", None) is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def compile_converter(field):
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+class LeanSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = None
+
+    def compile(self):
+        """
+        (输出字段名, values_list 的字段, [(位置, DRF 字段)])，第一次用的时候从 ModelSerializer 编译。
+        """
+        if self._compiled is None:
+            names, sources, convert_fields = [], [], []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, UNSUPPORTED_FIELDS) or "." in field.source or field.source == "*":
+                    raise ValueError(
+                        f"{self.serializer_class.__name__}.{name}: only plain model fields are supported."
+                    )
+                if not isinstance(field, PASSTHROUGH_FIELDS):
+                    convert_fields.append((len(names), field))
+                names.append(name)
+                sources.append(field.source)
+            self._compiled = (tuple(names), tuple(sources), tuple(convert_fields))
+        return self._compiled
+
+    def serialize(self, queryset):
+        """
+        [dict]，和 ModelSerializer(queryset, many=True).data 一致（queryset 自己的排序照旧）。
+        """
+        _, sources, _ = self.compile()
+        to_dict = self._row_builder()
+        return [to_dict(row) for row in queryset.values_list(*sources)]
+
+    def serialize_grouped(self, queryset, field):
+        """
+        {field 的值: [dict, ...]}，一条查询按 field 分组（比如所有餐厅的菜单按 restaurant_id）；
+        组内顺序照 queryset 的排序。
+        """
+        _, sources, _ = self.compile()
+        to_dict = self._row_builder()
+        out = {}
+        for key, *row in queryset.values_list(field, *sources):
+            out.setdefault(key, []).append(to_dict(row))
+        return out
+
+    def _row_builder(self):
+        names, _, convert_fields = self.compile()
+        if not convert_fields:
+            return lambda row: dict(zip(names, row))
+
+        # 转换函数每次调用时生成：datetime 要用当前激活的时区（和 DRF 每次取 default_timezone() 一样）
+        converters = [(i, compile_converter(field)) for i, field in convert_fields]
+
+        def to_dict(row):
+            row = list(row)
+            for i, convert in converters:
+                if row[i] is not None:
+                    row[i] = convert(row[i])
+            return dict(zip(names, row))
+
+        return to_dict
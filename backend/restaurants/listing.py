@@ -0,0 +1,137 @@
+# restaurants/listing.py
+"""
+商家菜单列表：按 (restaurant, id) 做 keyset 分页，tag 固定查询次数。
+
+cursor 是 "restaurant_id:上一页最后一个 item id" 的 base64，只能往后翻；
+Item 的 (restaurant, is_active) 索引在 SQLite / Postgres 里都能直接按 id 顺序扫。
+"""
+import base64
+import binascii
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .models import Item
+from .tags import ITEM_M2M_TAG_FIELDS, item_tag_through, TAG_CATALOG_MODELS
+
+MERCHANT_ITEMS_PAGE_SIZE = 50
+MERCHANT_ITEMS_MAX_PAGE_SIZE = 200
+
+_active_field = serializers.BooleanField()
+
+# 主键 / tag id 都是 64 位有符号整数；更大的数传给 SQLite 会 OverflowError
+ID_MIN, ID_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def _in_id_range(value):
+    return ID_MIN <= value <= ID_MAX
+
+
+def encode_item_cursor(rest_id, item_id):
+    raw = f"{rest_id}:{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_item_cursor(rest_id, cursor):
+    """
+    返回 cursor 里的 item id；cursor 不是这个餐厅的 / 格式不对时抛 ValidationError。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_rest, item_id = (int(v) for v in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise serializers.ValidationError({"cursor": ["Invalid cursor."]})
+    if cursor_rest != int(rest_id) or not _in_id_range(item_id):
+        raise serializers.ValidationError({"cursor": ["Invalid cursor."]})
+    return item_id
+
+
+def _parse_ids(name, value):
+    try:
+        ids = sorted({int(v) for v in value.split(",") if v.strip()})
+    except ValueError:
+        ids = None
+    if ids is None or not all(_in_id_range(v) for v in ids):
+        raise serializers.ValidationError({name: ["Expected comma separated tag ids."]})
+    return ids
+
+
+def parse_page_size(params):
+    value = params.get("limit")
+    if value in (None, ""):
+        return MERCHANT_ITEMS_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise serializers.ValidationError({"limit": ["A valid integer is required."]})
+    if limit < 1:
+        raise serializers.ValidationError({"limit": ["Ensure this value is greater than or equal to 1."]})
+    return min(limit, MERCHANT_ITEMS_MAX_PAGE_SIZE)
+
+
+def filter_merchant_items(qs, params):
+    """
+    ?active=true|false
+    ?cuisines=1,2&flavors=3 ...：每个维度里命中任一 tag 即可，维度之间是 AND
+    ?spiciness=1,2
+    """
+    if params.get("active") not in (None, ""):
+        try:
+            qs = qs.filter(is_active=_active_field.run_validation(params["active"]))
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({"active": e.detail})
+
+    tag_ids = {
+        field: _parse_ids(field, params[field])
+        for field in (*ITEM_M2M_TAG_FIELDS, "spiciness")
+        if params.get(field)
+    }
+    return filter_items_by_tags(qs, tag_ids)
+
+
+def filter_items_by_tags(qs, tag_ids_by_field):
+    """
+    tag_ids_by_field: {"cuisines": [1, 2], "spiciness": [3], ...}
+    每个维度里命中任一 tag 即可，维度之间是 AND。
+    M2M 维度用 through 表子查询，不 join 也不需要 distinct。
+    """
+    for field, tag_ids in tag_ids_by_field.items():
+        if field == "spiciness":
+            qs = qs.filter(spice_levels_id__in=tag_ids)
+            continue
+        through, item_col, tag_col = item_tag_through(field)
+        qs = qs.filter(
+            id__in=through.objects
+            .filter(**{f"{tag_col}__in": tag_ids})
+            .values(item_col)
+        )
+    return qs
+
+
+def list_merchant_items(rest_id, params):
+    """
+    返回 (items, next_cursor)。一页 1 条 item 查询 + 6 条 tag 查询，和页大小无关。
+    """
+    limit = parse_page_size(params)
+    qs = Item.objects.filter(restaurant_id=rest_id)
+    qs = filter_merchant_items(qs, params)
+
+    cursor = params.get("cursor")
+    if cursor:
+        qs = qs.filter(id__gt=decode_item_cursor(rest_id, cursor))
+
+    # tag 只要 id，prefetch 只取主键列
+    qs = qs.order_by("id").prefetch_related(
+        *(
+            Prefetch(field, queryset=TAG_CATALOG_MODELS[field].objects.only("id"))
+            for field in ITEM_M2M_TAG_FIELDS
+        )
+    )
+
+    # 多取一条判断还有没有下一页
+    items = list(qs[: limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_item_cursor(rest_id, items[-1].id)
+    return items, next_cursor
@@ -0,0 +1,40 @@
+# restaurants/management/commands/build_menu_snapshot.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from restaurants.snapshot import snapshot_fingerprint, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the menu snapshot file (restaurants/snapshot.py) that workers mmap. "
+        "With --interval it keeps running and rewrites the file (atomic rename) whenever "
+        "restaurants or menus changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", type=str, default=None, help="Default: MENU_SNAPSHOT_PATH.")
+        parser.add_argument("--interval", type=float, default=0.0, help="Check every N seconds (0 = build once).")
+
+    def handle(self, *args, **options):
+        path = options["path"] or getattr(settings, "MENU_SNAPSHOT_PATH", "")
+        if not path:
+            raise CommandError("No snapshot path; pass --path or set MENU_SNAPSHOT_PATH.")
+
+        built = None
+        while True:
+            fingerprint = snapshot_fingerprint()
+            if fingerprint != built:
+                stats = write_snapshot(path)
+                built = fingerprint
+                self.stdout.write(
+                    f"wrote {path}: {stats['restaurants']} restaurants, {stats['items']} items, "
+                    f"{stats['bytes'] / 1024 / 1024:.1f} MB in {stats['seconds']} s"
+                )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+            close_old_connections()
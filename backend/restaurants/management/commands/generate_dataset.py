@@ -0,0 +1,598 @@
+# restaurants/management/commands/generate_dataset.py
+"""
+压测用的大数据集：餐厅 / 菜品（带 tag）/ 用户 + profile / 历史订单 / 偏好分。
+
+- 同样的参数（--seed、数量、--until）生成同样的数据，和 --workers 无关：
+  每个 chunk 用 (seed, 阶段, chunk 起点) 派生自己的 RNG。
+- 主键在开始时按当前 max(id) 预留好，item / order 的 id 可以直接算出来，
+  不用插完再查回来；结束后重置 Postgres 的 sequence。
+- 写入用 executemany，分 chunk 提交，chunk 分给多个进程并行。
+"""
+import math
+import multiprocessing
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import UserProfile, UserTagPreference
+from restaurants.menu import bump_menu_version
+from restaurants.models import Item, Order, OrderItem, Restaurant
+from restaurants.tags import ITEM_M2M_TAG_FIELDS, TAG_CATALOG_MODELS, item_tag_through
+
+RESTAURANTS_PER_CHUNK = 200
+USERS_PER_CHUNK = 5000
+INSERT_BATCH_SIZE = 5000
+
+# UserTagPreference.dimension -> 订单里 item 上对应的字段（allergens 不计入偏好）
+PREF_ITEM_FIELDS = {
+    "cuisine": "cuisines",
+    "flavor": "flavors",
+    "nutrition": "nutritions",
+    "protein": "proteins",
+    "spice": "spice_levels",
+    "meal_type": "meal_types",
+}
+
+NAME_ADJECTIVES = [
+    "Golden", "Lucky", "Happy", "Red", "Green", "Little", "Big", "Royal",
+    "Urban", "Old Town", "Sunny", "Blue", "Silver", "Spicy", "Fresh", "Cozy",
+]
+NAME_NOUNS = [
+    "Dragon", "Garden", "Kitchen", "House", "Table", "Bowl", "Spoon", "Grill",
+    "Corner", "Bistro", "Express", "Noodle Bar", "Diner", "Cafe", "Eatery", "Wok",
+]
+DISH_WORDS = [
+    "Bowl", "Plate", "Combo", "Special", "Wrap", "Salad", "Soup", "Curry",
+    "Noodles", "Rice", "Burger", "Taco", "Roll", "Skewers", "Stir Fry", "Platter",
+]
+
+
+def skewed_weights(n, rng):
+    """
+    长尾分布：打乱后按 1/(k+1) 给权重，少数几个 tag 很常见，其余偶尔出现。
+    """
+    order = list(range(n))
+    rng.shuffle(order)
+    weights = [0.0] * n
+    for rank, idx in enumerate(order):
+        weights[idx] = 1.0 / (rank + 1)
+    return weights
+
+
+def chunk_rng(seed, phase, start):
+    return random.Random(f"{seed}:{phase}:{start}")
+
+
+def insert_rows(model, fields, rows):
+    """
+    executemany 写入，fields 是 model 字段名（写 column）。
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    opts = model._meta
+    columns = ", ".join(qn(opts.get_field(f).column) for f in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    sql = f"INSERT INTO {qn(opts.db_table)} ({columns}) VALUES ({placeholders})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH_SIZE])
+
+
+class Plan:
+    """
+    主进程算好、传给 worker 的全部参数（要能 pickle）。
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def rest_id(self, r):
+        return self.rest_base + r
+
+    def item_id(self, r, j):
+        return self.item_base + r * self.items_per_restaurant + j
+
+    def user_id(self, u):
+        return self.user_base + u
+
+    def profile_id(self, u):
+        return self.profile_base + u
+
+
+# ===== 每个阶段一个 chunk 的工作（在 worker 进程里跑） =====
+
+def build_restaurants(plan, lo, hi):
+    """
+    餐厅 [lo, hi)：位置（几个热点 + 均匀撒点）、主菜系、菜品和 tag。
+    """
+    rng = chunk_rng(plan.seed, "restaurants", lo)
+    now = plan.now_db
+    tags = plan.tag_ids
+    weights = plan.tag_weights
+
+    restaurants = []
+    items = []
+    through_rows = {field: [] for field in ITEM_M2M_TAG_FIELDS}
+
+    for r in range(lo, hi):
+        lat, lng = plan_location(plan, rng)
+        cuisine = rng.choices(tags["cuisines"], weights=weights["cuisines"])[0]
+        name = f"{rng.choice(NAME_ADJECTIVES)} {rng.choice(NAME_NOUNS)} {plan.cuisine_labels[cuisine]} #{r}"
+        restaurants.append((
+            plan.rest_id(r),
+            plan.owner_id,
+            name[:120],
+            f"{plan.prefix}-place-{r}",
+            lat,
+            lng,
+            f"{rng.randint(100, 29999)} {rng.choice(NAME_NOUNS)} Ave, Seattle, WA",
+            rng.random() < 0.97,
+            now,
+            0,
+        ))
+
+        for j in range(plan.items_per_restaurant):
+            item_id = plan.item_id(r, j)
+            # 价格近似对数正态，中位数 ~$12
+            price = min(max(rng.lognormvariate(math.log(12), 0.45), 1.0), 80.0)
+            price = Decimal(int(price)) + rng.choice((Decimal("0.49"), Decimal("0.99"), Decimal("0.00")))
+            items.append((
+                item_id,
+                plan.rest_id(r),
+                f"{plan.cuisine_labels[cuisine]} {rng.choice(DISH_WORDS)} {j + 1}",
+                "Generated item for benchmarking.",
+                price,
+                rng.random() < 0.95,
+                now,
+                rng.choices(tags["spiciness"], weights=weights["spiciness"])[0],
+            ))
+
+            picks = {
+                # 大部分菜跟餐厅主菜系一致
+                "cuisines": [cuisine] if rng.random() < 0.85 else pick_tags(rng, plan, "cuisines", 1),
+                "proteins": pick_tags(rng, plan, "proteins", 1 if rng.random() < 0.8 else 2),
+                "meal_types": pick_tags(rng, plan, "meal_types", 1),
+                "flavors": pick_tags(rng, plan, "flavors", rng.choice((1, 2))),
+                "allergens": pick_tags(rng, plan, "allergens", rng.choices((0, 1, 2), weights=(4, 4, 2))[0]),
+                "nutritions": pick_tags(rng, plan, "nutritions", 1 if rng.random() < 0.5 else 0),
+            }
+            for field, tag_ids in picks.items():
+                through_rows[field].extend((item_id, tag_id) for tag_id in tag_ids)
+
+    with transaction.atomic():
+        insert_rows(
+            Restaurant,
+            ["id", "owner", "name", "google_place_id", "latitude", "longitude",
+             "address", "is_active", "created_at", "menu_version"],
+            restaurants,
+        )
+        insert_rows(
+            Item,
+            ["id", "restaurant", "name", "description", "price", "is_active", "created_at", "spice_levels"],
+            items,
+        )
+        for field, rows in through_rows.items():
+            through, item_col, tag_col = item_tag_through(field)
+            insert_rows(through, [item_col, tag_col], rows)
+        # 菜单写入都走 bump_menu_version，菜单快照 / 缓存才认得出来
+        bump_menu_version(*(row[0] for row in restaurants))
+
+    return len(restaurants), len(items)
+
+
+def plan_location(plan, rng):
+    # 70% 落在热点附近，其余在整个半径内均匀分布
+    if rng.random() < 0.7:
+        c_lat, c_lng = rng.choice(plan.hotspots)
+        d_lat = rng.gauss(0, plan.radius_deg / 8)
+        d_lng = rng.gauss(0, plan.radius_deg / 8) / plan.lng_scale
+        lat, lng = c_lat + d_lat, c_lng + d_lng
+    else:
+        dist = plan.radius_deg * math.sqrt(rng.random())
+        angle = rng.uniform(0, 2 * math.pi)
+        lat = plan.center[0] + dist * math.sin(angle)
+        lng = plan.center[1] + dist * math.cos(angle) / plan.lng_scale
+    return Decimal(f"{lat:.6f}"), Decimal(f"{lng:.6f}")
+
+
+def pick_tags(rng, plan, field, k):
+    tags = plan.tag_ids[field]
+    k = min(k, len(tags))
+    if k <= 0:
+        return []
+    picked = set()
+    while len(picked) < k:
+        picked.add(rng.choices(tags, weights=plan.tag_weights[field])[0])
+    return sorted(picked)
+
+
+def build_users(plan, lo, hi):
+    rng = chunk_rng(plan.seed, "users", lo)
+    now = plan.now_db
+    users = []
+    profiles = []
+    for u in range(lo, hi):
+        users.append((
+            plan.user_id(u), plan.password_hash, False, f"{plan.prefix}-user-{u}",
+            "", "", "", False, True, now,
+        ))
+        gender = rng.choice(("male", "female", "other", ""))
+        profiles.append((
+            plan.profile_id(u),
+            plan.user_id(u),
+            "customer",
+            Decimal(f"{rng.gauss(170, 10):.2f}"),
+            Decimal(f"{rng.gauss(70, 14):.2f}"),
+            rng.randint(18, 75),
+            gender,
+            rng.choice(("sedentary", "light", "active", "athlete", "")),
+            "",
+            now,
+            now,
+            0,
+            0,
+        ))
+
+    with transaction.atomic():
+        insert_rows(
+            get_user_model(),
+            ["id", "password", "is_superuser", "username", "first_name", "last_name",
+             "email", "is_staff", "is_active", "date_joined"],
+            users,
+        )
+        insert_rows(
+            UserProfile,
+            ["id", "user", "user_type", "height_cm", "weight_kg", "age", "gender",
+             "activity_level", "memo", "created_at", "updated_at", "token_version", "prefs_version"],
+            profiles,
+        )
+    return len(users)
+
+
+def build_orders(plan, lo, hi, order_counts, order_start):
+    """
+    餐厅 [lo, hi) 的历史订单，order_counts[i] 是第 lo+i 家的订单数，
+    order_start 是这批订单的第一个序号（决定 order id）。
+
+    偏好分跟下单时的逻辑一样（非 cancelled 订单里每个 tag 按数量累加，allergens 不算），
+    在这里顺便累加，最后用 upsert 加到 UserTagPreference 上（同一个用户的订单会分散在多个 chunk）。
+    """
+    rng = chunk_rng(plan.seed, "orders", lo)
+    user_cum = user_activity_cum_weights(plan)
+
+    item_lo, item_hi = plan.item_id(lo, 0), plan.item_id(hi, 0)
+    prices = {}
+    item_prefs = {}
+    for item_id, price, spice_id in (
+        Item.objects
+        .filter(id__gte=item_lo, id__lt=item_hi)
+        .values_list("id", "price", "spice_levels_id")
+    ):
+        prices[item_id] = price
+        item_prefs[item_id] = [("spice", spice_id)] if spice_id is not None else []
+    for dim, field in PREF_ITEM_FIELDS.items():
+        if field == "spice_levels":
+            continue
+        through, item_col, tag_col = item_tag_through(field)
+        for item_id, tag_id in (
+            through.objects
+            .filter(**{f"{item_col}__gte": item_lo, f"{item_col}__lt": item_hi})
+            .values_list(item_col, tag_col)
+        ):
+            item_prefs[item_id].append((dim, tag_id))
+
+    orders = []
+    order_items = []
+    scores = {}
+    order_id = plan.order_base + order_start
+    span = plan.history_days * 86400
+    for r, count in zip(range(lo, hi), order_counts):
+        for _ in range(count):
+            u = rng.choices(range(plan.users), cum_weights=user_cum)[0]
+            created = plan.until - timedelta(seconds=rng.randrange(span))
+            status = rng.choices(("completed", "pending", "cancelled"), weights=(90, 5, 5))[0]
+
+            total = Decimal("0.00")
+            k = min(plan.items_per_restaurant, rng.choice((1, 1, 2, 2, 3, 4)))
+            for j in rng.sample(range(plan.items_per_restaurant), k=k):
+                item_id = plan.item_id(r, j)
+                qty = rng.choices((1, 2, 3), weights=(70, 22, 8))[0]
+                price = prices[item_id]
+                total += price * qty
+                order_items.append((order_id, item_id, qty, price))
+                if status != "cancelled":
+                    profile_id = plan.profile_id(u)
+                    for dim, tag_id in item_prefs[item_id]:
+                        key = (profile_id, dim, tag_id)
+                        scores[key] = scores.get(key, 0) + qty
+
+            orders.append((
+                order_id,
+                plan.user_id(u),
+                plan.rest_id(r),
+                status,
+                total,
+                connection.ops.adapt_datetimefield_value(created),
+            ))
+            order_id += 1
+
+    with transaction.atomic():
+        insert_rows(Order, ["id", "user", "restaurant", "status", "total_price", "created_at"], orders)
+        insert_rows(OrderItem, ["order", "item", "quantity", "price_at_order"], order_items)
+        add_pref_rows(plan, scores)
+    return len(orders)
+
+
+def add_pref_rows(plan, scores):
+    """
+    INSERT ... ON CONFLICT DO UPDATE score = score + excluded.score（SQLite 3.24+ / Postgres）。
+    按 key 排序写，多个进程同时写 Postgres 时加锁顺序一致，不会死锁。
+    """
+    if not scores:
+        return
+    qn = connection.ops.quote_name
+    opts = UserTagPreference._meta
+    table = qn(opts.db_table)
+    profile_col = qn(opts.get_field("profile").column)
+    sql = (
+        f"INSERT INTO {table} ({profile_col}, {qn('dimension')}, {qn('tag_id')}, {qn('score')}, {qn('updated_at')}) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({profile_col}, {qn('dimension')}, {qn('tag_id')}) "
+        f"DO UPDATE SET {qn('score')} = {table}.{qn('score')} + excluded.{qn('score')}"
+    )
+    rows = [(*key, score, plan.now_db) for key, score in sorted(scores.items())]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH_SIZE])
+
+
+def user_activity_cum_weights(plan):
+    """
+    用户活跃度：Pareto 分布，少数用户贡献大部分订单。每个 worker 按同一个 seed 重算。
+    """
+    rng = random.Random(f"{plan.seed}:user-activity")
+    total = 0.0
+    cum = []
+    for _ in range(plan.users):
+        total += rng.paretovariate(1.2)
+        cum.append(total)
+    return cum
+
+
+PHASES = {
+    "restaurants": build_restaurants,
+    "users": build_users,
+    "orders": build_orders,
+}
+
+
+def _init_worker(timeout):
+    if not apps.ready:  # spawn 启动的进程要自己 setup
+        import django
+        django.setup()
+    if connection.vendor == "sqlite":
+        # 多个进程抢同一个 SQLite 文件的写锁，等久一点而不是直接报 locked
+        connection.settings_dict.setdefault("OPTIONS", {})["timeout"] = timeout
+
+
+def _run_task(args):
+    phase, plan, task_args = args
+    return PHASES[phase](plan, *task_args)
+
+
+class Command(BaseCommand):
+    help = "Generate a large deterministic dataset (restaurants, items, users, orders, preferences) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=1000)
+        parser.add_argument("--items-per-restaurant", type=int, default=30)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--orders", type=int, default=50000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=multiprocessing.cpu_count(),
+            help="Worker processes (1 = run inline).",
+        )
+        parser.add_argument(
+            "--center",
+            type=str,
+            default="47.6062,-122.3321",
+            help="lat,lng of the area center (default: Seattle).",
+        )
+        parser.add_argument("--radius-km", type=float, default=25.0)
+        parser.add_argument("--history-days", type=int, default=365)
+        parser.add_argument(
+            "--until",
+            type=str,
+            default=None,
+            help="Latest order date, YYYY-MM-DD (default: today). Part of the determinism.",
+        )
+        parser.add_argument(
+            "--prefix",
+            type=str,
+            default="gen",
+            help="Prefix for generated usernames / place ids.",
+        )
+        parser.add_argument(
+            "--password",
+            type=str,
+            default="bench-pass-123",
+            help="Password for every generated user.",
+        )
+        parser.add_argument(
+            "--owner-id",
+            type=int,
+            default=None,
+            help="User ID for Restaurant.owner (default: no owner).",
+        )
+
+    def handle(self, *args, **options):
+        for key in ("restaurants", "items_per_restaurant", "users"):
+            if options[key] < 1:
+                raise CommandError(f"--{key.replace('_', '-')} must be at least 1.")
+        if options["orders"] < 0:
+            raise CommandError("--orders must not be negative.")
+
+        User = get_user_model()
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-user-").exists():
+            raise CommandError(f"Dataset with prefix {prefix!r} already exists; use another --prefix.")
+        if options["owner_id"] is not None and not User.objects.filter(pk=options["owner_id"]).exists():
+            raise CommandError(f"User with id={options['owner_id']} does not exist.")
+
+        plan = self.make_plan(options)
+        workers = max(1, options["workers"])
+        started = time.monotonic()
+
+        # 1) 餐厅 + 菜品 + tag，2) 用户，3) 订单 + 偏好分（依赖 1、2）
+        rest_chunks = list(range(0, plan.restaurants, RESTAURANTS_PER_CHUNK))
+        user_chunks = list(range(0, plan.users, USERS_PER_CHUNK))
+
+        self.run_phase("restaurants", plan, workers, [
+            (lo, min(lo + RESTAURANTS_PER_CHUNK, plan.restaurants)) for lo in rest_chunks
+        ])
+        self.run_phase("users", plan, workers, [
+            (lo, min(lo + USERS_PER_CHUNK, plan.users)) for lo in user_chunks
+        ])
+
+        counts = self.allocate_orders(plan)
+        order_tasks = []
+        order_start = 0
+        for lo in rest_chunks:
+            hi = min(lo + RESTAURANTS_PER_CHUNK, plan.restaurants)
+            order_tasks.append((lo, hi, counts[lo:hi], order_start))
+            order_start += sum(counts[lo:hi])
+        self.run_phase("orders", plan, workers, order_tasks)
+
+        self.reset_sequences()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done in {elapsed:.1f}s: {plan.restaurants} restaurants, "
+                f"{plan.restaurants * plan.items_per_restaurant} items, {plan.users} users, "
+                f"{sum(counts)} orders. Users log in as {prefix}-user-<n> / {options['password']}."
+            )
+        )
+
+    def make_plan(self, options):
+        try:
+            lat, lng = (float(v) for v in options["center"].split(","))
+        except ValueError:
+            raise CommandError("--center must look like 47.6062,-122.3321")
+
+        if options["until"]:
+            try:
+                until_date = datetime.strptime(options["until"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--until must be YYYY-MM-DD.")
+        else:
+            until_date = timezone.now().date()
+        until = timezone.make_aware(datetime.combine(until_date, dt_time.min), timezone.get_fixed_timezone(0))
+
+        tag_ids = {
+            name: list(model.objects.order_by("id").values_list("id", flat=True))
+            for name, model in TAG_CATALOG_MODELS.items()
+        }
+        if not (tag_ids["cuisines"] and tag_ids["proteins"] and tag_ids["spiciness"]):
+            raise CommandError("Tags not seeded (run seed_tags first).")
+
+        rng = random.Random(f"{options['seed']}:plan")
+        tag_weights = {name: skewed_weights(len(ids), rng) for name, ids in tag_ids.items()}
+
+        radius_deg = options["radius_km"] / 111.0
+        lng_scale = math.cos(math.radians(lat))
+        hotspots = []
+        for _ in range(max(3, options["restaurants"] // 500)):
+            dist = radius_deg * 0.7 * math.sqrt(rng.random())
+            angle = rng.uniform(0, 2 * math.pi)
+            hotspots.append((lat + dist * math.sin(angle), lng + dist * math.cos(angle) / lng_scale))
+
+        def next_id(model):
+            return (model.objects.aggregate(m=Max("id"))["m"] or 0) + 1
+
+        return Plan(
+            seed=options["seed"],
+            prefix=options["prefix"],
+            restaurants=options["restaurants"],
+            items_per_restaurant=options["items_per_restaurant"],
+            users=options["users"],
+            orders=options["orders"],
+            history_days=max(1, options["history_days"]),
+            until=until,
+            now_db=connection.ops.adapt_datetimefield_value(until),
+            owner_id=options["owner_id"],
+            password_hash=make_password(options["password"]),
+            center=(lat, lng),
+            radius_deg=radius_deg,
+            lng_scale=lng_scale,
+            hotspots=hotspots,
+            tag_ids=tag_ids,
+            tag_weights=tag_weights,
+            cuisine_labels=dict(TAG_CATALOG_MODELS["cuisines"].objects.values_list("id", "label")),
+            rest_base=next_id(Restaurant),
+            item_base=next_id(Item),
+            user_base=next_id(get_user_model()),
+            profile_base=next_id(UserProfile),
+            order_base=next_id(Order),
+        )
+
+    def allocate_orders(self, plan):
+        """
+        按餐厅热度（Pareto）把 --orders 分给各家，最大余数法保证总数精确。
+        """
+        rng = random.Random(f"{plan.seed}:popularity")
+        weights = [rng.paretovariate(1.5) for _ in range(plan.restaurants)]
+        total = sum(weights)
+        raw = [plan.orders * w / total for w in weights]
+        counts = [int(x) for x in raw]
+        remainder = plan.orders - sum(counts)
+        by_fraction = sorted(range(plan.restaurants), key=lambda i: raw[i] - counts[i], reverse=True)
+        for i in by_fraction[:remainder]:
+            counts[i] += 1
+        return counts
+
+    def run_phase(self, phase, plan, workers, tasks):
+        started = time.monotonic()
+        jobs = [(phase, plan, task) for task in tasks]
+        done = 0
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                _run_task(job)
+                done += 1
+                self.report(phase, done, len(jobs), started)
+            return
+
+        # 子进程自己连库：fork 之前把主进程的连接关掉，避免共用一个 socket
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(600,)) as pool:
+            for _ in pool.imap_unordered(_run_task, jobs):
+                done += 1
+                self.report(phase, done, len(jobs), started)
+
+    def report(self, phase, done, total, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.WARNING(f"[{phase}] {done}/{total} chunks ({elapsed:.1f}s)"))
+
+    def reset_sequences(self):
+        # 主键是自己指定的，Postgres 的 sequence 要跟上（SQLite 不需要，返回空）
+        models = [Restaurant, Item, get_user_model(), UserProfile, Order]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
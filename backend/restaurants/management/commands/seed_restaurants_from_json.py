@@ -1,26 +1,144 @@
 # restaurants/management/commands/seed_restaurants_from_json.py
 import json
+import os
 import random
+import re
+import time
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from restaurants.menu import bump_menu_version
+from restaurants.models import Restaurant, Item
+from restaurants.preload import invalidate_restaurant_directory
+from restaurants.tags import ITEM_M2M_TAG_FIELDS, get_tag_registry, item_tag_through
+
+READ_SIZE = 1 << 16
+# 顶层是 dict 时，places 数组所在的 key
+PLACES_ARRAY_RE = re.compile(r'"(?:places|results)"\s*:\s*\[')
+
+ITEMS_PER_PLACE = 3
+
+
+def iter_places(f):
+    """
+    边读边解析：顶层是 [...]，或者 {"places": [...]} / {"results": [...]}，
+    每次只把一个 place 解析成 dict，内存占用和文件大小无关。
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_SIZE)
+    eof = not buf
+
+    # 找到数组开头
+    while True:
+        stripped = buf.lstrip()
+        if stripped.startswith("["):
+            pos = len(buf) - len(stripped) + 1
+            break
+        if stripped.startswith("{"):
+            m = PLACES_ARRAY_RE.search(buf)
+            if m:
+                pos = m.end()
+                break
+        elif stripped:
+            raise CommandError("JSON format not recognized.")
+        if eof:
+            raise CommandError("JSON format not recognized.")
+        chunk = f.read(READ_SIZE)
+        eof = not chunk
+        buf += chunk
+
+    while True:
+        # 跳过空白和逗号
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        if pos >= len(buf):
+            raise CommandError("Unexpected end of JSON file.")
+        if buf[pos] == "]":
+            return
 
-from restaurants.models import (
-    Restaurant,
-    Item,
-    CuisineTag,
-    ProteinTag,
-    SpicinessTag,
-    MealTypeTag,
-    FlavorTag,
-    AllergenTag,
-    NutritionTag,
-)
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError(f"Invalid JSON near: {buf[pos:pos + 80]!r}")
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+
+        yield obj
+        pos = end
+        # 已经解析过的部分丢掉，buffer 不会无限变大
+        if pos > READ_SIZE:
+            buf = buf[pos:]
+            pos = 0
+
+
+def parse_place(place):
+    """
+    Google Places struct：
+    {
+      "id": "...",
+      "displayName": {"text": "Restaurant Name"},
+      "formattedAddress": "...",
+      "location": {"latitude": xx, "longitude": yy}
+    }
+    返回 (place_id, fields) 或 (None, 跳过原因)。
+    """
+    place_id = place.get("id") or place.get("place_id")
+    if not place_id:
+        return None, "place has no id"
+
+    display_name = place.get("displayName") or {}
+    if isinstance(display_name, dict):
+        name = display_name.get("text") or display_name.get("name") or ""
+    else:
+        name = str(display_name)
+
+    loc = place.get("location") or {}
+    lat = loc.get("latitude")
+    lng = loc.get("longitude")
+    if lat is None or lng is None:
+        return None, f"place {place_id} has no lat/lng"
+
+    return place_id, {
+        "name": (name or "Unknown Restaurant")[:120],
+        "address": (place.get("formattedAddress") or place.get("vicinity") or "")[:400],
+        "latitude": Decimal(str(lat)).quantize(Decimal("0.000001")),
+        "longitude": Decimal(str(lng)).quantize(Decimal("0.000001")),
+    }
+
+
+def insert_through_rows(through, item_col, tag_col, pairs):
+    """
+    through 表一次 executemany：几十万行时比 bulk_create 构造 model 实例快一个数量级。
+    调用前已经删掉了旧行，(item, tag) 不会重复。
+    """
+    if not pairs:
+        return
+    qn = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {qn(through._meta.db_table)} ({qn(item_col)}, {qn(tag_col)}) "
+        "VALUES (%s, %s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, pairs)
 
 
 class Command(BaseCommand):
-    help = "Seed restaurants & items from a Google Places JSON file."
+    help = "Seed restaurants & items from a Google Places JSON file (streamed, batched, resumable)."
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -35,172 +153,218 @@ class Command(BaseCommand):
             default=6,
             help="User ID for Restaurant.owner (merchant).",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Places per transaction.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip places already committed by a previous run (see --checkpoint).",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="Progress file, default <file>.progress. Removed after a full run.",
+        )
 
     def handle(self, *args, **options):
         json_path = options["file"]
         owner_id = options["owner_id"]
+        chunk_size = max(1, options["chunk_size"])
+        checkpoint = options["checkpoint"] or f"{json_path}.progress"
 
         User = get_user_model()
-        try:
-            owner = User.objects.get(pk=owner_id)
-        except User.DoesNotExist:
+        if not User.objects.filter(pk=owner_id).exists():
             raise CommandError(f"User with id={owner_id} does not exist.")
-
-        # reading from file
-        self.stdout.write(self.style.WARNING(f"Loading JSON from: {json_path}"))
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if isinstance(data, dict):
-            places = data.get("places") or data.get("results") or []
-        elif isinstance(data, list):
-            places = data
-        else:
-            raise CommandError("JSON format not recognized.")
-
-        self.stdout.write(self.style.WARNING(f"Found {len(places)} places in JSON"))
+        self.owner_id = owner_id
+        self.verbosity = options["verbosity"]
 
         # all avaliable tags
-        cuisine_tags = list(CuisineTag.objects.all())
-        protein_tags = list(ProteinTag.objects.all())
-        spiciness_tags = list(SpicinessTag.objects.all())
-        meal_type_tags = list(MealTypeTag.objects.all())
-        flavor_tags = list(FlavorTag.objects.all())
-        allergen_tags = list(AllergenTag.objects.all())
-        nutrition_tags = list(NutritionTag.objects.all())
+        registry = get_tag_registry(force=True)
+        self.tag_ids = {
+            name: [e.id for e in registry[name].ordered]
+            for name in (*ITEM_M2M_TAG_FIELDS, "spiciness")
+        }
 
         # double check tags exist
-        if not cuisine_tags or not protein_tags or not spiciness_tags:
+        if not (self.tag_ids["cuisines"] and self.tag_ids["proteins"] and self.tag_ids["spiciness"]):
             raise CommandError("Tags not seeded.")
 
-        created_rest_count = 0
-        created_item_count = 0
-
-        for idx, place in enumerate(places):
-            # Google Places struct：
-            # {
-            #   "id": "...",
-            #   "displayName": {"text": "Restaurant Name"},
-            #   "formattedAddress": "...",
-            #   "location": {"latitude": xx, "longitude": yy}
-            # }
-            place_id = place.get("id") or place.get("place_id")
-            if not place_id:
-                self.stdout.write(self.style.WARNING(f"[SKIP] place has no id: {place}"))
-                continue
+        skip = 0
+        if options["resume"] and os.path.exists(checkpoint):
+            with open(checkpoint, "r", encoding="utf-8") as f:
+                skip = int(f.read().strip() or 0)
+            self.stdout.write(self.style.WARNING(f"Resuming after {skip} places"))
 
-            display_name = place.get("displayName") or {}
-            if isinstance(display_name, dict):
-                name = display_name.get("text") or display_name.get("name") or ""
-            else:
-                name = str(display_name)
+        self.stdout.write(self.style.WARNING(f"Streaming JSON from: {json_path}"))
 
-            name = (name or "Unknown Restaurant")[:120]
+        self.created_rest_count = 0
+        self.created_item_count = 0
+        skipped = 0
+        done = skip
+        started = time.monotonic()
 
-            addr = place.get("formattedAddress") or place.get("vicinity") or ""
-            addr = addr[:400]
-
-            loc = place.get("location") or {}
-            lat = loc.get("latitude")
-            lng = loc.get("longitude")
-
-            if lat is None or lng is None:
-                self.stdout.write(self.style.WARNING(f"[SKIP] place {place_id} has no lat/lng"))
-                continue
+        with open(json_path, "r", encoding="utf-8") as f:
+            chunk = []
+            for idx, place in enumerate(iter_places(f)):
+                if idx < skip:
+                    continue
+                chunk.append(place)
+                if len(chunk) >= chunk_size:
+                    skipped += self.write_chunk(chunk)
+                    done = idx + 1
+                    self.save_checkpoint(checkpoint, done)
+                    self.report_progress(done, skip, started)
+                    chunk = []
+
+            if chunk:
+                skipped += self.write_chunk(chunk)
+                done += len(chunk)
+                self.report_progress(done, skip, started)
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
 
-            restaurant, created = Restaurant.objects.get_or_create(
-                google_place_id=place_id,
-                defaults={
-                    "owner": owner,
-                    "name": name,
-                    "address": addr,
-                    "latitude": Decimal(str(lat)),
-                    "longitude": Decimal(str(lng)),
-                    "is_active": True,
-                },
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. {done} places read, {skipped} skipped. "
+                f"Created {self.created_rest_count} restaurants, {self.created_item_count} items."
             )
+        )
 
-            if created:
-                created_rest_count += 1
-                self.stdout.write(self.style.SUCCESS(f"Created restaurant: {restaurant.name}"))
-            else:
-                
-                if restaurant.owner_id is None:
-                    restaurant.owner = owner
-                    restaurant.save(update_fields=["owner"])
-                self.stdout.write(f"Exists restaurant: {restaurant.name}")
-
-            # 3 random items for each restaurant
-            item_base_names = [
-                f"{restaurant.name} Special 1",
-                f"{restaurant.name} Special 2",
-                f"{restaurant.name} Special 3",
-            ]
-
-            for j, item_name in enumerate(item_base_names, start=1):
-                item_name = item_name[:120]
-                price = Decimal("9.99") + Decimal(j - 1) * Decimal("3.00")
-
-                item, item_created = Item.objects.get_or_create(
-                    restaurant=restaurant,
-                    name=item_name,
-                    defaults={
-                        "description": "Auto-generated demo item for seeding menu.",
-                        "price": price,
-                        "is_active": True,
-                    },
-                )
-
-                # random tags for the item
-                if cuisine_tags:
-                    item.cuisines.set([random.choice(cuisine_tags)])
-
-                # proteins
-                if protein_tags:
-                    item.proteins.set([random.choice(protein_tags)])
-
-                # spice_levels
-                if spiciness_tags:
-                    item.spice_levels = random.choice(spiciness_tags)
-
-                # meal_types
-                if meal_type_tags:
-                    item.meal_types.set([random.choice(meal_type_tags)])
-
-                # flavors 1–2
-                if flavor_tags:
-                    flavors_sample = random.sample(
-                        flavor_tags,
-                        k=min(len(flavor_tags), random.choice([1, 2])),
-                    )
-                    item.flavors.set(flavors_sample)
-
-                # allergens 0 or 1
-                if allergen_tags:
-                    if random.random() < 0.7:  # 70% item has allergen
-                        item.allergens.set([random.choice(allergen_tags)])
-                    else:
-                        item.allergens.clear()
+    def save_checkpoint(self, path, done):
+        # 先写临时文件再 rename，中途被杀也不会留下半个文件
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(done))
+        os.replace(tmp, path)
+
+    def report_progress(self, done, skip, started):
+        elapsed = time.monotonic() - started
+        rate = (done - skip) / elapsed if elapsed else 0
+        self.stdout.write(self.style.WARNING(f"Processed {done} places ({rate:.0f}/s)..."))
+
+    def write_chunk(self, places):
+        """
+        一个 chunk 一个事务：restaurant upsert、item upsert、每个 tag 维度一条 DELETE + 一批 INSERT。
+        返回跳过的 place 数。
+        """
+        rows = {}
+        skipped = 0
+        for place in places:
+            place_id, fields = parse_place(place)
+            if place_id is None:
+                skipped += 1
+                if self.verbosity >= 2:
+                    self.stdout.write(self.style.WARNING(f"[SKIP] {fields}"))
+                continue
+            rows[place_id] = fields  # 同一 chunk 里重复的 place 以最后一条为准
 
-                # nutritions
-                if nutrition_tags:
-                    item.nutritions.set([random.choice(nutrition_tags)])
+        if not rows:
+            return skipped
 
-                item.save()
+        with transaction.atomic():
+            place_ids = list(rows)
+            existing = set(
+                Restaurant.objects
+                .filter(google_place_id__in=place_ids)
+                .values_list("google_place_id", flat=True)
+            )
 
-                if item_created:
-                    created_item_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f"  Created item: {item.name} (${item.price})")
+            Restaurant.objects.bulk_create(
+                [
+                    Restaurant(google_place_id=pid, owner_id=self.owner_id, is_active=True, **fields)
+                    for pid, fields in rows.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["google_place_id"],
+                update_fields=["name", "address", "latitude", "longitude"],
+            )
+            # 已有但没有 owner 的餐厅补上 owner
+            Restaurant.objects.filter(
+                google_place_id__in=existing, owner__isnull=True
+            ).update(owner_id=self.owner_id)
+
+            rest_ids = dict(
+                Restaurant.objects
+                .filter(google_place_id__in=place_ids)
+                .values_list("google_place_id", "id")
+            )
+            self.created_rest_count += len(rows) - len(existing)
+
+            self.write_items(rest_ids, rows)
+            bump_menu_version(*rest_ids.values())
+            # bulk upsert 不发 post_save，预加载的餐厅目录要手动失效
+            invalidate_restaurant_directory()
+
+        return skipped
+
+    def write_items(self, rest_ids, rows):
+        # 3 random items for each restaurant
+        items = []
+        for pid, fields in rows.items():
+            for j in range(1, ITEMS_PER_PLACE + 1):
+                items.append(
+                    Item(
+                        restaurant_id=rest_ids[pid],
+                        name=f"{fields['name']} Special {j}"[:120],
+                        description="Auto-generated demo item for seeding menu.",
+                        price=Decimal("9.99") + Decimal(j - 1) * Decimal("3.00"),
+                        is_active=True,
+                        spice_levels_id=random.choice(self.tag_ids["spiciness"]),
                     )
-                else:
-                    self.stdout.write(f"  Updated item tags: {item.name}")
+                )
 
-            if (idx + 1) % 50 == 0:
-                self.stdout.write(self.style.WARNING(f"Processed {idx + 1} places..."))
+        existing_ids = set(
+            Item.objects
+            .filter(restaurant_id__in=rest_ids.values())
+            .values_list("id", flat=True)
+        )
+        # 已有 item 只重新随机 spiciness，名字 / 价格 / 描述保持不变
+        Item.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=["restaurant", "name"],
+            update_fields=["spice_levels"],
+        )
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Done. Created {created_rest_count} restaurants, {created_item_count} items."
-            )
+        wanted = {(it.restaurant_id, it.name) for it in items}
+        all_items = list(
+            Item.objects
+            .filter(restaurant_id__in=rest_ids.values())
+            .values_list("restaurant_id", "name", "id")
         )
+        item_ids = [item_id for rest_id, name, item_id in all_items if (rest_id, name) in wanted]
+        self.created_item_count += len(all_items) - len(existing_ids)
+        replace_ids = [item_id for item_id in item_ids if item_id in existing_ids]
+
+        for field in ITEM_M2M_TAG_FIELDS:
+            through, item_col, tag_col = item_tag_through(field)
+            if replace_ids:
+                through.objects.filter(**{f"{item_col}__in": replace_ids}).delete()
+            insert_through_rows(
+                through,
+                item_col,
+                tag_col,
+                [
+                    (item_id, tag_id)
+                    for item_id in item_ids
+                    for tag_id in self.random_tags(field)
+                ],
+            )
+
+    def random_tags(self, field):
+        tags = self.tag_ids[field]
+        if not tags:
+            return []
+        # flavors 1–2
+        if field == "flavors":
+            return random.sample(tags, k=min(len(tags), random.choice([1, 2])))
+        # allergens 0 or 1
+        if field == "allergens":
+            return [random.choice(tags)] if random.random() < 0.7 else []  # 70% item has allergen
+        return [random.choice(tags)]
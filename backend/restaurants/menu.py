@@ -0,0 +1,32 @@
+from django.db.models import F
+
+from .models import Item, Restaurant
+from .serializers import ITEM_LEAN
+
+
+def bump_menu_version(*restaurant_ids):
+    """
+    菜单有改动时调用（一条 UPDATE）。和改动放在同一个事务里，回滚时版本号一起回滚。
+    """
+    ids = {int(rest_id) for rest_id in restaurant_ids}
+    if not ids:
+        return
+    Restaurant.objects.filter(id__in=ids).update(menu_version=F("menu_version") + 1)
+
+
+def load_menus():
+    """
+    预加载 / 快照用：所有 active 餐厅的 [(id, menu_version)]（id 升序），和
+    {restaurant_id: [item dict]}（ITEM_LEAN，和 items_by_restaurant 的输出一致）。
+
+    先读版本号再读菜单：中间有人改菜单时拿到的是旧版本号配新菜单，用的时候和库里的版本号
+    对不上自然不用；反过来（新版本号配旧菜单）不会发生。
+    """
+    versions = list(
+        Restaurant.objects.filter(is_active=True).order_by("id").values_list("id", "menu_version")
+    )
+    menus = ITEM_LEAN.serialize_grouped(
+        Item.objects.filter(restaurant__is_active=True, is_active=True).order_by("restaurant_id", "id"),
+        "restaurant_id",
+    )
+    return versions, menus
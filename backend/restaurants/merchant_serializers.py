@@ -0,0 +1,262 @@
+# restaurants/merchant_serializers.py
+"""
+商家编辑菜单用的 serializer。只有商家 view 用，单独一个模块，
+restaurants.views 在第一次处理商家请求时才 import（顾客侧的 worker 不用付这份 import 时间）。
+"""
+from django.db import transaction
+from rest_framework import serializers
+
+from .menu import bump_menu_version
+from .models import Item
+from .tags import (
+    ITEM_M2M_TAG_FIELDS,
+    TAG_CATALOG_MODELS,
+    apply_item_tag_diff,
+    cached_item_tag_sets,
+    get_tag_registry,
+    lookup_tag,
+    set_item_tag_cache,
+)
+
+
+class TagField(serializers.PrimaryKeyRelatedField):
+    """
+    tag 的主键字段，校验和构造实例都走进程内的 tag registry，不查库。
+    catalog 是 restaurants.tags.TAG_CATALOG_MODELS 里的维度名。
+    """
+
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        kwargs.setdefault("queryset", TAG_CATALOG_MODELS[catalog].objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            tag_id = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if lookup_tag(self.catalog, tag_id) is None:
+            self.fail("does_not_exist", pk_value=data)
+        return get_tag_registry()[self.catalog].instance(tag_id)
+
+
+class MerchantItemDetailSerializer(serializers.ModelSerializer):
+    cuisines = TagField(
+        "cuisines",
+        many=True,
+        required=False,
+    )
+    proteins = TagField(
+        "proteins",
+        many=True,
+        required=False,
+    )
+    spiciness = TagField(
+        "spiciness",
+        required=False,
+        allow_null=True,
+        source="spice_levels",
+    )
+    meal_types = TagField(
+        "meal_types",
+        many=True,
+        required=False,
+    )
+    flavors = TagField(
+        "flavors",
+        many=True,
+        required=False,
+    )
+    allergens = TagField(
+        "allergens",
+        many=True,
+        required=False,
+    )
+    nutritions = TagField(
+        "nutritions",
+        many=True,
+        required=False,
+    )
+
+    class Meta:
+        model = Item
+        fields = [
+            "id",
+            "restaurant",
+            "name",
+            "description",
+            "price",
+            "is_active",
+            "created_at",
+            "cuisines",
+            "proteins",
+            "spiciness",
+            "meal_types",
+            "flavors",
+            "allergens",
+            "nutritions",
+        ]
+        read_only_fields = ["id", "restaurant", "created_at"]
+
+    def update(self, instance, validated_data):
+        """
+        普通字段一条 UPDATE；tag 的当前值用 view 里 set_item_tag_cache 塞好的那份（没有时查一次），
+        只对有变化的维度做 DELETE / INSERT（不走 M2M .set()），最后给餐厅的 menu_version +1。
+        """
+        desired = {
+            f: {tag.pk for tag in validated_data.pop(f)}
+            for f in ITEM_M2M_TAG_FIELDS
+            if f in validated_data
+        }
+
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if validated_data:
+                instance.save(update_fields=list(validated_data))
+
+            changed = []
+            if desired:
+                current = cached_item_tag_sets(instance, fields=tuple(desired))
+                changed = apply_item_tag_diff(instance.pk, current, desired)
+
+            if validated_data or changed:
+                bump_menu_version(instance.restaurant_id)
+
+        if desired:
+            set_item_tag_cache(instance, desired)
+        return instance
+
+
+
+
+class MerchantItemCreateSerializer(serializers.ModelSerializer):
+    cuisines = TagField(
+        "cuisines",
+        many=True,
+        required=False,
+    )
+    proteins = TagField(
+        "proteins",
+        many=True,
+        required=False,
+    )
+    spiciness = TagField(
+        "spiciness",
+        allow_null=True,
+        required=False,
+        source="spice_levels",
+    )
+    meal_types = TagField(
+        "meal_types",
+        many=True,
+        required=False,
+    )
+    flavors = TagField(
+        "flavors",
+        many=True,
+        required=False,
+    )
+    allergens = TagField(
+        "allergens",
+        many=True,
+        required=False,
+    )
+    nutritions = TagField(
+        "nutritions",
+        many=True,
+        required=False,
+    )
+
+    class Meta:
+        model = Item
+        fields = [
+            "name",
+            "description",
+            "price",
+            "is_active",
+            "cuisines",
+            "proteins",
+            "spiciness",
+            "meal_types",
+            "flavors",
+            "allergens",
+            "nutritions",
+        ]
+
+
+# ====== 商家批量操作 ======
+
+BULK_ITEM_ACTIONS = (
+    "activate",
+    "deactivate",
+    "set_price",
+    "scale_price",
+    "add_tags",
+    "remove_tags",
+)
+
+
+class MerchantItemTagsSerializer(serializers.Serializer):
+    """
+    {"cuisines": [1, 2], "flavors": [3], ...}，批量加/删 tag 用
+    """
+    cuisines = TagField("cuisines", many=True, required=False)
+    proteins = TagField("proteins", many=True, required=False)
+    meal_types = TagField("meal_types", many=True, required=False)
+    flavors = TagField("flavors", many=True, required=False)
+    allergens = TagField("allergens", many=True, required=False)
+    nutritions = TagField("nutritions", many=True, required=False)
+
+
+class MerchantItemBulkFilterSerializer(MerchantItemTagsSerializer):
+    """
+    所有条件是 AND；tag 维度内命中任一即可。什么都不写 = 整个餐厅的菜单。
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    active = serializers.BooleanField(required=False)
+    min_price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    spiciness = TagField("spiciness", many=True, required=False)
+
+    def validate(self, attrs):
+        lo, hi = attrs.get("min_price"), attrs.get("max_price")
+        if lo is not None and hi is not None and lo > hi:
+            raise serializers.ValidationError({"max_price": "Must be greater than or equal to min_price."})
+        return attrs
+
+
+class MerchantItemBulkActionSerializer(serializers.Serializer):
+    """
+    POST /api/merchant/restaurants/<rest_id>/items:batch
+
+    {
+        "filter": {"ids": [1, 2], "cuisines": [3], "min_price": "5.00"},
+        "action": "scale_price",
+        "factor": "1.05"
+    }
+
+    action:
+    - activate / deactivate
+    - set_price: 需要 price
+    - scale_price: 需要 factor，结果四舍五入到分
+    - add_tags / remove_tags: 需要 tags
+    """
+    filter = MerchantItemBulkFilterSerializer(required=False)
+    action = serializers.ChoiceField(choices=BULK_ITEM_ACTIONS)
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    factor = serializers.DecimalField(max_digits=6, decimal_places=4, min_value=0, required=False)
+    tags = MerchantItemTagsSerializer(required=False)
+
+    def validate(self, attrs):
+        action = attrs["action"]
+        if action == "set_price" and "price" not in attrs:
+            raise serializers.ValidationError({"price": "This field is required for set_price."})
+        if action == "scale_price" and "factor" not in attrs:
+            raise serializers.ValidationError({"factor": "This field is required for scale_price."})
+        if action in ("add_tags", "remove_tags") and not any((attrs.get("tags") or {}).values()):
+            raise serializers.ValidationError({"tags": f"At least one tag is required for {action}."})
+        attrs.setdefault("filter", {})
+        return attrs
@@ -25,6 +25,8 @@ class Restaurant(models.Model):
     address = models.CharField(max_length=400, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 菜单（item / item 的 tag）每变一次 +1，给缓存和快照判断是否过期
+    menu_version = models.PositiveIntegerField(default=0)
 
     class Meta:
         indexes = [
@@ -258,4 +260,17 @@ class OrderItem(models.Model):
         unique_together = [("order", "item")]
 
     def __str__(self):
-        return f"{self.quantity} x {self.item.name} (order {self.order_id})"
\ No newline at end of file
+        return f"{self.quantity} x {self.item.name} (order {self.order_id})"
+
+# ===== 进程内缓存的版本号 =====
+
+class CacheVersion(models.Model):
+    """
+    各 worker 进程内缓存（tag registry 等）的版本号。存在库里，所有 worker
+    （不管用不用 Redis）都看得到同一个值；改动时和数据放在同一个事务里 +1。
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.key}={self.version}"
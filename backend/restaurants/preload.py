@@ -0,0 +1,259 @@
+# restaurants/preload.py
+"""
+gunicorn --preload 时在 master 里（fork 之前）load 好的只读数据，worker 之间 copy-on-write 共享，
+不用每个 worker fork 之后各自 warm up、各存一份：
+
+- tag registry：7 张 tag 表（restaurants/tags.py 那份）；
+- 餐厅目录：所有 active 餐厅（名字、地址、坐标）渲染好的 resolve JSON 片段，按 google_place_id 查；
+- 菜单：所有 active 餐厅渲染好的 items JSON，外加各编码预压缩好的版本。
+
+    PRELOAD_SHARED_CACHES=true gunicorn --preload -w 16 server.wsgi
+
+餐厅目录和菜单打包成少数几个大 bytes + array（不是每个餐厅 / 每道菜一堆 Python 对象），load 完
+gc.freeze()：worker 读的时候只改这几个对象头上的引用计数，数据所在的页一直共享。
+
+失效还是按版本号，预加载的那份不改，变了的部分在各 worker 里另外 load（overlay）：
+- tag：get_tag_registry() 照常对版本号，变了在本 worker 重建；
+- 餐厅目录：版本号 restaurants:directory_version（CacheVersion 表，Restaurant 存 / 删时 +1），
+  变了本 worker 重新 load；
+  目录里没有的 place_id（之后 bulk 建的餐厅）查库；
+- 菜单：items_by_restaurant 本来就查了 menu_version，和快照里的不一样就走 cached_json_response。
+"""
+import gc
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import connections, transaction
+from django.http import HttpResponse
+
+from health.metrics import CACHE_REQUESTS
+from server.compression import available_encodings, precompress
+from server.jsoncodec import JSONRenderer
+
+from .menu import load_menus
+from .models import Restaurant
+from .serializers import RESTAURANT_LEAN
+from .tags import bump_cache_version, get_cache_version, get_tag_registry
+
+RESTAURANT_DIRECTORY_VERSION_KEY = "restaurants:directory_version"
+# 每个 worker 最多隔这么久去库里对一次目录版本号
+RESTAURANT_DIRECTORY_CHECK_INTERVAL = 2.0
+
+
+def _pack(values):
+    """
+    [bytes] -> (一个大 bytes, 偏移 array)；第 i 个是 blob[offsets[i]:offsets[i + 1]]。
+    """
+    offsets = array("Q", [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return b"".join(values), offsets
+
+
+class RestaurantDirectory:
+    """
+    resolve 用：google_place_id -> 这个餐厅渲染好的 JSON（和 RESTAURANT_LEAN 逐字节一致）。
+    """
+
+    def __init__(self, version, place_ids, fragments):
+        self.version = version
+        self.index = {place_id: i for i, place_id in enumerate(place_ids)}
+        self.blob, self.offsets = _pack(fragments)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self):
+        return len(self.blob) + self.offsets.itemsize * len(self.offsets)
+
+    def get(self, place_id):
+        i = self.index.get(place_id)
+        if i is None:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    @classmethod
+    def load(cls, version):
+        renderer = JSONRenderer()
+        rows = RESTAURANT_LEAN.serialize(Restaurant.objects.filter(is_active=True).order_by("id"))
+        return cls(
+            version,
+            [row["google_place_id"] for row in rows],
+            [renderer.render(row) for row in rows],
+        )
+
+
+class MenuSnapshot:
+    """
+    items_by_restaurant 用：每个餐厅 (menu_version, 渲染好的 {"items": [...]}, 各编码预压缩的版本)。
+    餐厅 id 升序放在 array 里二分查找；某个编码没有预压缩（太小 / 压了不省）时长度是 0。
+    """
+
+    def __init__(self, rows, encodings):
+        # rows: [(rest_id, menu_version, body, {encoding: bytes})]，按 rest_id 升序
+        self.ids = array("q", (row[0] for row in rows))
+        self.versions = array("q", (row[1] for row in rows))
+        self.encodings = tuple(encodings)
+        self.bodies = _pack([row[2] for row in rows])
+        self.encoded = {
+            enc: _pack([row[3].get(enc, b"") for row in rows]) for enc in self.encodings
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        total = 0
+        for blob, offsets in (self.bodies, *self.encoded.values()):
+            total += len(blob) + offsets.itemsize * len(offsets)
+        return total + self.ids.itemsize * len(self.ids) * 2
+
+    def get(self, rest_id, version):
+        """
+        (body, {encoding: bytes})；没有这个餐厅或者版本对不上时返回 None。
+        """
+        i = bisect_left(self.ids, rest_id)
+        if i == len(self.ids) or self.ids[i] != rest_id or self.versions[i] != version:
+            return None
+        blob, offsets = self.bodies
+        body = blob[offsets[i]:offsets[i + 1]]
+        encoded = {}
+        for enc, (blob, offsets) in self.encoded.items():
+            if offsets[i + 1] > offsets[i]:
+                encoded[enc] = blob[offsets[i]:offsets[i + 1]]
+        return body, encoded
+
+    @classmethod
+    def load(cls):
+        renderer = JSONRenderer()
+        versions, menus = load_menus()
+        rows = []
+        for rest_id, version in versions:
+            body = renderer.render({"items": menus.get(rest_id, [])})
+            rows.append((rest_id, version, body, precompress(body)))
+        return cls(rows, available_encodings())
+
+
+_directory = None   # 没开 preload 时一直是 None
+_directory_checked = 0.0
+_menus = None
+_lock = threading.Lock()
+
+
+def get_restaurant_directory():
+    """
+    预加载的餐厅目录；版本号变了时在本 worker 重新 load 一份。没开 preload 返回 None。
+    """
+    global _directory, _directory_checked
+
+    directory = _directory
+    if directory is None:
+        return None
+    now = time.monotonic()
+    if now - _directory_checked < RESTAURANT_DIRECTORY_CHECK_INTERVAL:
+        return directory
+
+    with _lock:
+        version = get_cache_version(RESTAURANT_DIRECTORY_VERSION_KEY)
+        if _directory.version != version:
+            _directory = RestaurantDirectory.load(version)
+        _directory_checked = now
+        return _directory
+
+
+def invalidate_restaurant_directory():
+    """
+    餐厅增删改后调用：库里的版本号 +1（跟着当前事务），提交后本 worker 立即重新对版本，
+    其它 worker 下次对版本时重新 load 目录。
+    """
+    def recheck():
+        global _directory_checked
+        _directory_checked = 0.0
+
+    bump_cache_version(RESTAURANT_DIRECTORY_VERSION_KEY)
+    transaction.on_commit(recheck)
+
+
+def resolve_response(place_ids):
+    """
+    resolve 的响应（按传入顺序，重复的照样重复），没开 preload 时返回 None。
+    目录里没有的 place_id 查一次库（目录 load 之后才建的餐厅）。
+    """
+    directory = get_restaurant_directory()
+    if directory is None:
+        return None
+
+    # place_id 都是字符串；别的类型本来也匹配不上
+    place_ids = [place_id for place_id in place_ids if isinstance(place_id, str)]
+    fragments = [directory.get(place_id) for place_id in place_ids]
+    missing = {place_id for place_id, fragment in zip(place_ids, fragments) if fragment is None}
+    if missing:
+        renderer = JSONRenderer()
+        qs = Restaurant.objects.filter(is_active=True, google_place_id__in=missing)
+        found = {row["google_place_id"]: renderer.render(row) for row in RESTAURANT_LEAN.serialize(qs)}
+        fragments = [
+            fragment if fragment is not None else found.get(place_id)
+            for place_id, fragment in zip(place_ids, fragments)
+        ]
+
+    body = b'{"restaurants":[' + b",".join(f for f in fragments if f is not None) + b"]}"
+    return HttpResponse(body, content_type="application/json")
+
+
+def menu_response(rest_id, version):
+    """
+    预加载的菜单（版本号一致时），否则返回 None。
+    """
+    menus = _menus
+    entry = menus.get(int(rest_id), version) if menus is not None else None
+    if entry is None:
+        return None
+    CACHE_REQUESTS.inc(cache="menu", result="preloaded")
+    body, encoded = entry
+    response = HttpResponse(body, content_type="application/json")
+    response.precompressed = encoded
+    return response
+
+
+def load_shared_caches():
+    """
+    load tag registry、餐厅目录、菜单快照，返回统计信息。
+    """
+    global _directory, _directory_checked, _menus
+
+    started = time.perf_counter()
+    registry = get_tag_registry(force=True)
+    directory = RestaurantDirectory.load(get_cache_version(RESTAURANT_DIRECTORY_VERSION_KEY))
+    menus = MenuSnapshot.load()
+    with _lock:
+        _directory, _directory_checked, _menus = directory, time.monotonic(), menus
+    return {
+        "tags": sum(len(table.by_id) for table in registry.tables.values()),
+        "restaurants": len(directory),
+        "menus": len(menus),
+        "bytes": directory.nbytes + menus.nbytes,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def unload_shared_caches():
+    global _directory, _menus
+    with _lock:
+        _directory = _menus = None
+
+
+def preload():
+    """
+    server/wsgi.py 在 PRELOAD_SHARED_CACHES 打开时调用（gunicorn --preload 下只在 master 里跑一次）。
+    """
+    stats = load_shared_caches()
+    # master 的数据库连接不能带进 worker（共用一个 socket）；worker 第一次查库时自己连
+    connections.close_all()
+    # 之后 gc 不再扫这些对象，不会因为改 gc 头把共享的页写脏
+    gc.collect()
+    gc.freeze()
+    return stats
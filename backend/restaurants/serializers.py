@@ -7,14 +7,8 @@ from .models import (
     Item, 
     Order, 
     OrderItem, 
-    CuisineTag, 
-    ProteinTag, 
-    SpicinessTag, 
-    MealTypeTag, 
-    FlavorTag, 
-    AllergenTag, 
-    NutritionTag
     )
+from .lean import LeanSerializer
 
 
 class RestaurantSerializer(serializers.ModelSerializer):
@@ -29,6 +23,11 @@ class ItemSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "description", "price", "is_active", "created_at"]
 
 
+# 热路径（resolve、菜单、商家餐厅列表）的只读输出，和上面两个逐字节一致，见 lean.py
+RESTAURANT_LEAN = LeanSerializer(RestaurantSerializer)
+ITEM_LEAN = LeanSerializer(ItemSerializer)
+
+
 # ====== 下单：输入结构 ======
 
 class OrderItemInputSerializer(serializers.Serializer):
@@ -100,30 +99,24 @@ class OrderCreateSerializer(serializers.Serializer):
         items_data = validated_data["items"]
         item_map = validated_data["_items"]
 
-        # 先创建订单（默认 pending，或者你想仍然用 completed 也行）
-        order = Order.objects.create(
-            user=user,
-            restaurant=restaurant,
-            status="pending",                # 如果你模型 default 还是 "completed"，这里会覆盖
-            total_price=Decimal("0.00"),
-        )
-
+        # 先算好每行和总价，订单和所有行各一条 INSERT
         total = Decimal("0.00")
+        lines = []
         for row in items_data:
             it = item_map[row["item_id"]]
             qty = row.get("quantity", 1)
-            line_total = it.price * qty
-
-            OrderItem.objects.create(
-                order=order,
-                item=it,
-                quantity=qty,
-                price_at_order=it.price,
-            )
-            total += line_total
+            total += it.price * qty
+            lines.append(OrderItem(item=it, quantity=qty, price_at_order=it.price))
 
-        order.total_price = total
-        order.save(update_fields=["total_price"])
+        order = Order.objects.create(
+            user_id=user.id,
+            restaurant=restaurant,
+            status="pending",                # 如果你模型 default 还是 "completed"，这里会覆盖
+            total_price=total,
+        )
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
         return order
 
 
@@ -156,117 +149,5 @@ class OrderSerializer(serializers.ModelSerializer):
             "items",
         ]
 
-class MerchantItemDetailSerializer(serializers.ModelSerializer):
-    cuisines = serializers.PrimaryKeyRelatedField(
-        queryset=CuisineTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    proteins = serializers.PrimaryKeyRelatedField(
-        queryset=ProteinTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    spiciness = serializers.PrimaryKeyRelatedField(
-        queryset=SpicinessTag.objects.all(),
-        required=False,
-        allow_null=True,
-        source="spice_levels",
-    )
-    meal_types = serializers.PrimaryKeyRelatedField(
-        queryset=MealTypeTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    flavors = serializers.PrimaryKeyRelatedField(
-        queryset=FlavorTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    allergens = serializers.PrimaryKeyRelatedField(
-        queryset=AllergenTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    nutritions = serializers.PrimaryKeyRelatedField(
-        queryset=NutritionTag.objects.all(),
-        many=True,
-        required=False,
-    )
 
-    class Meta:
-        model = Item
-        fields = [
-            "id",
-            "restaurant",
-            "name",
-            "description",
-            "price",
-            "is_active",
-            "created_at",
-            "cuisines",
-            "proteins",
-            "spiciness",
-            "meal_types",
-            "flavors",
-            "allergens",
-            "nutritions",
-        ]
-        read_only_fields = ["id", "restaurant", "created_at"]
-
-
-
-
-class MerchantItemCreateSerializer(serializers.ModelSerializer):
-    cuisines = serializers.PrimaryKeyRelatedField(
-        queryset=CuisineTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    proteins = serializers.PrimaryKeyRelatedField(
-        queryset=ProteinTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    spiciness = serializers.PrimaryKeyRelatedField(
-        queryset=SpicinessTag.objects.all(),
-        allow_null=True,
-        required=False,
-        source="spice_levels",
-    )
-    meal_types = serializers.PrimaryKeyRelatedField(
-        queryset=MealTypeTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    flavors = serializers.PrimaryKeyRelatedField(
-        queryset=FlavorTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    allergens = serializers.PrimaryKeyRelatedField(
-        queryset=AllergenTag.objects.all(),
-        many=True,
-        required=False,
-    )
-    nutritions = serializers.PrimaryKeyRelatedField(
-        queryset=NutritionTag.objects.all(),
-        many=True,
-        required=False,
-    )
-
-    class Meta:
-        model = Item
-        fields = [
-            "name",
-            "description",
-            "price",
-            "is_active",
-            "cuisines",
-            "proteins",
-            "spiciness",
-            "meal_types",
-            "flavors",
-            "allergens",
-            "nutritions",
-        ]
+# 商家编辑用的 serializer 在 merchant_serializers.py（按需 import）
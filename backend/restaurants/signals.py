@@ -0,0 +1,22 @@
+# restaurants/signals.py
+from django.db.models.signals import post_delete, post_save
+
+from .models import Restaurant
+from .preload import invalidate_restaurant_directory
+from .tags import TAG_CATALOG_MODELS, invalidate_tag_registry
+
+
+def _tag_changed(sender, **kwargs):
+    invalidate_tag_registry()
+
+
+def _restaurant_changed(sender, **kwargs):
+    invalidate_restaurant_directory()
+
+
+def connect_signals():
+    for name, tag_model in TAG_CATALOG_MODELS.items():
+        post_save.connect(_tag_changed, sender=tag_model, dispatch_uid=f"restaurants.tag_saved.{name}")
+        post_delete.connect(_tag_changed, sender=tag_model, dispatch_uid=f"restaurants.tag_deleted.{name}")
+    post_save.connect(_restaurant_changed, sender=Restaurant, dispatch_uid="restaurants.restaurant_saved")
+    post_delete.connect(_restaurant_changed, sender=Restaurant, dispatch_uid="restaurants.restaurant_deleted")
@@ -0,0 +1,342 @@
+# restaurants/snapshot.py
+"""
+菜单快照文件：所有 active 餐厅的菜单（渲染好的 JSON + 各编码预压缩的版本）和 AI 点餐 bundle 要的
+item 列（id、名字、价格、spiciness、各维度 tag id）写成一个二进制文件，worker 用 mmap 读：
+数据在 page cache 里只有一份、不占 Python 堆，取菜单就是文件里的一段切片（memoryview，不拷贝）。
+
+    python manage.py build_menu_snapshot --interval 30          # 后台重建（有改动才重写）
+    MENU_SNAPSHOT_PATH=/var/lib/ez-order/menus.snap gunicorn server.wsgi
+
+文件格式（小端）：
+- header：magic、格式版本、build id、生成时间、餐厅数、item 数、section 数；
+- section 表：(名字, offset, 长度)，每个 section 8 字节对齐；
+- 定长列（int64 / float64）：rest.id（升序，二分查找）、rest.version（menu_version）、
+  rest.items（每个餐厅在 item 列里的起止，n + 1 个）、item.id / item.price / item.spice（0 = 没有）；
+- 变长的都是 blob + "<名字>.off"（n + 1 个 int64 偏移）：menu.<编码>（每个餐厅的菜单，identity 是原文）、
+  item.name（字符串表）按字节偏移；tags.<维度>（每个 item 的 tag id，int64）按个数偏移。
+
+重建写到同目录的临时文件再 os.replace()，换文件是原子的；读的一方隔 SNAPSHOT_CHECK_INTERVAL 秒
+stat 一次，文件换了就重新 mmap（旧的 mapping 没人引用后自己释放）。
+快照里每个餐厅带着 menu_version，和库里的对不上（快照之后改过菜单）就不用快照，照常查库 / 走缓存。
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+
+from health.metrics import CACHE_REQUESTS
+from server.compression import available_encodings, precompress
+from server.jsoncodec import JSONRenderer
+
+from .menu import load_menus
+from .models import Item, Restaurant
+from .tags import ITEM_M2M_TAG_FIELDS, item_tag_through
+
+MAGIC = b"EZMENUS\x00"
+FORMAT_VERSION = 1
+# magic, 格式版本, build id, 生成时间 (ns), 餐厅数, item 数, section 数
+HEADER = struct.Struct("<8sI16sqqqI")
+# 名字, offset, 长度
+SECTION = struct.Struct("<32sqq")
+ALIGN = 8
+
+# 每个 worker 最多隔这么久 stat 一次快照文件
+SNAPSHOT_CHECK_INTERVAL = 2.0
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _check_byteorder():
+    # 列直接按本机字节序读写（array / memoryview.cast），文件格式是小端
+    if sys.byteorder != "little":
+        raise ValueError("Menu snapshots are only supported on little-endian machines.")
+
+
+def _packed(chunks):
+    """
+    [bytes] -> (blob, int64 偏移 array)；第 i 个是 blob[off[i]:off[i + 1]]。
+    """
+    offsets = array("q", [0])
+    for chunk in chunks:
+        offsets.append(offsets[-1] + len(chunk))
+    return b"".join(chunks), offsets
+
+
+def _packed_ints(lists):
+    offsets = array("q", [0])
+    values = array("q")
+    for ints in lists:
+        values.extend(ints)
+        offsets.append(len(values))
+    return values, offsets
+
+
+# ===== 导出 =====
+
+def collect_sections():
+    """
+    从库里读出快照的所有 section：({名字: bytes / array}, 餐厅数, item 数)。
+    读的顺序同 load_menus()：先版本号、后内容，快照里不会出现新版本号配旧内容。
+    """
+    versions, menus = load_menus()
+    rest_ids = [rest_id for rest_id, _ in versions]
+
+    renderer = JSONRenderer()
+    encodings = available_encodings()
+    bodies = {enc: [] for enc in ("identity", *encodings)}
+    for rest_id in rest_ids:
+        body = renderer.render({"items": menus.get(rest_id, [])})
+        encoded = precompress(body)
+        bodies["identity"].append(body)
+        for enc in encodings:
+            bodies[enc].append(encoded.get(enc, b""))  # 长度 0 = 没有预压缩（太小 / 压了不省）
+
+    position = {rest_id: i for i, rest_id in enumerate(rest_ids)}
+    # 读完版本号之后才上线的餐厅不在快照里，它的 item 也不要
+    items = [
+        it for it in
+        Item.objects.filter(restaurant__is_active=True, is_active=True)
+        .order_by("restaurant_id", "id")
+        .values_list("id", "restaurant_id", "name", "price", "spice_levels_id")
+        if it[1] in position
+    ]
+    # 餐厅 i 的 item 是 item 列里的 [rest.items[i], rest.items[i + 1])
+    rest_items = array("q", [0] * (len(rest_ids) + 1))
+    for _, rest_id, *_ in items:
+        rest_items[position[rest_id] + 1] += 1
+    for i in range(len(rest_ids)):
+        rest_items[i + 1] += rest_items[i]
+
+    # tag id 按 through 表的 id 排，和 load_item_tag_ids() 的顺序一样；整表扫一遍，不用几万个 id 的 IN
+    tag_ids = {f: {} for f in ITEM_M2M_TAG_FIELDS}
+    for f in ITEM_M2M_TAG_FIELDS:
+        through, item_col, tag_col = item_tag_through(f)
+        for item_id, tag_id in through.objects.order_by("id").values_list(item_col, tag_col):
+            tag_ids[f].setdefault(item_id, []).append(tag_id)
+
+    sections = {
+        "rest.id": array("q", rest_ids),
+        "rest.version": array("q", (version for _, version in versions)),
+        "rest.items": rest_items,
+        "item.id": array("q", (it[0] for it in items)),
+        "item.price": array("d", (float(it[3]) for it in items)),
+        "item.spice": array("q", (it[4] or 0 for it in items)),
+    }
+    for enc, chunks in bodies.items():
+        sections[f"menu.{enc}"], sections[f"menu.{enc}.off"] = _packed(chunks)
+    sections["item.name"], sections["item.name.off"] = _packed([it[2].encode() for it in items])
+    for f in ITEM_M2M_TAG_FIELDS:
+        sections[f"tags.{f}"], sections[f"tags.{f}.off"] = _packed_ints(
+            tag_ids[f].get(it[0], ()) for it in items
+        )
+    return sections, len(rest_ids), len(items)
+
+
+def write_snapshot(path):
+    """
+    导出快照到 path：先写同目录的临时文件、fsync，再 os.replace() 原子替换。返回统计信息。
+    """
+    _check_byteorder()
+    started = time.perf_counter()
+    sections, n_restaurants, n_items = collect_sections()
+
+    table = []
+    pos = _align(HEADER.size + SECTION.size * len(sections))
+    for name, data in sections.items():
+        length = memoryview(data).nbytes
+        table.append((name, pos, length))
+        pos = _align(pos + length)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".menu-snapshot-", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)   # mkstemp 建的是 0600，跑 worker 的用户可能不是这个用户
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, uuid.uuid4().bytes, time.time_ns(), n_restaurants, n_items, len(table)
+            ))
+            for name, offset, length in table:
+                f.write(SECTION.pack(name.encode(), offset, length))
+            for (name, offset, _), data in zip(table, sections.values()):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return {
+        "restaurants": n_restaurants,
+        "items": n_items,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def snapshot_fingerprint():
+    """
+    两条聚合查询；值变了说明有餐厅上下线或者菜单改过（menu_version 只增不减），需要重建。
+    item 的个数 / 最大 id 也算进去：没走 bump_menu_version 的写入（直接 bulk insert 的脚本等）
+    至少加菜、删菜能看出来。
+    """
+    restaurants = Restaurant.objects.filter(is_active=True).aggregate(
+        n=Count("id"), ids=Sum("id"), max_id=Max("id"), versions=Sum("menu_version")
+    )
+    items = Item.objects.filter(restaurant__is_active=True).aggregate(n=Count("id"), max_id=Max("id"))
+    return (*restaurants.values(), *items.values())
+
+
+# ===== 读 =====
+
+class MappedSnapshot:
+    def __init__(self, path):
+        _check_byteorder()
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # 用打开的那个文件的 stat，和之后 os.stat(path) 比较判断文件有没有被换掉
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        view = memoryview(self.mmap)
+        magic, fmt, build_id, created_ns, n_restaurants, n_items, n_sections = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a menu snapshot (format {FORMAT_VERSION}).")
+        self.build_id = build_id.hex()
+        self.created_ns = created_ns
+        self.sections = {}
+        for k in range(n_sections):
+            name, offset, length = SECTION.unpack_from(view, HEADER.size + k * SECTION.size)
+            self.sections[name.rstrip(b"\0").decode()] = view[offset:offset + length]
+
+        self.rest_ids = self.column("rest.id")
+        self.rest_versions = self.column("rest.version")
+        self.rest_items = self.column("rest.items")
+        self.item_ids = self.column("item.id")
+        self.item_prices = self.column("item.price", "d")
+        self.item_spice = self.column("item.spice")
+        self.encodings = tuple(
+            name[len("menu."):] for name in self.sections
+            if name.startswith("menu.") and not name.endswith(".off") and name != "menu.identity"
+        )
+        if len(self.rest_ids) != n_restaurants or len(self.item_ids) != n_items:
+            raise ValueError(f"{path} is truncated.")
+
+    def __len__(self):
+        return len(self.rest_ids)
+
+    def column(self, name, fmt="q"):
+        return self.sections[name].cast(fmt)
+
+    def blob(self, name, i, fmt="B"):
+        """
+        blob section 里第 i 段，memoryview 切片（不拷贝）；偏移按 fmt 的元素个数算。
+        """
+        offsets = self.sections[f"{name}.off"].cast("q")
+        return self.sections[name].cast(fmt)[offsets[i]:offsets[i + 1]]
+
+    def find(self, rest_id, version):
+        """
+        餐厅在快照里的下标；没有这个餐厅或者 menu_version 对不上时返回 None。
+        """
+        i = bisect_left(self.rest_ids, rest_id)
+        if i == len(self.rest_ids) or self.rest_ids[i] != rest_id or self.rest_versions[i] != version:
+            return None
+        return i
+
+    def menu(self, rest_id, version):
+        """
+        (菜单 JSON, {encoding: 预压缩的}) 都是 memoryview；找不到 / 版本不对返回 None。
+        """
+        i = self.find(rest_id, version)
+        if i is None:
+            return None
+        encoded = {}
+        for enc in self.encodings:
+            body = self.blob(f"menu.{enc}", i)
+            if body.nbytes:
+                encoded[enc] = body
+        return self.blob("menu.identity", i), encoded
+
+    def bundle_items(self, rest_id, version):
+        """
+        [(item_id, name, price, spice_id, {维度: [tag_id]})]，和 views.load_bundle_items() 的一样；
+        找不到 / 版本不对返回 None。
+        """
+        i = self.find(rest_id, version)
+        if i is None:
+            return None
+        out = []
+        for k in range(self.rest_items[i], self.rest_items[i + 1]):
+            out.append((
+                self.item_ids[k],
+                str(self.blob("item.name", k), "utf-8"),
+                self.item_prices[k],
+                self.item_spice[k] or None,
+                {f: self.blob(f"tags.{f}", k, "q").tolist() for f in ITEM_M2M_TAG_FIELDS},
+            ))
+        return out
+
+
+_snapshot = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def get_menu_snapshot():
+    """
+    当前的快照；没配 MENU_SNAPSHOT_PATH 或者文件还没生成时返回 None。
+    文件被换掉（重建）后下一次检查时重新 mmap；新文件读不了时继续用旧的。
+    """
+    global _snapshot, _checked
+
+    path = getattr(settings, "MENU_SNAPSHOT_PATH", "")
+    if not path:
+        return None
+    now = time.monotonic()
+    snapshot = _snapshot
+    if now - _checked < SNAPSHOT_CHECK_INTERVAL:
+        return snapshot
+
+    with _lock:
+        if now - _checked < SNAPSHOT_CHECK_INTERVAL:
+            return _snapshot
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and (_snapshot is None or _snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size)):
+            try:
+                _snapshot = MappedSnapshot(path)
+            except (OSError, ValueError):
+                pass
+        _checked = now
+        return _snapshot
+
+
+def snapshot_menu_response(rest_id, version):
+    """
+    快照里的菜单（版本号一致时），否则返回 None。
+    """
+    snapshot = get_menu_snapshot()
+    entry = snapshot.menu(int(rest_id), version) if snapshot is not None else None
+    if entry is None:
+        return None
+    CACHE_REQUESTS.inc(cache="menu", result="snapshot")
+    body, encoded = entry
+    response = HttpResponse(body, content_type="application/json")
+    response.precompressed = encoded
+    return response
@@ -0,0 +1,295 @@
+# restaurants/tags.py
+import threading
+import time
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, Value
+
+from .models import (
+    CacheVersion,
+    Item,
+    CuisineTag,
+    ProteinTag,
+    SpicinessTag,
+    MealTypeTag,
+    FlavorTag,
+    AllergenTag,
+    NutritionTag,
+)
+
+# 对外（tag 目录 / 商家编辑）用的维度名 -> tag model
+TAG_CATALOG_MODELS = {
+    "cuisines": CuisineTag,
+    "proteins": ProteinTag,
+    "spiciness": SpicinessTag,
+    "meal_types": MealTypeTag,
+    "flavors": FlavorTag,
+    "allergens": AllergenTag,
+    "nutritions": NutritionTag,
+}
+
+TAG_REGISTRY_VERSION_KEY = "tags:registry_version"
+# 每个 worker 最多隔这么久去库里对一次版本号（本进程里改 tag 会立即生效）
+TAG_REGISTRY_CHECK_INTERVAL = 2.0
+
+TagEntry = namedtuple("TagEntry", ["id", "key", "label"])
+
+
+class TagTable:
+    """
+    一个维度的全部 tag：id / key 两个索引，外加按 label 排好序的列表。
+    """
+
+    def __init__(self, model, entries):
+        self.model = model
+        self.by_id = {e.id: e for e in entries}
+        self.by_key = {e.key: e for e in entries}
+        self.ordered = tuple(sorted(entries, key=lambda e: (e.label, e.id)))
+
+    def get(self, tag_id):
+        return self.by_id.get(tag_id)
+
+    def label(self, tag_id):
+        entry = self.by_id.get(tag_id)
+        return entry.label if entry else None
+
+    def instance(self, tag_id):
+        """
+        不查库构造 model 实例，给 FK 赋值 / M2M set 用。
+        """
+        entry = self.by_id.get(tag_id)
+        if entry is None:
+            return None
+        obj = self.model(id=entry.id, key=entry.key, label=entry.label)
+        obj._state.adding = False
+        obj._state.db = "default"
+        return obj
+
+
+class TagRegistry:
+    def __init__(self, version, tables):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.tables = tables  # catalog name -> TagTable
+        self._by_model = {t.model: t for t in tables.values()}
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def for_model(self, model):
+        return self._by_model[model]
+
+    @classmethod
+    def load(cls, version):
+        tables = {
+            name: TagTable(
+                model,
+                [TagEntry(*row) for row in model.objects.values_list("id", "key", "label")],
+            )
+            for name, model in TAG_CATALOG_MODELS.items()
+        }
+        return cls(version, tables)
+
+
+_registry = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def get_cache_version(key):
+    """
+    CacheVersion 表里 key 的版本号（一条查询），还没有这一行时是 0。
+    """
+    version = CacheVersion.objects.filter(key=key).values_list("version", flat=True).first()
+    return version or 0
+
+
+def bump_cache_version(key):
+    """
+    key 的版本号 +1。和数据改动放在同一个事务里，回滚时一起回滚。
+    """
+    if CacheVersion.objects.filter(key=key).update(version=F("version") + 1):
+        return
+    try:
+        with transaction.atomic():
+            CacheVersion.objects.create(key=key, version=1)
+    except IntegrityError:
+        # 别的事务刚建了这一行
+        CacheVersion.objects.filter(key=key).update(version=F("version") + 1)
+
+
+def get_tag_registry(force=False):
+    """
+    进程内的 tag registry：第一次用时 load（7 条查询），之后只在版本号变了时重建。
+    版本号在 CacheVersion 表里，每个 worker 最多每 TAG_REGISTRY_CHECK_INTERVAL 秒对一次。
+    force=True 时不管版本直接重建。
+    """
+    global _registry, _last_check
+
+    now = time.monotonic()
+    registry = _registry
+    if not force and registry is not None and now - _last_check < TAG_REGISTRY_CHECK_INTERVAL:
+        return registry
+
+    with _lock:
+        version = get_cache_version(TAG_REGISTRY_VERSION_KEY)
+        if force or _registry is None or _registry.version != version:
+            _registry = TagRegistry.load(version)
+        _last_check = now
+        return _registry
+
+
+def lookup_tag(name, tag_id):
+    """
+    按 id 找 tag；找不到且 registry 已经有一阵子没刷新时，重新 load 一次再找
+    （别的 worker 刚建的 tag，版本号还没对上）。
+    """
+    registry = get_tag_registry()
+    entry = registry[name].get(tag_id)
+    if entry is None and time.monotonic() - registry.loaded_at > TAG_REGISTRY_CHECK_INTERVAL:
+        registry = get_tag_registry(force=True)
+        entry = registry[name].get(tag_id)
+    return entry
+
+
+def invalidate_tag_registry():
+    """
+    tag 增删改后调用：库里的版本号 +1（跟着当前事务），提交后本进程立即丢掉旧 registry，
+    其它 worker 下次对版本时重建。
+    """
+    def drop():
+        global _registry
+        _registry = None
+
+    bump_cache_version(TAG_REGISTRY_VERSION_KEY)
+    transaction.on_commit(drop)
+
+
+def build_tag_catalog():
+    """
+    所有 tag，按维度分组、label 排序：{"cuisines": [{"id", "key", "label"}, ...], ...}
+    """
+    registry = get_tag_registry()
+    return {
+        name: [e._asdict() for e in registry[name].ordered]
+        for name in TAG_CATALOG_MODELS
+    }
+
+
+# Item 上的 M2M tag 字段（spiciness 是 FK spice_levels，单独处理）
+ITEM_M2M_TAG_FIELDS = ("cuisines", "proteins", "meal_types", "flavors", "allergens", "nutritions")
+
+
+def item_tag_through(field):
+    """
+    Item 某个 M2M tag 字段的 (through model, item 列名, tag 列名)。
+    """
+    m2m = Item._meta.get_field(field)
+    return m2m.remote_field.through, m2m.m2m_column_name(), m2m.m2m_reverse_name()
+
+
+def load_item_tag_ids(item_ids, fields=ITEM_M2M_TAG_FIELDS):
+    """
+    {item_id: {field: [tag_id, ...]}}，每个维度只查一次 through 表，不 join tag 表；
+    label 再从 registry 里取。
+    """
+    item_ids = list(item_ids)
+    out = {item_id: {f: [] for f in fields} for item_id in item_ids}
+    if not item_ids:
+        return out
+
+    for f in fields:
+        through, item_col, tag_col = item_tag_through(f)
+        rows = (
+            through.objects
+            .filter(**{f"{item_col}__in": item_ids})
+            .order_by("id")
+            .values_list(item_col, tag_col)
+        )
+        for item_id, tag_id in rows:
+            out[item_id][f].append(tag_id)
+    return out
+
+
+def load_item_tag_sets(item_id, fields=ITEM_M2M_TAG_FIELDS):
+    """
+    单个 item 所有维度当前的 tag id：{field: {tag_id, ...}}。
+    六张 through 表 UNION ALL 成一条查询。
+    """
+    out = {f: set() for f in fields}
+    queries = []
+    for idx, f in enumerate(fields):
+        through, item_col, tag_col = item_tag_through(f)
+        queries.append(
+            through.objects
+            .filter(**{item_col: item_id})
+            .annotate(dim=Value(idx, output_field=IntegerField()))
+            .values_list(tag_col, "dim")
+        )
+    if not queries:
+        return out
+
+    qs = queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0]
+    for tag_id, idx in qs:
+        out[fields[idx]].add(tag_id)
+    return out
+
+
+def cached_item_tag_sets(item, fields=ITEM_M2M_TAG_FIELDS):
+    """
+    set_item_tag_cache 已经塞进 item 的 tag：{field: {tag_id, ...}}，不查库。
+    有维度不在缓存里时退回 load_item_tag_sets。
+    """
+    prefetched = getattr(item, "_prefetched_objects_cache", {})
+    if all(f in prefetched for f in fields):
+        return {f: {obj.pk for obj in prefetched[f]} for f in fields}
+    return load_item_tag_sets(item.pk, fields=fields)
+
+
+def apply_item_tag_diff(item_id, current, desired):
+    """
+    current / desired: {field: set(tag_id)}，只处理 desired 里有的维度。
+    每个有变化的维度最多一条 DELETE + 一条 bulk INSERT。返回有变化的维度列表。
+    """
+    changed = []
+    for f, new_ids in desired.items():
+        old_ids = current.get(f, set())
+        removed = old_ids - new_ids
+        added = new_ids - old_ids
+        if not (removed or added):
+            continue
+        through, item_col, tag_col = item_tag_through(f)
+        if removed:
+            through.objects.filter(
+                **{item_col: item_id, f"{tag_col}__in": sorted(removed)}
+            ).delete()
+        if added:
+            through.objects.bulk_create(
+                [through(**{item_col: item_id, tag_col: tag_id}) for tag_id in sorted(added)],
+                ignore_conflicts=True,
+            )
+        changed.append(f)
+    return changed
+
+
+def set_item_tag_cache(item, tag_ids_by_field):
+    """
+    把 tag 直接塞进 item 的 prefetch 缓存（实例来自 registry），
+    之后 item.cuisines.all() 之类不再查库。
+    """
+    registry = get_tag_registry()
+    prefetched = item.__dict__.setdefault("_prefetched_objects_cache", {})
+    for f, tag_ids in tag_ids_by_field.items():
+        table = registry[f]
+        objs = []
+        for tag_id in sorted(tag_ids):
+            obj = table.instance(tag_id)
+            if obj is None and lookup_tag(f, tag_id) is not None:
+                obj = get_tag_registry()[f].instance(tag_id)
+            if obj is not None:
+                objs.append(obj)
+        qs = TAG_CATALOG_MODELS[f].objects.all()
+        qs._result_cache = objs
+        qs._prefetch_done = True
+        prefetched[f] = qs
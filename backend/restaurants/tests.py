@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from urllib.parse import urlencode
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework import renderers, serializers
+from rest_framework.test import APIClient
+
+from accounts.models import UserProfile, UserTagPreference
+from accounts.serializers import ClaimsTokenObtainPairSerializer
+from benchmarks.budgets import QueryBudgetMixin
+from benchmarks.scenarios import SCENARIOS
+from server import db_router, jsoncodec
+from server import urls as server_urls
+
+from .models import (
+    AllergenTag,
+    CuisineTag,
+    FlavorTag,
+    Item,
+    MealTypeTag,
+    NutritionTag,
+    Order,
+    ProteinTag,
+    Restaurant,
+    SpicinessTag,
+)
+from .bulk import BULK_IMPORT_MAX_ROWS
+from .lean import LeanSerializer
+from .listing import encode_item_cursor
+from .menu import bump_menu_version
+from .merchant_serializers import MerchantItemDetailSerializer
+from .preload import invalidate_restaurant_directory, load_shared_caches, unload_shared_caches
+from .snapshot import get_menu_snapshot, snapshot_fingerprint, write_snapshot
+from .serializers import ITEM_LEAN, RESTAURANT_LEAN, ItemSerializer, RestaurantSerializer
+from .management.commands.seed_restaurants_from_json import Command as SeedCommand, iter_places
+from .tags import get_tag_registry, item_tag_through, load_item_tag_sets, set_item_tag_cache
+from .views import build_restaurant_bundle
+
+M2M_TAG_MODELS = {
+    "cuisines": CuisineTag,
+    "proteins": ProteinTag,
+    "meal_types": MealTypeTag,
+    "flavors": FlavorTag,
+    "allergens": AllergenTag,
+    "nutritions": NutritionTag,
+}
+
+# 预算对应的数据规模：餐厅数 × 每家菜品数，每个菜每个维度挂 2 个 tag，下单 ORDER_LINES 行
+RESTAURANTS = 3
+ITEMS_PER_RESTAURANT = 10
+TAGS_PER_DIMENSION = 4
+ORDER_LINES = 8
+
+
+def make_client(user):
+    client = APIClient()
+    token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+class BudgetDataMixin(QueryBudgetMixin):
+    """
+    每个测试都在同一份数据上跑；打一次热身请求再量，量的是稳态（tag registry、
+    token version 等进程内缓存已经就绪）的条数。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = {
+            name: [model.objects.create(key=f"{name}-{n}", label=f"{name} {n}") for n in range(TAGS_PER_DIMENSION)]
+            for name, model in M2M_TAG_MODELS.items()
+        }
+        cls.spice = [SpicinessTag.objects.create(key=f"spice-{n}", label=f"Spice {n}") for n in range(3)]
+
+        cls.customer = User.objects.create_user("budget-customer", password="x")
+        cls.merchant = User.objects.create_user("budget-merchant", password="x")
+        UserProfile.objects.filter(user=cls.merchant).update(user_type="owner")
+
+        cls.restaurants = []
+        cls.items = {}
+        for r in range(RESTAURANTS):
+            rest = Restaurant.objects.create(
+                owner=cls.merchant,
+                name=f"Budget {r}",
+                google_place_id=f"budget-place-{r}",
+                latitude=Decimal("47.6"),
+                longitude=Decimal("-122.3"),
+            )
+            cls.restaurants.append(rest)
+            cls.items[rest.id] = []
+            for j in range(ITEMS_PER_RESTAURANT):
+                item = Item.objects.create(
+                    restaurant=rest,
+                    name=f"Dish {j}",
+                    price=Decimal("8.50") + j,
+                    spice_levels=cls.spice[j % len(cls.spice)],
+                )
+                for name, tags in cls.tags.items():
+                    getattr(item, name).set([tags[j % TAGS_PER_DIMENSION], tags[(j + 1) % TAGS_PER_DIMENSION]])
+                cls.items[rest.id].append(item)
+
+    def setUp(self):
+        cache.clear()
+        get_tag_registry(force=True)
+        self.customer_client = make_client(self.customer)
+        self.merchant_client = make_client(User.objects.get(pk=self.merchant.pk))
+
+    def measure(self, view, method, request):
+        request()
+        with self.assertQueryBudget(view, method):
+            return request()
+
+
+class CustomerQueryBudgetTests(BudgetDataMixin, TestCase):
+    def order_body(self, lines=ORDER_LINES):
+        rest = self.restaurants[0]
+        return {
+            "restaurant_id": rest.id,
+            "items": [{"item_id": it.id, "quantity": 2} for it in self.items[rest.id][:lines]],
+        }
+
+    def test_resolve_restaurants(self):
+        body = {"place_ids": [r.google_place_id for r in self.restaurants]}
+        r = self.measure(
+            "resolve_restaurants", "POST",
+            lambda: self.client.post("/api/restaurants/resolve", body, content_type="application/json"),
+        )
+        self.assertEqual(len(r.json()["restaurants"]), RESTAURANTS)
+
+    def test_items_by_restaurant(self):
+        rest = self.restaurants[0]
+        r = self.measure("items_by_restaurant", "GET", lambda: self.client.get(f"/api/restaurants/{rest.id}/items"))
+        self.assertEqual(len(r.json()["items"]), ITEMS_PER_RESTAURANT)
+
+    def test_create_order(self):
+        r = self.measure(
+            "create_order", "POST",
+            lambda: self.customer_client.post("/api/restaurants/orders/", self.order_body(), format="json"),
+        )
+        self.assertEqual(r.status_code, 200)
+
+    def test_ai_order(self):
+        rest = self.restaurants[1]
+        picked = self.items[rest.id][:3]
+        fake = mock.MagicMock()
+        fake.chat.completions.create.return_value.usage = mock.MagicMock(prompt_tokens=1200, completion_tokens=40)
+        fake.chat.completions.create.return_value.choices = [
+            mock.MagicMock(message=mock.MagicMock(content=json.dumps({
+                "restaurant_id": rest.id,
+                "items": [{"item_id": it.id, "quantity": 1} for it in picked],
+                "comment": "budget",
+            })))
+        ]
+        body = {"restaurant_ids": [r.id for r in self.restaurants]}
+        with mock.patch("restaurants.views.openai_client", return_value=fake):
+            r = self.measure(
+                "ai_order", "POST",
+                lambda: self.customer_client.post("/api/restaurants/ai_order/", body, format="json"),
+            )
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(len(r.json()["items"]), len(picked))
+
+    def test_ai_order_rejects_nan(self):
+        fake = mock.MagicMock()
+        fake.chat.completions.create.return_value.usage = None
+        fake.chat.completions.create.return_value.choices = [
+            mock.MagicMock(message=mock.MagicMock(content='{"restaurant_id": NaN, "items": []}'))
+        ]
+        body = {"restaurant_ids": [r.id for r in self.restaurants]}
+        # orjson 和标准库两条路径都要返回 502，不能抛 500
+        for orjson in (jsoncodec.orjson, None):
+            with self.subTest(orjson=orjson is not None), mock.patch.object(jsoncodec, "orjson", orjson), \
+                    mock.patch("restaurants.views.openai_client", return_value=fake):
+                r = self.customer_client.post("/api/restaurants/ai_order/", body, format="json")
+            self.assertEqual(r.status_code, 502)
+
+
+class MerchantQueryBudgetTests(BudgetDataMixin, TestCase):
+    def test_my_restaurants(self):
+        r = self.measure(
+            "merchant_my_restaurants", "GET",
+            lambda: self.merchant_client.get("/api/merchant/restaurants/my/"),
+        )
+        self.assertEqual(len(r.json()["restaurants"]), RESTAURANTS)
+
+    def test_item_detail_get(self):
+        item = self.items[self.restaurants[0].id][0]
+        r = self.measure(
+            "merchant_item_detail", "GET",
+            lambda: self.merchant_client.get(f"/api/merchant/items/{item.id}/"),
+        )
+        self.assertEqual(len(r.json()["cuisines"]), 2)
+
+    def test_item_detail_put(self):
+        item = self.items[self.restaurants[0].id][0]
+        cuisines = self.tags["cuisines"]
+        bodies = iter([
+            {"price": "12.00", "cuisines": [cuisines[2].id], "flavors": []},
+            {"price": "13.00", "cuisines": [cuisines[3].id], "flavors": [self.tags["flavors"][0].id]},
+        ])
+        r = self.measure(
+            "merchant_item_detail", "PUT",
+            lambda: self.merchant_client.put(f"/api/merchant/items/{item.id}/", next(bodies), format="json"),
+        )
+        self.assertEqual(r.status_code, 200)
+
+    def test_restaurant_items_list(self):
+        rest = self.restaurants[0]
+        r = self.measure(
+            "merchant_restaurant_items", "GET",
+            lambda: self.merchant_client.get(f"/api/merchant/restaurants/{rest.id}/items/"),
+        )
+        self.assertEqual(len(r.json()["items"]), ITEMS_PER_RESTAURANT)
+
+    def test_restaurant_items_create(self):
+        rest = self.restaurants[0]
+        names = iter(["New dish A", "New dish B"])
+        body = lambda: {
+            "name": next(names),
+            "price": "9.99",
+            "cuisines": [t.id for t in self.tags["cuisines"][:2]],
+            "flavors": [self.tags["flavors"][0].id],
+            "spiciness": self.spice[0].id,
+        }
+        r = self.measure(
+            "merchant_restaurant_items", "POST",
+            lambda: self.merchant_client.post(f"/api/merchant/restaurants/{rest.id}/items/", body(), format="json"),
+        )
+        self.assertEqual(r.status_code, 201)
+
+    def test_bulk_import(self):
+        rest = self.restaurants[0]
+        rows = [
+            {"name": f"Dish {j}", "price": "7.25", "cuisines": self.tags["cuisines"][0].key}
+            for j in range(ITEMS_PER_RESTAURANT + 10)
+        ]
+        r = self.measure(
+            "merchant_bulk_import_items", "POST",
+            lambda: self.merchant_client.post(
+                f"/api/merchant/restaurants/{rest.id}/items:bulk", rows, format="json"
+            ),
+        )
+        self.assertEqual(r.json()["counts"]["updated"], len(rows))
+
+    def test_bulk_action(self):
+        rest = self.restaurants[0]
+        body = {
+            "filter": {"min_price": "0"},
+            "action": "add_tags",
+            "tags": {"cuisines": [self.tags["cuisines"][3].id], "allergens": [self.tags["allergens"][3].id]},
+        }
+        r = self.measure(
+            "merchant_bulk_item_action", "POST",
+            lambda: self.merchant_client.post(
+                f"/api/merchant/restaurants/{rest.id}/items:batch", body, format="json"
+            ),
+        )
+        self.assertEqual(r.json()["matched"], ITEMS_PER_RESTAURANT)
+
+    def test_tags_overview(self):
+        r = self.measure("merchant_tags_overview", "GET", lambda: self.merchant_client.get("/api/merchant/tags/"))
+        self.assertEqual(r.status_code, 200)
+
+
+class BenchScenarioCoverageTests(TestCase):
+    """
+    benchmarks/scenarios.py 要覆盖 server/urls.py 里每个路由（admin/ 除外），加了路由忘了加场景时失败。
+    """
+
+    def test_every_route_has_a_scenario(self):
+        ctx = SimpleNamespace(
+            place_ids=["p"], order_restaurant_ids=[1], merchant_restaurant_ids=[1], merchant_item_ids=[1],
+            items_by_restaurant={1: [1]}, run_id="t", password="x",
+            tokens={"customer": {"username": "u", "refresh": "r"}},
+        )
+        covered = set()
+        for scenario in SCENARIOS:
+            path = scenario.path(ctx, random.Random(0), 0) if callable(scenario.path) else scenario.path
+            covered.add(resolve(path.split("?")[0]).route)
+
+        routes = {str(p.pattern) for p in server_urls.urlpatterns if not str(p.pattern).startswith("admin/")}
+        self.assertEqual(routes - covered, set())
+
+
+class MerchantItemListingTests(BudgetDataMixin, TestCase):
+    """
+    商家菜单列表（restaurants/listing.py）：keyset 分页、tag 过滤、limit 范围。
+    """
+
+    def list_items(self, rest, **params):
+        return self.merchant_client.get(f"/api/merchant/restaurants/{rest.id}/items/", params)
+
+    def names(self, r):
+        return [item["name"] for item in r.json()["items"]]
+
+    def test_pages_until_exhausted(self):
+        rest = self.restaurants[0]
+        seen = []
+        r = self.list_items(rest, limit=3)
+        seen += [item["id"] for item in r.json()["items"]]
+        # 翻页中间插入的新 item id 更大，排在最后，不会重复也不会漏
+        added = Item.objects.create(restaurant=rest, name="Late", price=Decimal("1.00"))
+        pages = 1
+        while r.json()["next_cursor"] is not None:
+            r = self.list_items(rest, limit=3, cursor=r.json()["next_cursor"])
+            self.assertEqual(r.status_code, 200)
+            seen += [item["id"] for item in r.json()["items"]]
+            pages += 1
+        expected = [it.id for it in self.items[rest.id]] + [added.id]
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+
+    def test_cursor_from_other_restaurant(self):
+        cursor = self.list_items(self.restaurants[0], limit=2).json()["next_cursor"]
+        r = self.list_items(self.restaurants[1], cursor=cursor)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json(), {"cursor": ["Invalid cursor."]})
+
+    def test_malformed_cursors(self):
+        rest = self.restaurants[0]
+        for raw in ("!!!", encode_item_cursor("x", 1), encode_item_cursor(rest.id, 2 ** 64)):
+            r = self.list_items(rest, cursor=raw)
+            self.assertEqual(r.status_code, 400, raw)
+            self.assertEqual(r.json(), {"cursor": ["Invalid cursor."]})
+
+    def test_tag_filters(self):
+        rest = self.restaurants[0]
+        cuisine, spice = self.tags["cuisines"][0], self.spice[0]
+        # item j 挂 cuisines[j % 4]、cuisines[(j + 1) % 4]，spiciness 是 spice[j % 3]
+        r = self.list_items(rest, cuisines=str(cuisine.id))
+        self.assertEqual(self.names(r), ["Dish 0", "Dish 3", "Dish 4", "Dish 7", "Dish 8"])
+        r = self.list_items(rest, cuisines=f"{cuisine.id},{self.tags['cuisines'][1].id}", spiciness=str(spice.id))
+        self.assertEqual(self.names(r), ["Dish 0", "Dish 3", "Dish 9"])
+
+        Item.objects.filter(pk=self.items[rest.id][3].pk).update(is_active=False)
+        r = self.list_items(rest, cuisines=str(cuisine.id), active="false")
+        self.assertEqual(self.names(r), ["Dish 3"])
+
+        for params in ({"cuisines": "a,b"}, {"flavors": str(2 ** 63)}, {"active": "maybe"}):
+            r = self.list_items(rest, **params)
+            self.assertEqual(r.status_code, 400, params)
+            self.assertEqual(set(r.json()), set(params))
+
+    def test_limit_bounds(self):
+        rest = self.restaurants[0]
+        for limit in ("0", "-1", "abc"):
+            r = self.list_items(rest, limit=limit)
+            self.assertEqual(r.status_code, 400, limit)
+            self.assertIn("limit", r.json())
+        r = self.list_items(rest, limit=1)
+        self.assertEqual((len(r.json()["items"]), r.json()["next_cursor"] is None), (1, False))
+        with mock.patch("restaurants.listing.MERCHANT_ITEMS_MAX_PAGE_SIZE", 4):
+            r = self.list_items(rest, limit=1000)
+        self.assertEqual(len(r.json()["items"]), 4)
+        r = self.list_items(rest, limit=ITEMS_PER_RESTAURANT)
+        self.assertEqual((len(r.json()["items"]), r.json()["next_cursor"]), (ITEMS_PER_RESTAURANT, None))
+
+
+class MerchantItemEditTests(BudgetDataMixin, TestCase):
+    """
+    商家改单个菜（MerchantItemDetailSerializer.update）：tag 按维度 diff，没写的维度不动。
+    """
+
+    def put(self, item, body):
+        return self.merchant_client.put(f"/api/merchant/items/{item.id}/", body, format="json")
+
+    def menu_version(self, item):
+        return Restaurant.objects.values_list("menu_version", flat=True).get(pk=item.restaurant_id)
+
+    def test_add_remove_keep_per_dimension(self):
+        item = self.items[self.restaurants[0].id][0]   # 每个维度挂 tags[0]、tags[1]
+        before = load_item_tag_sets(item.pk)
+        version = self.menu_version(item)
+        cuisines, proteins = self.tags["cuisines"], self.tags["proteins"]
+
+        r = self.put(item, {
+            "cuisines": [cuisines[0].id, cuisines[2].id],     # 留 0、删 1、加 2
+            "proteins": [proteins[1].id, proteins[0].id],     # 不变
+            "flavors": [],                                    # 全删
+        })
+        self.assertEqual(r.status_code, 200)
+
+        after = load_item_tag_sets(item.pk)
+        self.assertEqual(after["cuisines"], {cuisines[0].id, cuisines[2].id})
+        self.assertEqual(after["proteins"], before["proteins"])
+        self.assertEqual(after["flavors"], set())
+        for field in ("meal_types", "allergens", "nutritions"):
+            self.assertEqual(after[field], before[field], field)
+        item.refresh_from_db()
+        self.assertEqual(item.spice_levels_id, self.spice[0].id)
+        self.assertEqual(self.menu_version(item), version + 1)
+
+        # 响应里是改完之后的 tag（来自更新过的 tag 缓存）
+        self.assertEqual(sorted(r.json()["cuisines"]), sorted(after["cuisines"]))
+        self.assertEqual(r.json()["flavors"], [])
+        self.assertEqual(sorted(r.json()["meal_types"]), sorted(before["meal_types"]))
+
+    def test_unchanged_tags_do_not_bump(self):
+        item = self.items[self.restaurants[0].id][1]
+        before = load_item_tag_sets(item.pk)
+        version = self.menu_version(item)
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.put(item, {"cuisines": sorted(before["cuisines"]), "flavors": sorted(before["flavors"])})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.menu_version(item), version)
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "DELETE", "UPDATE"))]
+        self.assertEqual(writes, [])
+
+        r = self.put(item, {"price": "20.00"})
+        self.assertEqual(self.menu_version(item), version + 1)
+        self.assertEqual(load_item_tag_sets(item.pk), before)
+
+    def test_tag_cache_updated_after_save(self):
+        item = Item.objects.get(pk=self.items[self.restaurants[0].id][2].pk)
+        set_item_tag_cache(item, load_item_tag_sets(item.pk))
+        nutritions = self.tags["nutritions"]
+        ser = MerchantItemDetailSerializer(
+            item, data={"nutritions": [nutritions[3].id], "allergens": []}, partial=True
+        )
+        self.assertTrue(ser.is_valid(), ser.errors)
+        ser.save()
+        with self.assertNumQueries(0):
+            self.assertEqual([t.pk for t in item.nutritions.all()], [nutritions[3].id])
+            self.assertEqual(list(item.allergens.all()), [])
+        self.assertEqual(load_item_tag_sets(item.pk)["nutritions"], {nutritions[3].id})
+
+
+class BulkImportTests(BudgetDataMixin, TestCase):
+    """
+    批量导入（restaurants/bulk.py）：行里没写的列对已有 item 保持不变。
+    """
+
+    def upload_csv(self, rest, text):
+        return self.merchant_client.generic(
+            "POST", f"/api/merchant/restaurants/{rest.id}/items:bulk", text.encode(), content_type="text/csv"
+        )
+
+    def test_reupload_name_price_keeps_other_columns(self):
+        rest = self.restaurants[0]
+        item = self.items[rest.id][0]
+        Item.objects.filter(pk=item.pk).update(description="House special", is_active=False)
+        tags_before = {name: set(getattr(item, name).values_list("id", flat=True)) for name in M2M_TAG_MODELS}
+
+        r = self.upload_csv(rest, f"name,price\n{item.name},12.00\nBrand New,3.50\n")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["counts"], {"created": 1, "updated": 1, "valid": 0, "error": 0})
+
+        item.refresh_from_db()
+        self.assertEqual(item.price, Decimal("12.00"))
+        self.assertEqual((item.description, item.is_active), ("House special", False))
+        self.assertEqual(item.spice_levels_id, self.spice[0].id)
+        self.assertEqual(
+            {name: set(getattr(item, name).values_list("id", flat=True)) for name in M2M_TAG_MODELS}, tags_before
+        )
+        new = Item.objects.get(restaurant=rest, name="Brand New")
+        self.assertEqual((new.description, new.is_active, new.spice_levels_id), ("", True, None))
+
+    def upload_file(self, rest, data):
+        upload = SimpleUploadedFile("menu.csv", data, content_type="text/csv")
+        return self.merchant_client.post(
+            f"/api/merchant/restaurants/{rest.id}/items:bulk", {"file": upload}, format="multipart"
+        )
+
+    def test_csv_encodings(self):
+        rest = self.restaurants[0]
+        latin1 = "name,price\nCrème brûlée,6.00\n".encode("latin-1")
+        for r in (
+            self.merchant_client.generic(
+                "POST", f"/api/merchant/restaurants/{rest.id}/items:bulk", latin1, content_type="text/csv"
+            ),
+            self.upload_file(rest, latin1),
+        ):
+            self.assertEqual(r.status_code, 400)
+            self.assertIn("UTF-8", r.json()["detail"])
+        self.assertFalse(Item.objects.filter(restaurant=rest, name__startswith="Cr").exists())
+
+        # Excel 存的 UTF-8 带 BOM，表头第一列不能变成 "\ufeffname"
+        bom = "name,price\nCrème brûlée,6.00\n".encode("utf-8-sig")
+        r = self.merchant_client.generic(
+            "POST", f"/api/merchant/restaurants/{rest.id}/items:bulk", bom, content_type="text/csv"
+        )
+        self.assertEqual(r.json()["counts"]["created"], 1)
+        r = self.upload_file(rest, bom.replace(b"6.00", b"7.00"))
+        self.assertEqual(r.json()["counts"]["updated"], 1)
+        self.assertEqual(Item.objects.get(restaurant=rest, name="Crème brûlée").price, Decimal("7.00"))
+
+    def test_digit_like_tag_values(self):
+        rest = self.restaurants[0]
+        r = self.upload_json(rest, [
+            {"name": "Dish 0", "price": "1.00", "cuisines": "²"},
+            {"name": "Dish 1", "price": "1.00", "cuisines": ["①"]},
+        ])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual([row["errors"] for row in r.json()["rows"]], [
+            {"cuisines": ["Unknown tag: ²"]},
+            {"cuisines": ["Unknown tag: ①"]},
+        ])
+
+    def upload_json(self, rest, body, **params):
+        return self.merchant_client.post(
+            f"/api/merchant/restaurants/{rest.id}/items:bulk", body, format="json", QUERY_STRING=urlencode(params)
+        )
+
+    def batch(self, rest, body):
+        return self.merchant_client.post(f"/api/merchant/restaurants/{rest.id}/items:batch", body, format="json")
+
+    def test_bad_uploads_write_nothing(self):
+        rest = self.restaurants[0]
+        before = list(Item.objects.filter(restaurant=rest).values_list("name", "price").order_by("id"))
+
+        self.assertEqual(self.upload_json(rest, {"rows": []}).status_code, 400)
+        r = self.merchant_client.generic(
+            "POST", f"/api/merchant/restaurants/{rest.id}/items:bulk", b"[{", content_type="application/json"
+        )
+        self.assertEqual(r.status_code, 400)
+
+        r = self.upload_csv(rest, "name,price,cuisines\nDish 0,1.00,no-such-tag\nNo Price,\n")
+        self.assertEqual(r.status_code, 400)
+        errors = [row["errors"] for row in r.json()["rows"]]
+        self.assertEqual(errors[0], {"cuisines": ["Unknown tag: no-such-tag"]})
+        self.assertEqual(errors[1], {"price": ["This field is required."]})
+
+        r = self.upload_json(rest, [{"name": "Twice", "price": "1"}, {"name": "Twice", "price": "2"}])
+        self.assertEqual(r.json()["counts"], {"created": 1, "updated": 0, "valid": 0, "error": 1})
+        Item.objects.filter(restaurant=rest, name="Twice").delete()
+
+        self.assertEqual(
+            list(Item.objects.filter(restaurant=rest).values_list("name", "price").order_by("id")), before
+        )
+
+    def test_row_limit(self):
+        rest = self.restaurants[0]
+        text = "name,price\n" + "".join(f"Row {n},1.00\n" for n in range(BULK_IMPORT_MAX_ROWS + 1))
+        r = self.upload_csv(rest, text)
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(str(BULK_IMPORT_MAX_ROWS), r.json()["detail"])
+        self.assertFalse(Item.objects.filter(restaurant=rest, name="Row 0").exists())
+
+    def test_created_updated_counts_and_dry_run(self):
+        rest = self.restaurants[0]
+        body = {"items": [
+            {"name": "Dish 0", "price": "9.00"},
+            {"name": "Dish 1", "price": "9.00"},
+            {"name": "Fresh", "price": "4.00"},
+            {"name": "Broken", "price": "-1"},
+        ]}
+        r = self.upload_json(rest, body, dry_run=1)
+        self.assertEqual(r.json()["counts"], {"created": 0, "updated": 0, "valid": 3, "error": 1})
+        self.assertFalse(Item.objects.filter(restaurant=rest, name="Fresh").exists())
+
+        r = self.upload_json(rest, body)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["counts"], {"created": 1, "updated": 2, "valid": 0, "error": 1})
+        rows = {row["name"]: row for row in r.json()["rows"]}
+        self.assertEqual(rows["Fresh"]["id"], Item.objects.get(restaurant=rest, name="Fresh").id)
+        self.assertEqual(rows["Dish 0"]["id"], self.items[rest.id][0].id)
+
+    def test_spiciness_and_tags_only_replaced_when_given(self):
+        rest = self.restaurants[0]
+        item = self.items[rest.id][1]
+        proteins_before = set(item.proteins.values_list("id", flat=True))
+        new_cuisine = self.tags["cuisines"][-1]
+
+        r = self.upload_json(rest, [{"name": item.name, "price": "9.00", "cuisines": [new_cuisine.key]}])
+        self.assertEqual(r.status_code, 200)
+        item.refresh_from_db()
+        self.assertEqual(item.spice_levels_id, self.spice[1].id)
+        self.assertEqual(set(item.cuisines.values_list("id", flat=True)), {new_cuisine.id})
+        self.assertEqual(set(item.proteins.values_list("id", flat=True)), proteins_before)
+
+        # 写了但是空的 spiciness / tag 维度 = 清空
+        r = self.upload_json(rest, [{"name": item.name, "price": "9.00", "spiciness": "", "cuisines": []}])
+        self.assertEqual(r.status_code, 200)
+        item.refresh_from_db()
+        self.assertIsNone(item.spice_levels_id)
+        self.assertFalse(item.cuisines.exists())
+        self.assertEqual(set(item.proteins.values_list("id", flat=True)), proteins_before)
+
+    def test_scale_price_rounds_to_cents(self):
+        rest = self.restaurants[0]
+        items = self.items[rest.id][:2]   # 8.50、9.50
+        r = self.batch(rest, {"filter": {"ids": [it.id for it in items]}, "action": "scale_price", "factor": "1.005"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["updated"], 2)
+        prices = [Item.objects.get(pk=it.pk).price for it in items]
+        self.assertEqual(prices, [Decimal("8.54"), Decimal("9.55")])
+
+    def test_scale_price_overflow_rolls_back(self):
+        rest = self.restaurants[0]
+        Item.objects.filter(pk=self.items[rest.id][0].pk).update(price=Decimal("600000.00"))
+        before = dict(Item.objects.filter(restaurant=rest).values_list("id", "price"))
+        r = self.batch(rest, {"action": "scale_price", "factor": "2"})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json(), {"price": ["Resulting price is out of range."]})
+        self.assertEqual(dict(Item.objects.filter(restaurant=rest).values_list("id", "price")), before)
+
+        # 刚好放得下（四舍五入后 999999.99）是可以的
+        Item.objects.filter(pk=self.items[rest.id][0].pk).update(price=Decimal("999999.99"))
+        r = self.batch(rest, {"filter": {"ids": [self.items[rest.id][0].id]}, "action": "scale_price", "factor": "1"})
+        self.assertEqual(r.status_code, 200)
+
+
+class LeanSerializerParityTests(TestCase):
+    """
+    lean.py 的输出渲染成 JSON 后要和 ModelSerializer 逐字节一致。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = User.objects.create_user("lean-merchant", password="x")
+        UserProfile.objects.filter(user=cls.merchant).update(user_type="owner")
+        coords = [
+            ("47.6", "-122.3"),
+            ("-33.868820", "151.209296"),
+            ("0", "0"),
+            ("89.999999", "-180"),
+        ]
+        names = ["Plain", "Café Zoë 🍜", "Line\u2028Sep", ""]
+        cls.restaurants = [
+            Restaurant.objects.create(
+                owner=cls.merchant,
+                name=names[n],
+                google_place_id=f"lean-place-{n}",
+                latitude=Decimal(lat),
+                longitude=Decimal(lng),
+                address="" if n % 2 else f"{n} Straße \"quoted\"",
+            )
+            for n, (lat, lng) in enumerate(coords)
+        ]
+        rest = cls.restaurants[0]
+        prices = ["0.10", "1234.5", "999999.99", "0", "12"]
+        created = [
+            datetime.datetime(2024, 3, 10, 7, 59, 59, tzinfo=datetime.timezone.utc),   # 芝加哥夏令时切换前一秒
+            datetime.datetime(2024, 3, 10, 8, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            datetime.datetime(1999, 12, 31, 23, 59, 59, 1, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc),
+            None,
+        ]
+        for n, price in enumerate(prices):
+            item = Item.objects.create(
+                restaurant=rest,
+                name=f"Dish {n} 辣",
+                description="" if n % 2 else "x" * 255,
+                price=Decimal(price),
+                is_active=n != 3,
+            )
+            if created[n] is not None:
+                Item.objects.filter(pk=item.pk).update(created_at=created[n])
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameJSON(self, serializer_class, lean, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = lean.serialize(queryset)
+        self.assertEqual(renderers.JSONRenderer().render(actual), renderers.JSONRenderer().render(expected))
+
+    def test_items(self):
+        qs = Item.objects.order_by("id")
+        self.assertSameJSON(ItemSerializer, ITEM_LEAN, qs)
+        for tz in ("UTC", "Asia/Kolkata", "America/Chicago"):
+            with timezone.override(tz):
+                self.assertSameJSON(ItemSerializer, ITEM_LEAN, qs)
+
+    def test_restaurants(self):
+        self.assertSameJSON(RestaurantSerializer, RESTAURANT_LEAN, Restaurant.objects.order_by("-id"))
+
+    def test_empty(self):
+        self.assertSameJSON(ItemSerializer, ITEM_LEAN, Item.objects.none())
+
+    def test_items_endpoint(self):
+        rest = self.restaurants[0]
+        r = self.client.get(f"/api/restaurants/{rest.id}/items")
+        expected = ItemSerializer(
+            Item.objects.filter(restaurant=rest, is_active=True).order_by("id"), many=True
+        ).data
+        self.assertEqual(r.content, renderers.JSONRenderer().render({"items": expected}))
+
+    def test_resolve_endpoint(self):
+        ids = ["lean-place-2", "missing", "lean-place-0", "lean-place-2", "lean-place-1"]
+        r = self.client.post("/api/restaurants/resolve", {"place_ids": ids}, content_type="application/json")
+        by_id = {rest.google_place_id: rest for rest in self.restaurants}
+        expected = RestaurantSerializer([by_id[i] for i in ids if i in by_id], many=True).data
+        self.assertEqual(r.content, renderers.JSONRenderer().render({"restaurants": expected}))
+
+    def test_my_restaurants_endpoint(self):
+        r = make_client(User.objects.get(pk=self.merchant.pk)).get("/api/merchant/restaurants/my/")
+        expected = RestaurantSerializer(Restaurant.objects.filter(owner=self.merchant).order_by("id"), many=True).data
+        self.assertEqual(r.content, renderers.JSONRenderer().render({"restaurants": expected}))
+
+    def test_rejects_related_fields(self):
+        class WithRestaurant(serializers.ModelSerializer):
+            class Meta:
+                model = Item
+                fields = ["id", "restaurant"]
+
+        with self.assertRaises(ValueError):
+            LeanSerializer(WithRestaurant).serialize(Item.objects.all())
+
+
+class JSONCodecTests(TestCase):
+    def test_decimal_renders_as_float_like_drf(self):
+        # 有意和 DRF 一样转 float（server/jsoncodec.py 模块说明），两种编解码输出一致
+        data = {"price": Decimal("12.50"), "total": Decimal("999999.99"), "n": 3}
+        expected = renderers.JSONRenderer().render(data)
+        self.assertEqual(expected, b'{"price":12.5,"total":999999.99,"n":3}')
+        for orjson in (jsoncodec.orjson, None):
+            with self.subTest(orjson=orjson is not None), mock.patch.object(jsoncodec, "orjson", orjson):
+                self.assertEqual(jsoncodec.JSONRenderer().render(data), expected)
+                self.assertEqual(jsoncodec.dumps_str(data), expected.decode())
+
+
+class MenuCompressionTests(BudgetDataMixin, TestCase):
+    def get_menu(self, rest, **headers):
+        return self.client.get(f"/api/restaurants/{rest.id}/items", **headers)
+
+    def test_gzip_round_trip(self):
+        rest = self.restaurants[0]
+        plain = self.get_menu(rest)
+        self.assertNotIn("Content-Encoding", plain)
+        r = self.get_menu(rest, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(r["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", r["Vary"])
+        self.assertEqual(int(r["Content-Length"]), len(r.content))
+        self.assertEqual(gzip.decompress(r.content), plain.content)
+
+    def test_refused_encoding(self):
+        r = self.get_menu(self.restaurants[0], HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", r)
+
+    def test_cache_hit_is_not_recompressed(self):
+        rest = self.restaurants[0]
+        first = self.get_menu(rest, HTTP_ACCEPT_ENCODING="gzip")
+        with mock.patch("server.compression.compress") as compress:
+            second = self.get_menu(rest, HTTP_ACCEPT_ENCODING="gzip")
+        compress.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+    def test_menu_change_invalidates(self):
+        rest = self.restaurants[0]
+        before = self.get_menu(rest).json()["items"]
+        item = self.items[rest.id][0]
+        Item.objects.filter(pk=item.pk).update(name="Renamed")
+        bump_menu_version(rest.id)
+        after = self.get_menu(rest).json()["items"]
+        self.assertEqual(before[0]["name"], item.name)
+        self.assertEqual(after[0]["name"], "Renamed")
+
+
+class PreloadedCacheTests(BudgetDataMixin, TestCase):
+    """
+    预加载的餐厅目录 / 菜单（restaurants/preload.py）输出要和不预加载时一样，版本变了要退回去。
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(unload_shared_caches)
+
+    def get_menu(self, rest, **headers):
+        return self.client.get(f"/api/restaurants/{rest.id}/items", **headers)
+
+    def resolve(self, ids):
+        return self.client.post("/api/restaurants/resolve", {"place_ids": ids}, content_type="application/json")
+
+    def test_menu_matches_and_skips_cache(self):
+        rest = self.restaurants[0]
+        expected = self.get_menu(rest).content
+        cache.clear()
+        load_shared_caches()
+        with mock.patch("restaurants.views.cached_json_response") as cached:
+            plain = self.get_menu(rest)
+            zipped = self.get_menu(rest, HTTP_ACCEPT_ENCODING="gzip")
+        cached.assert_not_called()
+        self.assertEqual(plain.content, expected)
+        self.assertEqual(zipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(zipped.content), expected)
+
+    def test_menu_change_falls_back(self):
+        load_shared_caches()
+        rest = self.restaurants[0]
+        item = self.items[rest.id][0]
+        Item.objects.filter(pk=item.pk).update(name="Renamed")
+        bump_menu_version(rest.id)
+        self.assertEqual(self.get_menu(rest).json()["items"][0]["name"], "Renamed")
+
+    def test_resolve_matches_db_path(self):
+        ids = ["budget-place-2", "missing", 7, "budget-place-0", "budget-place-2"]
+        expected = self.resolve(ids).content
+        load_shared_caches()
+        with self.assertNumQueries(0):
+            r = self.resolve([i for i in ids if i != "missing"])
+        self.assertEqual(r.content, expected)
+        self.assertEqual(self.resolve(ids).content, expected)
+
+    def test_new_restaurant_resolved_from_db(self):
+        load_shared_caches()
+        # bulk_create 不发 post_save，目录里没有，查库补上
+        Restaurant.objects.bulk_create([
+            Restaurant(name="Late", google_place_id="late-place", latitude=Decimal("1"), longitude=Decimal("2"))
+        ])
+        with self.assertNumQueries(1):
+            r = self.resolve(["late-place", "budget-place-1"])
+        self.assertEqual([row["name"] for row in r.json()["restaurants"]], ["Late", "Budget 1"])
+
+    def test_restaurant_change_reloads_directory(self):
+        load_shared_caches()
+        rest = Restaurant.objects.get(pk=self.restaurants[1].pk)
+        rest.name = "Moved"
+        rest.latitude = Decimal("47.700000")
+        with self.captureOnCommitCallbacks(execute=True):
+            rest.save()
+        row = self.resolve(["budget-place-1"]).json()["restaurants"][0]
+        self.assertEqual((row["name"], row["latitude"]), ("Moved", "47.700000"))
+
+    def test_other_worker_reloads_directory(self):
+        load_shared_caches()
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.filter(pk=self.restaurants[1].pk).update(name="Elsewhere")
+            invalidate_restaurant_directory()
+        # 模拟另一个 worker：刚对过版本，LocMem 是它自己的（空的），过了检查间隔之后要看到新目录
+        cache.clear()
+        with mock.patch("restaurants.preload._directory_checked", time.monotonic()):
+            self.assertEqual(self.resolve(["budget-place-1"]).json()["restaurants"][0]["name"], "Budget 1")
+        with mock.patch("restaurants.preload._directory_checked", 0.0):
+            self.assertEqual(self.resolve(["budget-place-1"]).json()["restaurants"][0]["name"], "Elsewhere")
+
+
+class MenuSnapshotTests(BudgetDataMixin, TestCase):
+    """
+    mmap 菜单快照（restaurants/snapshot.py）：菜单、AI bundle 和查库时一样，版本变了退回查库，重建后换新文件。
+    """
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "menus.snap")
+        self.enterContext(override_settings(MENU_SNAPSHOT_PATH=self.path))
+        self.enterContext(mock.patch("restaurants.snapshot.SNAPSHOT_CHECK_INTERVAL", 0))
+
+    def get_menu(self, rest, **headers):
+        return self.client.get(f"/api/restaurants/{rest.id}/items", **headers)
+
+    def bundle(self):
+        restaurants = Restaurant.objects.filter(id__in=[r.id for r in self.restaurants]).order_by("id")
+        bundle = build_restaurant_bundle(restaurants)
+        for rest in bundle:
+            rest["items"].sort(key=lambda item: item["id"])
+        return bundle
+
+    def test_menu_matches_and_skips_cache(self):
+        rest = self.restaurants[0]
+        expected = self.get_menu(rest).content
+        cache.clear()
+        write_snapshot(self.path)
+        with mock.patch("restaurants.views.cached_json_response") as cached:
+            plain = self.get_menu(rest)
+            zipped = self.get_menu(rest, HTTP_ACCEPT_ENCODING="gzip")
+        cached.assert_not_called()
+        self.assertEqual(plain.content, expected)
+        self.assertEqual(gzip.decompress(zipped.content), expected)
+
+    def test_bundle_matches_db(self):
+        expected = self.bundle()
+        write_snapshot(self.path)
+        with mock.patch("restaurants.views.load_bundle_items") as load:
+            actual = self.bundle()
+        load.assert_not_called()
+        self.assertEqual(actual, expected)
+
+    def test_stale_restaurant_falls_back(self):
+        write_snapshot(self.path)
+        rest = self.restaurants[0]
+        item = self.items[rest.id][0]
+        Item.objects.filter(pk=item.pk).update(name="Renamed")
+        bump_menu_version(rest.id)
+        self.assertEqual(self.get_menu(rest).json()["items"][0]["name"], "Renamed")
+        self.assertEqual(self.bundle()[0]["items"][0]["name"], "Renamed")
+
+    def test_rebuild_swaps_file(self):
+        write_snapshot(self.path)
+        before = get_menu_snapshot()
+        rest = self.restaurants[1]
+        item = self.items[rest.id][0]
+        Item.objects.filter(pk=item.pk).update(name="Rebuilt")
+        bump_menu_version(rest.id)
+        write_snapshot(self.path)
+        after = get_menu_snapshot()
+        self.assertNotEqual(after.build_id, before.build_id)
+        with mock.patch("restaurants.views.cached_json_response") as cached:
+            r = self.get_menu(rest)
+        cached.assert_not_called()
+        self.assertEqual(r.json()["items"][0]["name"], "Rebuilt")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["menus.snap"])
+
+    def test_fingerprint_sees_items_without_bump(self):
+        # 直接插 item、没 bump menu_version 的脚本，加菜 / 删菜也要触发重建
+        before = snapshot_fingerprint()
+        item = Item.objects.create(restaurant=self.restaurants[0], name="Unbumped", price=Decimal("1.00"))
+        added = snapshot_fingerprint()
+        self.assertNotEqual(added, before)
+        Item.objects.filter(pk=item.pk).delete()
+        self.assertEqual(snapshot_fingerprint(), before)
+        Item.objects.filter(pk=self.items[self.restaurants[0].id][0].pk).delete()
+        self.assertNotEqual(snapshot_fingerprint(), before)
+
+    def test_seed_commands_bump_menu_version(self):
+        rest = Restaurant.objects.create(
+            name="Demo", google_place_id="ChIJ-demo-001", latitude=Decimal("47.62"), longitude=Decimal("-122.35"),
+        )
+        before = snapshot_fingerprint()
+        call_command("seed_demo", stdout=io.StringIO())
+        rest.refresh_from_db()
+        self.assertEqual(rest.menu_version, 1)
+        self.assertNotEqual(snapshot_fingerprint(), before)
+        # 再跑一次什么都没加，版本号不动
+        call_command("seed_demo", stdout=io.StringIO())
+        rest.refresh_from_db()
+        self.assertEqual(rest.menu_version, 1)
+
+
+class GenerateDatasetTests(TestCase):
+    """
+    generate_dataset 的冒烟测试：原始 INSERT 是手写的列，model 加了没有库默认值的字段要跟着改。
+    """
+
+    def test_tiny_dataset(self):
+        call_command("seed_tags", stdout=io.StringIO())
+        call_command(
+            "generate_dataset", restaurants=3, items_per_restaurant=4, users=5, orders=30,
+            workers=1, until="2026-01-01", stdout=io.StringIO(),
+        )
+        self.assertEqual(Restaurant.objects.filter(google_place_id__startswith="gen-place-").count(), 3)
+        self.assertEqual(Item.objects.filter(restaurant__google_place_id__startswith="gen-place-").count(), 12)
+        self.assertEqual(
+            set(Restaurant.objects.filter(google_place_id__startswith="gen-place-").values_list("menu_version", flat=True)),
+            {1},
+        )
+        profiles = UserProfile.objects.filter(user__username__startswith="gen-user-")
+        self.assertEqual(profiles.count(), 5)
+        self.assertEqual(set(profiles.values_list("prefs_version", "token_version")), {(0, 0)})
+        self.assertEqual(Order.objects.filter(user__username__startswith="gen-user-").count(), 30)
+        self.assertTrue(UserTagPreference.objects.filter(profile__in=profiles).exists())
+
+
+class SeedFromJSONTests(TestCase):
+    """
+    seed_restaurants_from_json：流式解析（READ_SIZE 很小时也对）、分 chunk 写入、断点续跑不重复。
+    """
+
+    PLACES = [
+        {
+            "id": f"seed-place-{n}",
+            "displayName": {"text": f"Seed {n} \u00e9 [x], {{y}}"},
+            "formattedAddress": f"{n} Pine St",
+            "location": {"latitude": 47.6 + n / 1000, "longitude": -122.3},
+        }
+        for n in range(7)
+    ] + [
+        {"id": "seed-no-location", "displayName": {"text": "Nowhere"}},
+        {"displayName": {"text": "No id"}, "location": {"latitude": 1, "longitude": 2}},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_tags", stdout=io.StringIO())
+        cls.owner = User.objects.create_user("seed-owner", password="x")
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "places.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"status": "OK", "places": self.PLACES}, f, indent=2, ensure_ascii=False)
+
+    def seed(self, **options):
+        out = io.StringIO()
+        with mock.patch("restaurants.management.commands.seed_restaurants_from_json.READ_SIZE", 5):
+            call_command(
+                "seed_restaurants_from_json", file=self.path, owner_id=self.owner.id, chunk_size=3,
+                stdout=out, **options,
+            )
+        return out.getvalue()
+
+    def counts(self):
+        rests = Restaurant.objects.filter(google_place_id__startswith="seed-place-")
+        items = Item.objects.filter(restaurant__in=rests)
+        through, item_col, _ = item_tag_through("cuisines")
+        return (
+            rests.count(),
+            items.count(),
+            through.objects.filter(**{f"{item_col}__in": items.values("id")}).count(),
+        )
+
+    def test_iter_places_small_reads(self):
+        texts = {
+            "plain": json.dumps(self.PLACES),
+            "wrapped": json.dumps({"results": self.PLACES, "next": None}),
+            "indented": json.dumps({"places": self.PLACES}, indent=4),
+        }
+        for read_size in (1, 2, 7, 64):
+            for name, text in texts.items():
+                with self.subTest(read_size=read_size, format=name), \
+                        mock.patch("restaurants.management.commands.seed_restaurants_from_json.READ_SIZE", read_size):
+                    self.assertEqual(list(iter_places(io.StringIO(text))), self.PLACES)
+
+    def test_seed_counts(self):
+        out = self.seed()
+        self.assertIn("Done. 9 places read, 2 skipped. Created 7 restaurants, 21 items.", out)
+        # 每个菜 cuisines 维度挂 1 个 tag
+        self.assertEqual(self.counts(), (7, 21, 21))
+        self.assertEqual(Restaurant.objects.get(google_place_id="seed-place-3").name, "Seed 3 \u00e9 [x], {y}")
+        self.assertFalse(os.path.exists(f"{self.path}.progress"))
+
+    def test_resume_after_failure_does_not_duplicate(self):
+        real_write_chunk = SeedCommand.write_chunk
+        calls = []
+
+        def flaky(command, places):
+            calls.append(len(places))
+            if len(calls) == 2:
+                raise RuntimeError("killed")
+            return real_write_chunk(command, places)
+
+        with mock.patch.object(SeedCommand, "write_chunk", flaky), self.assertRaises(RuntimeError):
+            self.seed()
+        with open(f"{self.path}.progress") as f:
+            self.assertEqual(f.read(), "3")
+        self.assertEqual(self.counts(), (3, 9, 9))
+
+        out = self.seed(resume=True)
+        self.assertIn("Resuming after 3 places", out)
+        self.assertIn("Created 4 restaurants, 12 items.", out)
+        self.assertEqual(self.counts(), (7, 21, 21))
+        self.assertFalse(os.path.exists(f"{self.path}.progress"))
+
+        # 整个重跑：全是 upsert，tag 整体替换，不会多出行
+        out = self.seed()
+        self.assertIn("Created 0 restaurants, 0 items.", out)
+        self.assertEqual(self.counts(), (7, 21, 21))
+
+
+class TagRegistryVersionTests(TestCase):
+    """
+    tag registry 的版本号在库里：别的 worker 改了 tag，本 worker（本地 cache 里什么都没有）也要重建。
+    """
+
+    def test_other_worker_sees_new_tag(self):
+        stale = get_tag_registry(force=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            CuisineTag.objects.create(key="late", label="Late")
+        # 模拟另一个 worker：还拿着旧 registry，LocMem 是它自己的（空的）
+        cache.clear()
+        with mock.patch("restaurants.tags._registry", stale), mock.patch("restaurants.tags._last_check", 0.0):
+            registry = get_tag_registry()
+        self.assertIsNot(registry, stale)
+        self.assertIn("late", registry["cuisines"].by_key)
+        self.assertGreater(registry.version, stale.version)
+
+
+REPLICA_ALIAS = "replica_test"
+
+
+@override_settings(
+    REPLICA_DATABASES=[REPLICA_ALIAS],
+    DATABASE_ROUTERS=["server.db_router.ReplicaRouter"],
+    MIDDLEWARE=[*settings.MIDDLEWARE, "server.db_router.ReplicaRoutingMiddleware"],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    只读副本路由（server/db_router.py），副本是另一个 SQLite 文件：同一个 place_id 在两边名字不同，
+    看 resolve 读的是哪个库。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # 副本连接测试时才加：test runner 不替它建测试库（router 也不让 migrate / flush 它），表在这里建
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+            "default": {"ENGINE": "django.db.backends.sqlite3"},
+            REPLICA_ALIAS: {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(tmp.name, "replica.sqlite3")},
+        })[REPLICA_ALIAS]
+        cls.addClassCleanup(connections.settings.pop, REPLICA_ALIAS)
+        cls.addClassCleanup(lambda: connections[REPLICA_ALIAS].close())
+        with connections[REPLICA_ALIAS].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Restaurant)
+        cls.databases = {"default", REPLICA_ALIAS}
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        self.addCleanup(self.clear_replica)
+        for alias, name in (("default", "On primary"), (REPLICA_ALIAS, "On replica")):
+            Restaurant.objects.using(alias).create(
+                name=name, google_place_id="replica-place", latitude=Decimal("1"), longitude=Decimal("2")
+            )
+        self.user = User.objects.create_user("replica-user", password="x")
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def clear_replica(self):
+        with connections[REPLICA_ALIAS].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Restaurant._meta.db_table}")
+
+    def resolve(self, **headers):
+        r = self.client.post(
+            "/api/restaurants/resolve", {"place_ids": ["replica-place"]}, content_type="application/json", **headers
+        )
+        return r.json()["restaurants"][0]["name"]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.resolve(), "On replica")
+        self.assertTrue(db_router.replica_health()[REPLICA_ALIAS]["ok"])
+
+    def test_pinned_to_primary_after_write(self):
+        self.assertEqual(self.resolve(**self.auth), "On replica")
+        r = self.client.put("/api/auth/profile/", {"memo": "wrote"}, content_type="application/json", **self.auth)
+        self.assertEqual(r.status_code, 200)
+        # 写过的 user 读主库，别人照样读副本
+        self.assertEqual(self.resolve(**self.auth), "On primary")
+        self.assertEqual(self.resolve(), "On replica")
+
+    def test_unhealthy_replica_falls_back(self):
+        with mock.patch("server.db_router.check_database", return_value={"ok": False, "error": "down"}):
+            self.assertEqual(self.resolve(), "On primary")
+        self.assertFalse(db_router.replica_health()[REPLICA_ALIAS]["ok"])
@@ -1,55 +1,78 @@
 import json
 import os
+import time
 from decimal import Decimal
 from django.db import transaction
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import F
 from .models import (
     Restaurant, 
     Item,
-    CuisineTag,
-    ProteinTag,
-    SpicinessTag,
-    MealTypeTag,
-    FlavorTag,
-    AllergenTag,
-    NutritionTag,
+)
+from .bulk import (
+    BULK_IMPORT_MAX_ROWS,
+    BULK_PARSER_CLASSES,
+    apply_bulk_action,
+    extract_bulk_rows,
+    upsert_items,
+    validate_bulk_rows,
+)
+from .listing import list_merchant_items
+from .menu import bump_menu_version
+from .preload import menu_response, resolve_response
+from .snapshot import get_menu_snapshot, snapshot_menu_response
+from .tags import (
+    build_tag_catalog,
+    get_tag_registry,
+    load_item_tag_ids,
+    load_item_tag_sets,
+    set_item_tag_cache,
 )
 from .serializers import (
-    RestaurantSerializer, 
-    ItemSerializer, 
+    RESTAURANT_LEAN,
+    ITEM_LEAN,
     OrderCreateSerializer, 
-    MerchantItemDetailSerializer, 
-    MerchantItemCreateSerializer
 )
 
-from accounts.models import (
-    UserProfile,
-    UserCuisinePreference,
-    UserFlavorPreference,
-    UserNutritionPreference,
-    UserProteinPreference,
-    UserSpicePreference,
-    UserMealTypePreference,
-    UserAllergenPreference,
-)
+from accounts.models import UserProfile
+from benchmarks.budgets import query_budget
+from server.db_router import replica_reads
+from health.metrics import LLM_ERRORS, LLM_LATENCY, LLM_TOKENS, ORDERS_CREATED
+from server import jsoncodec
+from server.compression import cached_json_response
+from server.profiling import timed
+from accounts.permissions import IsMerchantUser, get_account_access
+from accounts.preferences import load_pref_rows, add_pref_scores
 
-from openai import OpenAI
+AI_ORDER_MODEL = "gpt-5.1"
 
-def pref_qs_to_list(qs, label_attr="tag__label"):
-    return [
-        {
-            "label": getattr(row, label_attr.split("__")[0]).label,
-            "score": row.score,
-        }
-        for row in qs.order_by("-score")
-    ]
+# 缓存 key 里带版本号，改动后自然失效；超时只是让旧版本的条目最终被清掉
+MENU_CACHE_TIMEOUT = 3600
+TAG_CATALOG_CACHE_TIMEOUT = 3600
+
+# prompt 里的 key -> UserTagPreference.dimension
+USER_CONTEXT_PREF_KEYS = {
+    "cuisines": "cuisine",
+    "flavors": "flavor",
+    "nutritions": "nutrition",
+    "proteins": "protein",
+    "spice_levels": "spice",
+    "meal_types": "meal_type",
+    "allergens": "allergen",
+}
+
+
+def openai_client():
+    # openai 包 import 一次要几百 ms，放到第一次 ai_order 时再 import，worker 启动 / fork 更快
+    from openai import OpenAI
+
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 def build_user_context(profile: UserProfile):
+    rows = load_pref_rows(profile)
     return {
         "basic": {
             "height_cm": profile.height_cm,
@@ -60,77 +83,70 @@ def build_user_context(profile: UserProfile):
             "memo": profile.memo,
         },
         "preferences": {
-            "cuisines": pref_qs_to_list(
-                UserCuisinePreference.objects.filter(profile=profile)
-            ),
-            "flavors": pref_qs_to_list(
-                UserFlavorPreference.objects.filter(profile=profile)
-            ),
-            "nutritions": pref_qs_to_list(
-                UserNutritionPreference.objects.filter(profile=profile)
-            ),
-            "proteins": pref_qs_to_list(
-                UserProteinPreference.objects.filter(profile=profile)
-            ),
-            "spice_levels": pref_qs_to_list(
-                UserSpicePreference.objects.filter(profile=profile),
-                label_attr="tag__label",
-            ),
-            "meal_types": pref_qs_to_list(
-                UserMealTypePreference.objects.filter(profile=profile)
-            ),
-            "allergens": pref_qs_to_list(
-                UserAllergenPreference.objects.filter(profile=profile)
-            ),
+            key: [{"label": r["label"], "score": r["score"]} for r in rows[dim]]
+            for key, dim in USER_CONTEXT_PREF_KEYS.items()
         },
     }
 
-def build_restaurant_bundle(restaurants_qs): # python dict to json
-    items_qs = (
-        Item.objects.filter(restaurant__in=restaurants_qs, is_active=True)
-        .select_related("restaurant", "spice_levels")
-        .prefetch_related(
-            "cuisines",
-            "proteins",
-            "meal_types",
-            "flavors",
-            "allergens",
-            "nutritions",
-        )
+def load_bundle_items(rest_ids):
+    """
+    {restaurant_id: [(item_id, name, price, spice_id, {维度: [tag_id]})]}，查库。
+    """
+    items = list(
+        Item.objects.filter(restaurant_id__in=rest_ids, is_active=True)
+        .values_list("id", "restaurant_id", "name", "price", "spice_levels_id")
     )
+    tag_ids = load_item_tag_ids(it[0] for it in items)
+    out = {}
+    for item_id, rest_id, name, price, spice_id in items:
+        out.setdefault(rest_id, []).append((item_id, name, float(price), spice_id, tag_ids[item_id]))
+    return out
 
-    
+
+def build_restaurant_bundle(restaurants_qs): # python dict to json
+    restaurants = list(restaurants_qs)
     items_by_rest = {}
-    for it in items_qs:
-        items_by_rest.setdefault(it.restaurant_id, []).append(it)
+    # 有 mmap 菜单快照（restaurants/snapshot.py）时，menu_version 对得上的餐厅直接从快照里取
+    snapshot = get_menu_snapshot()
+    if snapshot is not None:
+        for rest in restaurants:
+            items = snapshot.bundle_items(rest.id, rest.menu_version)
+            if items is not None:
+                items_by_rest[rest.id] = items
+    missing = [rest.id for rest in restaurants if rest.id not in items_by_rest]
+    if missing:
+        items_by_rest.update(load_bundle_items(missing))
+
+    registry = get_tag_registry()
+
+    def labels(name, ids):
+        table = registry[name]
+        return [label for label in map(table.label, ids) if label is not None]
+
+    def bundle_item(item_id, name, price, spice_id, tags):
+        return {
+            "id": item_id,
+            "name": name,
+            "price": price,
+            "tags": {
+                "cuisines": labels("cuisines", tags["cuisines"]),
+                "proteins": labels("proteins", tags["proteins"]),
+                "spiciness": registry["spiciness"].label(spice_id) if spice_id else None,
+                "meal_types": labels("meal_types", tags["meal_types"]),
+                "flavors": labels("flavors", tags["flavors"]),
+                "allergens": labels("allergens", tags["allergens"]),
+                "nutritions": labels("nutritions", tags["nutritions"]),
+            },
+        }
 
     bundle = []
-    for rest in restaurants_qs:
-        rest_items = []
-        for it in items_by_rest.get(rest.id, []):
-            rest_items.append(
-                {
-                    "id": it.id,
-                    "name": it.name,
-                    "price": float(it.price),
-                    "tags": {
-                        "cuisines": [t.label for t in it.cuisines.all()],
-                        "proteins": [t.label for t in it.proteins.all()],
-                        "spiciness": it.spice_levels.label if it.spice_levels else None,
-                        "meal_types": [t.label for t in it.meal_types.all()],
-                        "flavors": [t.label for t in it.flavors.all()],
-                        "allergens": [t.label for t in it.allergens.all()],
-                        "nutritions": [t.label for t in it.nutritions.all()],
-                    },
-                }
-            )
-
+    for rest in restaurants:
         bundle.append(
             {
                 "id": rest.id,
                 "name": rest.name,
                 "address": rest.address,
-                "items": rest_items,
+                "items": [bundle_item(*item) for item in items_by_rest.get(rest.id, [])],
             }
         )
 
@@ -138,6 +154,8 @@ def build_restaurant_bundle(restaurants_qs): # python dict to json
 
 
 @api_view(["POST"])
+@query_budget(POST=1, shape="3 place_ids")
+@replica_reads("POST")
 def resolve_restaurants(request):
     ids = request.data.get("place_ids", [])
     if not isinstance(ids, list):
@@ -148,28 +166,48 @@ def resolve_restaurants(request):
 
     ids = ids[:100]
 
+    # 开了 preload（gunicorn --preload）时用 fork 前 load 好的餐厅目录，不查库
+    response = resolve_response(ids)
+    if response is not None:
+        return response
+
     qs = Restaurant.objects.filter(is_active=True, google_place_id__in=ids)
     # 按传入顺序排序
-    by_id = {r.google_place_id: r for r in qs}
-    ordered = [by_id[i] for i in ids if i in by_id]
-
-    data = RestaurantSerializer(ordered, many=True).data
+    by_id = {r["google_place_id"]: r for r in RESTAURANT_LEAN.serialize(qs)}
+    data = [by_id[i] for i in ids if i in by_id]
     return Response({"restaurants": data})
 
 @api_view(["GET"])
+@query_budget(GET=2, shape="restaurant with 10 items")
+@replica_reads()
 def items_by_restaurant(request, rest_id):
-    
-    try:
-        Restaurant.objects.get(id=rest_id, is_active=True)
-    except Restaurant.DoesNotExist:
+    version = (
+        Restaurant.objects.filter(id=rest_id, is_active=True)
+        .values_list("menu_version", flat=True)
+        .first()
+    )
+    if version is None:
         return Response({"error": "restaurant not found"}, status=status.HTTP_404_NOT_FOUND)
 
+    # fork 前预加载的菜单 / mmap 菜单快照，版本号对得上就直接用
+    response = menu_response(rest_id, version)
+    if response is None:
+        response = snapshot_menu_response(rest_id, version)
+    if response is not None:
+        return response
+
+    # 菜单按 menu_version 缓存（连同预压缩的版本），改菜单时版本号 +1 自然失效
     items = Item.objects.filter(restaurant_id=rest_id, is_active=True).order_by("id")
-    data = ItemSerializer(items, many=True).data
-    return Response({"items": data})
+    return cached_json_response(
+        f"menu:items:{rest_id}:{version}",
+        lambda: {"items": ITEM_LEAN.serialize(items)},
+        timeout=MENU_CACHE_TIMEOUT,
+        name="menu",
+    )
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@query_budget(POST=29, shape="3 restaurants x 10 items, tags in every dimension, AI picks 3 items")
 def ai_order(request):
     restaurant_ids = request.data.get("restaurant_ids", [])
     if not isinstance(restaurant_ids, list) or not restaurant_ids:
@@ -198,7 +236,7 @@ def ai_order(request):
     user_ctx = build_user_context(profile)
     rest_bundle = build_restaurant_bundle(restaurants)
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = openai_client()
 
     system_prompt ="""
         You are a food-ordering assistant. You will receive a JSON containing:
@@ -226,22 +264,36 @@ def ai_order(request):
         "restaurants": rest_bundle,
     }
 
-    completion = client.chat.completions.create(
-        model="gpt-5.1",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": json.dumps(user_payload, ensure_ascii=False, default=float),
-            },
-        ],
-    )
+    started = time.perf_counter()
+    try:
+        with timed("llm"):
+            completion = client.chat.completions.create(
+                model=AI_ORDER_MODEL,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {
+                        "role": "user",
+                        "content": jsoncodec.dumps_str(user_payload),
+                    },
+                ],
+            )
+    except Exception as e:
+        LLM_ERRORS.inc(model=AI_ORDER_MODEL, reason=type(e).__name__)
+        raise
+    finally:
+        LLM_LATENCY.observe(time.perf_counter() - started, model=AI_ORDER_MODEL)
+
+    usage = completion.usage
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens, model=AI_ORDER_MODEL, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens, model=AI_ORDER_MODEL, kind="completion")
 
     raw = completion.choices[0].message.content
     try:
-        ai_result = json.loads(raw)
+        ai_result = jsoncodec.loads(raw)
     except json.JSONDecodeError:
+        LLM_ERRORS.inc(model=AI_ORDER_MODEL, reason="invalid_json")
         return Response(
             {"detail": "AI returned invalid JSON.", "raw": raw},
             status=status.HTTP_502_BAD_GATEWAY,
@@ -252,6 +304,7 @@ def ai_order(request):
     comment = ai_result.get("comment", "")
 
     if rest_id not in restaurant_ids:
+        LLM_ERRORS.inc(model=AI_ORDER_MODEL, reason="invalid_restaurant")
         return Response(
             {"detail": "AI chose an invalid restaurant_id.", "ai_result": ai_result},
             status=status.HTTP_400_BAD_REQUEST,
@@ -270,6 +323,7 @@ def ai_order(request):
             cleaned_items.append({"item_id": iid, "quantity": int(qty)})
 
     if not cleaned_items:
+        LLM_ERRORS.inc(model=AI_ORDER_MODEL, reason="invalid_items")
         return Response(
             {"detail": "AI did not pick any valid items.", "ai_result": ai_result},
             status=status.HTTP_400_BAD_REQUEST,
@@ -283,6 +337,7 @@ def ai_order(request):
 
     with transaction.atomic():
         order = create_order_with_prefs(request, payload)
+    ORDERS_CREATED.inc(source="ai")
 
     order_items = (
         order.items.select_related("item", "item__restaurant")
@@ -325,61 +380,37 @@ def update_user_preferences_from_order(order, user):
     except UserProfile.DoesNotExist:
         return
 
-    order_items = order.items.select_related("item")
-    items = [oi.item for oi in order_items]
-
-    for it in items:
-        qty = next((oi.quantity for oi in order_items if oi.item_id == it.id), 1)
-        delta = qty
-
-        for tag in it.cuisines.all():
-            obj, _ = UserCuisinePreference.objects.get_or_create(
-                profile=profile, tag=tag, defaults={"score": 0}
-            )
-            UserCuisinePreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
-
-        for tag in it.flavors.all():
-            obj, _ = UserFlavorPreference.objects.get_or_create(
-                profile=profile, tag=tag, defaults={"score": 0}
-            )
-            UserFlavorPreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
-
-        for tag in it.nutritions.all():
-            obj, _ = UserNutritionPreference.objects.get_or_create(
-                profile=profile, tag=tag, defaults={"score": 0}
-            )
-            UserNutritionPreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
-
-        for tag in it.proteins.all():
-            obj, _ = UserProteinPreference.objects.get_or_create(
-                profile=profile, tag=tag, defaults={"score": 0}
-            )
-            UserProteinPreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
+    order_items = list(
+        order.items.values_list("item_id", "quantity", "item__spice_levels_id")
+    )
+    tag_ids = load_item_tag_ids(
+        (item_id for item_id, _, _ in order_items),
+        fields=("cuisines", "flavors", "nutritions", "proteins", "meal_types"),
+    )
 
-        # spice_levels
-        if it.spice_levels is not None:
-            obj, _ = UserSpicePreference.objects.get_or_create(
-                profile=profile, tag=it.spice_levels, defaults={"score": 0}
-            )
-            UserSpicePreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
-
-        for tag in it.meal_types.all():
-            obj, _ = UserMealTypePreference.objects.get_or_create(
-                profile=profile, tag=tag, defaults={"score": 0}
-            )
-            UserMealTypePreference.objects.filter(pk=obj.pk).update(
-                score=F("score") + delta
-            )
+    # 先把所有 item 的 tag 累加成 {(dimension, tag_id): delta}，再一次性写入
+    # （allergens 不计入偏好）
+    deltas = {}
+
+    def bump(dim, tag_id, delta):
+        deltas[(dim, tag_id)] = deltas.get((dim, tag_id), 0) + delta
+
+    for item_id, delta, spice_id in order_items:
+        tags = tag_ids[item_id]
+        for tag_id in tags["cuisines"]:
+            bump("cuisine", tag_id, delta)
+        for tag_id in tags["flavors"]:
+            bump("flavor", tag_id, delta)
+        for tag_id in tags["nutritions"]:
+            bump("nutrition", tag_id, delta)
+        for tag_id in tags["proteins"]:
+            bump("protein", tag_id, delta)
+        if spice_id is not None:
+            bump("spice", spice_id, delta)
+        for tag_id in tags["meal_types"]:
+            bump("meal_type", tag_id, delta)
+
+    add_pref_scores(profile, deltas)
 
 def create_order_with_prefs(request, payload):
     """
@@ -395,6 +426,7 @@ def create_order_with_prefs(request, payload):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@query_budget(POST=16, shape="8 lines, tags in every dimension")
 def create_order(request):
     """
     body:
@@ -408,6 +440,7 @@ def create_order(request):
     """
     payload = request.data
     order = create_order_with_prefs(request, payload)
+    ORDERS_CREATED.inc(source="manual")
 
     return Response(
         {
@@ -420,57 +453,35 @@ def create_order(request):
 
 
 @api_view(["GET"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@query_budget(GET=2, shape="merchant with 3 restaurants")
+@replica_reads()
 def merchant_my_restaurants(request):
-
-    try:
-        profile = request.user.profile
-    except UserProfile.DoesNotExist:
-        return Response({"detail": "Profile not found."}, status=status.HTTP_400_BAD_REQUEST)
-
-    if profile.user_type != "owner":
-        return Response({"detail": "Not a merchant account."}, status=status.HTTP_403_FORBIDDEN)
-
-    qs = Restaurant.objects.filter(owner=request.user).order_by("id")
-    data = RestaurantSerializer(qs, many=True).data
-    return Response({"restaurants": data})
+    access = get_account_access(request)
+    qs = Restaurant.objects.filter(id__in=access.restaurant_ids).order_by("id")
+    return Response({"restaurants": RESTAURANT_LEAN.serialize(qs)})
 
 
 @api_view(["GET", "PUT"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@query_budget(GET=3, PUT=10, shape="item with tags in every dimension; PUT changes price and 2 tag dimensions")
+@replica_reads("GET")
 def merchant_item_detail(request, item_id):
-    user = request.user
-
-    try:
-        profile = user.profile
-    except UserProfile.DoesNotExist:
-        return Response({"detail": "Profile not found"}, status=status.HTTP_403_FORBIDDEN)
+    from .merchant_serializers import MerchantItemDetailSerializer
 
-    if profile.user_type not in ("merchant", "owner"):
-        return Response({"detail": "Only merchant users can edit items."},
-                        status=status.HTTP_403_FORBIDDEN)
+    access = get_account_access(request)
 
-   
     try:
-        item = (
-            Item.objects
-            .select_related("restaurant")
-            .prefetch_related(
-                "cuisines",
-                "proteins",
-                "meal_types",
-                "flavors",
-                "allergens",
-                "nutritions",
-            )
-            .get(
-                id=item_id,
-                restaurant__owner=user, 
-            )
+        item = Item.objects.get(
+            id=item_id,
+            restaurant_id__in=access.restaurant_ids,
         )
     except Item.DoesNotExist:
         return Response({"detail": "Item not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    # 六个维度的 tag 一条查询取齐，GET 直接用，PUT 时只覆盖改了的维度
+    set_item_tag_cache(item, load_item_tag_sets(item.pk))
+
     if request.method == "GET":
         ser = MerchantItemDetailSerializer(item)
         return Response(ser.data)
@@ -484,69 +495,122 @@ def merchant_item_detail(request, item_id):
     return Response(ser.data)
 
 
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def merchant_create_item(request, rest_id):
-    user = request.user
-
-    try:
-        profile = user.profile
-    except UserProfile.DoesNotExist:
-        return Response({"detail": "Profile not found"}, status=status.HTTP_403_FORBIDDEN)
-
-    if profile.user_type not in ("merchant", "owner"):
-        return Response(
-            {"detail": "Only merchant users can create items."},
-            status=status.HTTP_403_FORBIDDEN,
-        )
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@query_budget(GET=8, POST=15, shape="page of 10 items with tags; POST with tags in 2 dimensions")
+@replica_reads("GET")
+def merchant_restaurant_items(request, rest_id):
+    """
+    GET  /api/merchant/restaurants/<rest_id>/items/  带 tag 的菜单列表，keyset 分页
+         ?cursor=&limit=&active=&cuisines=1,2&...
+    POST 同一路径：新建 item
+    """
+    from .merchant_serializers import MerchantItemCreateSerializer, MerchantItemDetailSerializer
 
-    try:
-        restaurant = Restaurant.objects.get(id=rest_id, owner=user)
-    except Restaurant.DoesNotExist:
+    access = get_account_access(request)
+    if not access.owns(rest_id):
         return Response(
             {"detail": "Restaurant not found or not owned by you."},
             status=status.HTTP_404_NOT_FOUND,
         )
 
+    if request.method == "GET":
+        items, next_cursor = list_merchant_items(int(rest_id), request.query_params)
+        data = MerchantItemDetailSerializer(items, many=True).data
+        return Response({"items": data, "next_cursor": next_cursor})
+
+    # POST
     ser = MerchantItemCreateSerializer(data=request.data)
     if not ser.is_valid():
         return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    item = ser.save(restaurant=restaurant)
+    with transaction.atomic():
+        item = ser.save(restaurant_id=int(rest_id))
+        bump_menu_version(item.restaurant_id)
 
     
     out = MerchantItemDetailSerializer(item)
     return Response(out.data, status=status.HTTP_201_CREATED)
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def merchant_tags_overview(request):
-    
-    user = request.user
-    try:
-        profile = user.profile
-    except UserProfile.DoesNotExist:
-        return Response({"detail": "Profile not found"}, status=status.HTTP_403_FORBIDDEN)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@parser_classes(BULK_PARSER_CLASSES)
+@query_budget(POST=9, shape="20 rows, all existing names, 1 tag dimension")
+def merchant_bulk_import_items(request, rest_id):
+    """
+    POST /api/merchant/restaurants/<rest_id>/items:bulk
+    JSON（[{...}] 或 {"items": [...]}）或 CSV，按 name upsert，返回每行的结果。
+    ?dry_run=1 只校验不写入。
+    """
+    access = get_account_access(request)
+    if not access.owns(rest_id):
+        return Response(
+            {"detail": "Restaurant not found or not owned by you."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
 
-    if profile.user_type not in ("merchant", "owner"):
+    rows = extract_bulk_rows(request)
+    if len(rows) > BULK_IMPORT_MAX_ROWS:
         return Response(
-            {"detail": "Only merchant users can access tags."},
-            status=status.HTTP_403_FORBIDDEN,
+            {"detail": f"Too many rows ({len(rows)}), max is {BULK_IMPORT_MAX_ROWS}."},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    def qs_to_list(qs):
-        return [
-            {"id": t.id, "key": t.key, "label": t.label}
-            for t in qs.order_by("label")
-        ]
+    clean, report = validate_bulk_rows(rows)
+    dry_run = request.query_params.get("dry_run") in ("1", "true")
 
-    data = {
-        "cuisines": qs_to_list(CuisineTag.objects.all()),
-        "proteins": qs_to_list(ProteinTag.objects.all()),
-        "spiciness": qs_to_list(SpicinessTag.objects.all()),
-        "meal_types": qs_to_list(MealTypeTag.objects.all()),
-        "flavors": qs_to_list(FlavorTag.objects.all()),
-        "allergens": qs_to_list(AllergenTag.objects.all()),
-        "nutritions": qs_to_list(NutritionTag.objects.all()),
-    }
-    return Response(data)
+    results = {}
+    if clean and not dry_run:
+        results = upsert_items(int(rest_id), clean)
+
+    counts = {"created": 0, "updated": 0, "valid": 0, "error": 0}
+    for entry in report:
+        if entry["status"] == "error":
+            counts["error"] += 1
+        elif dry_run:
+            entry["status"] = "valid"
+            counts["valid"] += 1
+        else:
+            item_id, created = results[entry["name"]]
+            entry["id"] = item_id
+            entry["status"] = "created" if created else "updated"
+            counts[entry["status"]] += 1
+
+    code = status.HTTP_400_BAD_REQUEST if rows and not clean else status.HTTP_200_OK
+    return Response({"dry_run": dry_run, "counts": counts, "rows": report}, status=code)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@query_budget(POST=7, shape="add_tags in 2 dimensions to 10 items")
+def merchant_bulk_item_action(request, rest_id):
+    """
+    POST /api/merchant/restaurants/<rest_id>/items:batch
+    按条件批量上下架 / 改价 / 加删 tag，返回影响的行数。
+    """
+    from .merchant_serializers import MerchantItemBulkActionSerializer
+
+    access = get_account_access(request)
+    if not access.owns(rest_id):
+        return Response(
+            {"detail": "Restaurant not found or not owned by you."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    ser = MerchantItemBulkActionSerializer(data=request.data)
+    if not ser.is_valid():
+        return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    report = apply_bulk_action(int(rest_id), ser.validated_data)
+    return Response(report)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsMerchantUser])
+@query_budget(GET=1)
+@replica_reads()
+def merchant_tags_overview(request):
+    registry = get_tag_registry()
+    return cached_json_response(
+        f"tags:catalog:{registry.version}", build_tag_catalog, timeout=TAG_CATALOG_CACHE_TIMEOUT, name="tag_catalog"
+    )
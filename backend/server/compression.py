@@ -0,0 +1,187 @@
+# server/compression.py
+"""
+API 响应压缩：/api/ 下超过 COMPRESSION_MIN_BYTES 的 JSON / 文本响应，按请求的 Accept-Encoding
+（带 q 值协商，同样 q 值按 COMPRESSION_ENCODINGS 的顺序）压缩。gzip 总是可用，
+br 要装 brotli，zstd 要装 zstandard（或者 Python 3.14 的 compression.zstd），没装的自动跳过。
+
+缓存起来的大 payload（菜单、tag 目录）用 cached_json_response()：缓存里存渲染好的 JSON
+和各编码预压缩好的版本（压缩级别比在线压缩高），命中时中间件直接用预压缩的字节，不再每次压缩。
+
+    return cached_json_response(f"menu:items:{rest_id}:{version}", build, timeout=3600, name="menu")
+
+登录 / 刷新 token 的响应不压缩（响应里有 token，压缩后长度可能泄露内容，BREACH）。
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from health.metrics import CACHE_REQUESTS
+
+from .jsoncodec import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+try:
+    from compression import zstd as _zstd  # Python 3.14+
+
+    def _zstd_compress(data, level):
+        return _zstd.compress(data, level=level)
+except ImportError:
+    try:
+        import zstandard
+    except ImportError:  # 可选依赖
+        _zstd_compress = None
+    else:
+        def _zstd_compress(data, level):
+            return zstandard.ZstdCompressor(level=level).compress(data)
+
+PATH_PREFIXES = ("/api/",)
+EXCLUDED_PATHS = ("/api/auth/login/", "/api/auth/refresh/")
+COMPRESSIBLE_TYPES = re.compile(r"^(application/(json|javascript|xml)|text/)", re.I)
+
+# 在线压缩求快；预压缩只在缓存 miss 时做一次，级别可以高一些
+DYNAMIC_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+PRECOMPRESS_LEVELS = {"gzip": 9, "br": 9, "zstd": 12}
+
+
+def _compress_gzip(data, level):
+    # mtime=0：同样的输入得到同样的字节，缓存 / ETag 都稳定
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_br(data, level):
+    return brotli.compress(data, quality=level)
+
+
+CODECS = {"gzip": _compress_gzip}
+if brotli is not None:
+    CODECS["br"] = _compress_br
+if _zstd_compress is not None:
+    CODECS["zstd"] = _zstd_compress
+
+
+def available_encodings():
+    """
+    COMPRESSION_ENCODINGS 里装了对应库的那些，按偏好顺序。
+    """
+    wanted = getattr(settings, "COMPRESSION_ENCODINGS", ("br", "zstd", "gzip"))
+    return [enc for enc in wanted if enc in CODECS]
+
+
+def parse_accept_encoding(header):
+    """
+    "gzip, br;q=0.9, *;q=0" -> {"gzip": 1.0, "br": 0.9, "*": 0.0}
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = max(q, accepted.get(coding, 0.0))
+    return accepted
+
+
+def negotiate(header, encodings=None):
+    """
+    客户端接受（q > 0）的编码里 q 最高的；一样高时按我们的偏好顺序。都不接受返回 None。
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for enc in encodings if encodings is not None else available_encodings():
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(data, encoding, level=None):
+    return CODECS[encoding](data, DYNAMIC_LEVELS[encoding] if level is None else level)
+
+
+def precompress(body):
+    """
+    {encoding: bytes}，只留比原文小的；太小的 body 不压缩。
+    """
+    if len(body) < getattr(settings, "COMPRESSION_MIN_BYTES", 1024):
+        return {}
+    out = {}
+    for enc in available_encodings():
+        compressed = compress(body, enc, PRECOMPRESS_LEVELS[enc])
+        if len(compressed) < len(body):
+            out[enc] = compressed
+    return out
+
+
+def cached_json_response(key, build, timeout, name):
+    """
+    build() 返回要输出的数据，只在缓存 miss 时调用；渲染结果和 DRF 的 JSONRenderer 一致。
+    缓存条目是 (body, {encoding: 预压缩的 body})。
+    """
+    entry = cache.get(key)
+    CACHE_REQUESTS.inc(cache=name, result="miss" if entry is None else "hit")
+    if entry is None:
+        body = JSONRenderer().render(build())
+        entry = (body, precompress(body))
+        cache.set(key, entry, timeout=timeout)
+    body, encoded = entry
+    response = HttpResponse(body, content_type="application/json")
+    response.precompressed = encoded
+    return response
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        body = getattr(response, "precompressed", {}).get(encoding)
+        if body is None:
+            body = compress(response.content, encoding)
+            if len(body) >= len(response.content):
+                return response
+
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        # 和 GZipMiddleware 一样：压缩后的字节和原来不同，强 ETag 改成弱 ETag
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def should_compress(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return False
+        path = request.path
+        if not path.startswith(PATH_PREFIXES) or path.startswith(EXCLUDED_PATHS):
+            return False
+        if not COMPRESSIBLE_TYPES.match(response.get("Content-Type", "")):
+            return False
+        return len(response.content) >= getattr(settings, "COMPRESSION_MIN_BYTES", 1024)
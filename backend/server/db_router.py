@@ -0,0 +1,239 @@
+# server/db_router.py
+"""
+只读副本路由（配置了 REPLICA_DATABASES 时才挂进 DATABASE_ROUTERS / MIDDLEWARE）。
+
+哪些读走副本：
+- 用 @replica_reads 标过的 view（只在声明的 method 上，默认 GET / HEAD）里的所有读；
+- REPLICA_READ_MODELS 里列的 model（"restaurants.Tag" 这种 label），任何请求里的读。
+
+以下情况仍然读主库：
+- 请求里已经写过（db_for_write 被调用过），或者主库上开着事务（atomic 里先读后写）；
+- read-your-writes：一个 user 写过之后 REPLICA_PIN_SECONDS 秒内，他的请求都读主库
+  （pin 存在 cache 里，多 worker 时需要 REDIS_URL 才能跨进程生效）；
+- 所有副本都不健康。健康检查复用 /readyz 的 check_database，每个副本每
+  REPLICA_HEALTH_SECONDS 秒在请求里顺带查一次（同一时刻只有一个线程在查），
+  请求里出现数据库异常时立即重查一次。
+
+选副本：REPLICA_STRATEGY = "round_robin"（默认）或 "least_latency"（健康检查延迟的 EWMA 最小的），
+一个请求里的读固定在同一个副本上。
+
+    @api_view(["GET"])
+    @query_budget(GET=2)
+    @replica_reads()
+    def items_by_restaurant(request, rest_id): ...
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework_simplejwt.settings import api_settings
+
+from health.readiness import check_database
+
+# {"<module>.<qualname>": frozenset(methods)}
+REPLICA_READ_VIEWS = {}
+
+LATENCY_EWMA_ALPHA = 0.3
+
+_state = ContextVar("replica_routing", default=None)
+
+_health = {}          # {alias: {"ok", "latency_ms", "checked_at", "error"}}
+_health_lock = threading.Lock()
+_probing = threading.Lock()
+_round_robin = itertools.count()
+
+
+def replica_reads(*methods):
+    """
+    @replica_reads() / @replica_reads("POST")，和 query_budget 一样贴着函数放（拿原函数），
+    只登记，不包装 view。按 "<module>.<qualname>" 登记，不同 app 里同名的 view 不会混。
+    """
+    methods = frozenset(m.upper() for m in methods) or frozenset({"GET", "HEAD"})
+
+    def decorator(view):
+        REPLICA_READ_VIEWS[f"{view.__module__}.{view.__qualname__}"] = methods
+        return view
+
+    return decorator
+
+
+def view_key(view_func):
+    """
+    URLconf 里拿到的 view 对应的 REPLICA_READ_VIEWS key。
+    DRF 的函数 view：view_func 是 as_view() 的产物，cls 上的 __module__ / __name__ 是原函数的。
+    """
+    cls = getattr(view_func, "cls", None)
+    if cls is not None:
+        return f"{cls.__module__}.{cls.__name__}"
+    return f"{view_func.__module__}.{view_func.__qualname__}"
+
+
+def replica_aliases():
+    return getattr(settings, "REPLICA_DATABASES", [])
+
+
+def _pin_key(user_id):
+    return f"replica:pin:{user_id}"
+
+
+def _user_id_from_header(request):
+    """
+    只用来决定读哪个库，不校验签名（伪造 token 最多是让自己读主库）；
+    真正的认证还是在 DRF 里做。
+    """
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(auth[7:], options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    return payload.get(api_settings.USER_ID_CLAIM)
+
+
+class _RequestState:
+    def __init__(self, request):
+        self.request = request
+        self.replica_view = False
+        self.wrote = False
+        self._user_id = None
+        self._pinned = None
+        self.alias = None
+
+    @property
+    def user_id(self):
+        if self._user_id is None:
+            self._user_id = _user_id_from_header(self.request) or ""
+        return self._user_id
+
+    def pinned(self):
+        if self._pinned is None:
+            self._pinned = bool(self.user_id) and cache.get(_pin_key(self.user_id)) is not None
+        return self._pinned
+
+    def replica(self):
+        """
+        这个请求用的副本，没有健康的副本时返回 None。
+        """
+        if self.alias is None:
+            self.alias = pick_replica() or ""
+        return self.alias or None
+
+
+# ===== 健康检查 / 选副本 =====
+
+def replica_health():
+    with _health_lock:
+        return {alias: dict(h) for alias, h in _health.items()}
+
+
+def probe_replica(alias):
+    result = check_database(alias)
+    with _health_lock:
+        previous = _health.get(alias) or {}
+        latency = result.get("latency_ms")
+        if latency is not None and previous.get("latency_ms") is not None:
+            latency = LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * previous["latency_ms"]
+        _health[alias] = {
+            "ok": result["ok"],
+            "latency_ms": latency if latency is not None else previous.get("latency_ms"),
+            "checked_at": time.monotonic(),
+            "error": result.get("error"),
+        }
+    return result["ok"]
+
+
+def _refresh_health():
+    interval = getattr(settings, "REPLICA_HEALTH_SECONDS", 5.0)
+    now = time.monotonic()
+    stale = [
+        alias for alias in replica_aliases()
+        if alias not in _health or now - _health[alias]["checked_at"] >= interval
+    ]
+    # 别的线程在查就不等了，用上一次的结果（还没查过的副本先不用）
+    if not stale or not _probing.acquire(blocking=False):
+        return
+    try:
+        for alias in stale:
+            probe_replica(alias)
+    finally:
+        _probing.release()
+
+
+def pick_replica():
+    _refresh_health()
+    healthy = [alias for alias in replica_aliases() if _health.get(alias, {}).get("ok")]
+    if not healthy:
+        return None
+    if getattr(settings, "REPLICA_STRATEGY", "round_robin") == "least_latency":
+        return min(healthy, key=lambda alias: _health[alias]["latency_ms"] or 0.0)
+    return healthy[next(_round_robin) % len(healthy)]
+
+
+# ===== router / middleware =====
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote:
+            return None
+        # 关联对象跟着 instance 所在的库走（Django 的默认行为）
+        if hints.get("instance") is not None:
+            return None
+        if not (state.replica_view or model._meta.label in getattr(settings, "REPLICA_READ_MODELS", ())):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or state.pinned():
+            return None
+        return state.replica()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构从主库复制过来
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and state.user_id:
+            cache.set(_pin_key(state.user_id), 1, timeout=getattr(settings, "REPLICA_PIN_SECONDS", 10))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None:
+            return None
+        state.replica_view = request.method in REPLICA_READ_VIEWS.get(view_key(view_func), ())
+        return None
+
+    def process_exception(self, request, exception):
+        state = _state.get()
+        if state is not None and state.alias and isinstance(exception, DatabaseError):
+            probe_replica(state.alias)
+        return None
@@ -0,0 +1,107 @@
+# server/jsoncodec.py
+"""
+JSON 编解码：装了 orjson 就用 orjson，否则退回标准库 json，两边输出一致
+（紧凑格式、不转义非 ASCII、Decimal（转 float）/ datetime / lazy string 等和 DRF 的 JSONEncoder 同样处理）。
+
+    dumps(obj)      -> bytes
+    dumps_str(obj)  -> str（拼 prompt 用）
+    loads(data)     str / bytes 都行，出错（包括 NaN / Infinity）抛 json.JSONDecodeError（orjson 的错误是它的子类）
+
+REST_FRAMEWORK 里用这里的 JSONRenderer / JSONParser。要缩进（?format=json; indent=4、
+可浏览 API）或者改了 UNICODE_JSON / COMPACT_JSON 时交回 DRF 原来的实现。
+
+差异：orjson 不支持超过 64 位的整数，遇到时整条退回标准库；NaN / Infinity 会被 orjson
+写成 null（标准库按 STRICT_JSON 报错）。
+
+Decimal 故意仍然转成 float，不是精确输出（当初的需求是原生处理 Decimal，这里没有照做）：
+renderer 要和 DRF 的 JSONEncoder 逐字节一致，而 DRF 就是转 float；orjson 3.8 也没有
+原样写数字的办法（Fragment 是 3.9.15 才有的），写成字符串又会改掉字段类型。
+max_digits=8 的金额转 float 再写出来不会丢精度。
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+CODEC = "orjson" if orjson is not None else "json"
+
+# datetime 交给 default 处理，保证和 DRF 一样 UTC 写成 "Z"；int key 和标准库一样转成字符串
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Decimal 有意转 float（不是精确输出，见模块说明），和 DRF 的 JSONEncoder 逐字节一致。
+    # API 里的金额在 serializer 的 DecimalField 里就按 COERCE_DECIMAL_TO_STRING 转成字符串了，
+    # 走到这里的只有手拼的 dict（ai_order 的 prompt，原来就是 json.dumps(default=float)）
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _encoder.default(obj)
+
+
+def _dumps_json(obj):
+    return json.dumps(
+        obj, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode()
+
+
+def dumps(obj):
+    if orjson is None:
+        return _dumps_json(obj)
+    try:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # 超大整数、orjson 不认的类型等：标准库再试一次，还不行就照常抛 TypeError / ValueError
+        return _dumps_json(obj)
+
+
+def dumps_str(obj):
+    return dumps(obj).decode()
+
+
+def loads(data):
+    if orjson is None:
+        return json.loads(data, parse_constant=_strict_constant)
+    return orjson.loads(data)
+
+
+def _strict_constant(value):
+    # 和 orjson 一样不认 NaN / Infinity，也抛 JSONDecodeError（调用方只接这一种）
+    raise json.JSONDecodeError(f"Out of range float values are not JSON compliant: {value!r}", value, 0)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = dumps(data)
+        # 和 DRF 一样转义 U+2028 / U+2029（UTF-8 编码都以 e2 80 开头）
+        if b"\xe2\x80" in ret:
+            ret = ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+        return ret
+
+
+class JSONParser(parsers.JSONParser):
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,61 @@
+# server/middleware.py
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class AdminOnlyMiddleware:
+    """
+    API 模式（settings.API_ONLY_MIDDLEWARE）下代替 MIDDLEWARE 里的 session / CSRF / auth / messages：
+    它们只对 ADMIN_PATH_PREFIXES 下的请求生效，API（全走 JWT）请求直接跳过，
+    不读 session cookie、不做 CSRF 检查、不建 messages storage。
+
+    ADMIN_ONLY_MIDDLEWARE 里的中间件按原来的顺序串起来；process_view / process_exception /
+    process_template_response 也按 Django 自己的顺序转发，admin 的行为和全量中间件时一样。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = tuple(settings.ADMIN_PATH_PREFIXES)
+        self.instances = []
+        handler = get_response
+        for path in reversed(settings.ADMIN_ONLY_MIDDLEWARE):
+            instance = import_string(path)(handler)
+            self.instances.insert(0, instance)
+            handler = instance
+        self.admin_handler = handler
+
+    def applies(self, request):
+        return request.path_info.startswith(self.prefixes)
+
+    def __call__(self, request):
+        if self.applies(request):
+            return self.admin_handler(request)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.applies(request):
+            return None
+        for instance in self.instances:
+            if hasattr(instance, "process_view"):
+                response = instance.process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+        return None
+
+    def process_exception(self, request, exception):
+        if not self.applies(request):
+            return None
+        for instance in reversed(self.instances):
+            if hasattr(instance, "process_exception"):
+                response = instance.process_exception(request, exception)
+                if response is not None:
+                    return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.applies(request):
+            return response
+        for instance in reversed(self.instances):
+            if hasattr(instance, "process_template_response"):
+                response = instance.process_template_response(request, response)
+        return response
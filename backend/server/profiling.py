@@ -0,0 +1,173 @@
+# server/profiling.py
+"""
+请求级 profiling（默认关闭，PROFILING=true 时才挂进 MIDDLEWARE，关闭时零开销）。
+
+每个请求记录：总耗时、DB 耗时 / 条数、重复 SQL（同 sql 同参数执行多次）、
+相似 SQL（同 sql 不同参数，N+1）、LLM 调用耗时，写进 Server-Timing 响应头和一行 JSON 日志（logger "server.profiling"）。
+
+cProfile：按 PROFILING_SAMPLE_RATE 抽样，或者请求带
+`X-Profile: <PROFILING_TOKEN>` 时强制开启；结果 dump 到 PROFILING_DIR/*.prof，
+文件路径写在日志里，用 `python -m pstats <file>` 或 snakeviz 查看。
+
+代码里其它耗时段用 timed() 计入：
+
+    with timed("llm"):
+        completion = client.chat.completions.create(...)
+"""
+import cProfile
+import hmac
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("server.profiling")
+
+PROFILE_HEADER = "X-Profile"
+
+_current = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = Counter()
+        self.spans = {}
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[(sql, _freeze(params))] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self):
+        """
+        [(sql, 次数)]，同一条 sql + 同样参数执行了不止一次（通常是漏了缓存或 N+1）。
+        """
+        return [(sql, n) for (sql, _), n in self.queries.most_common() if n > 1]
+
+    def similar(self):
+        """
+        [(sql, 次数)]，同一条 sql 换着参数执行了不止一次（典型的 N+1）。
+        """
+        by_sql = Counter()
+        for (sql, _), n in self.queries.items():
+            by_sql[sql] += n
+        return [(sql, n) for sql, n in by_sql.most_common() if n > 1]
+
+
+def _freeze(params):
+    if params is None:
+        return None
+    try:
+        hash(params)
+        return params
+    except TypeError:
+        return repr(params)
+
+
+@contextmanager
+def timed(name):
+    """
+    把 with 块的耗时计到当前请求的 name 段上；没开 profiling 时只是一次 ContextVar.get。
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - started)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.token = getattr(settings, "PROFILING_TOKEN", "")
+        self.profile_dir = Path(getattr(settings, "PROFILING_DIR", "/tmp/ez-order-profiles"))
+
+    def wants_cprofile(self, request):
+        header = request.headers.get(PROFILE_HEADER)
+        # 比 bytes：header 里有非 ASCII 字符时 compare_digest(str, str) 会抛 TypeError
+        if header and self.token and hmac.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = cProfile.Profile() if self.wants_cprofile(request) else None
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # 每个 alias 都挂上（还没连上的也行，wrapper 在建 cursor 时才生效）
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(profile.record_query))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        wall = time.perf_counter() - started
+
+        response["Server-Timing"] = self.server_timing(profile, wall)
+
+        dump = self.dump(profiler, request) if profiler else None
+        duplicates = profile.duplicates()
+        similar = profile.similar()
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "wall_ms": round(wall * 1000, 2),
+            "db_ms": round(profile.db_time * 1000, 2),
+            "queries": profile.query_count,
+            "duplicate_queries": sum(n - 1 for _, n in duplicates),
+            "duplicates": [{"sql": sql[:300], "count": n} for sql, n in duplicates[:5]],
+            "similar_queries": sum(n - 1 for _, n in similar),
+            "similar": [{"sql": sql[:300], "count": n} for sql, n in similar[:5]],
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in profile.spans.items()},
+            "cprofile": dump,
+        }))
+        return response
+
+    def server_timing(self, profile, wall):
+        parts = [
+            f"total;dur={wall * 1000:.1f}",
+            f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries"',
+        ]
+        parts.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in profile.spans.items())
+        return ", ".join(parts)
+
+    def dump(self, profiler, request):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "_", request.path.strip("/")) or "root"
+        path = self.profile_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug[:80]}-{random.randrange(16**6):06x}.prof"
+        profiler.dump_stats(path)
+        return str(path)
+
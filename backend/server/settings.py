@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 import dj_database_url
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,9 +26,12 @@ INSTALLED_APPS = [
     "restaurants",
     "menus",
     "accounts",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
+    "health.middleware.MetricsMiddleware",
+    "server.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware", 
     "corsheaders.middleware.CorsMiddleware",
@@ -39,6 +43,23 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# API 模式（默认开）：API 全走 JWT，session / CSRF / auth / messages 中间件只给 /admin/ 用，
+# 见 server/middleware.py；设成 false 恢复所有请求都经过它们
+API_ONLY_MIDDLEWARE = os.getenv("API_ONLY_MIDDLEWARE", "true").lower() == "true"
+ADMIN_PATH_PREFIXES = ["/admin/"]
+ADMIN_ONLY_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+if API_ONLY_MIDDLEWARE:
+    _at = MIDDLEWARE.index(ADMIN_ONLY_MIDDLEWARE[0])
+    MIDDLEWARE = [m for m in MIDDLEWARE if m not in ADMIN_ONLY_MIDDLEWARE]
+    MIDDLEWARE.insert(_at, "server.middleware.AdminOnlyMiddleware")
+    # admin 的依赖检查只认直接写在 MIDDLEWARE 里的 session / auth / messages
+    SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -61,9 +82,31 @@ WSGI_APPLICATION = "server.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
+
+# SQLite 生产模式（边缘部署用 SQLite 时打开）：WAL、调过的 pragma、写事务 BEGIN IMMEDIATE，
+# 进程内写队列见 server/sqlite_backend
+SQLITE_PRODUCTION = os.getenv("SQLITE_PRODUCTION", "false").lower() == "true"
+if SQLITE_PRODUCTION:
+    DATABASES["default"].update(
+        ENGINE="server.sqlite_backend",
+        OPTIONS={
+            "init_command": ";".join([
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '20000'))}",
+                f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_MB', '256')) * 1024 * 1024}",
+                f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_MB', '64')) * 1024}",
+                "PRAGMA temp_store=MEMORY",
+            ]),
+            "transaction_mode": "IMMEDIATE",
+            # 同时是 sqlite3.connect 的 busy timeout 和写队列的最长等待（秒）
+            "timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "20000")) / 1000,
+            "write_queue": os.getenv("SQLITE_WRITE_QUEUE", "true").lower() == "true",
+        },
+    )
 if os.getenv("DATABASE_URL"):
     DATABASES["default"] = dj_database_url.parse(
         os.getenv("DATABASE_URL"),
@@ -71,6 +114,79 @@ if os.getenv("DATABASE_URL"):
         ssl_require=True
     )
 
+# 只读副本（server/db_router.py）：DATABASE_REPLICA_URLS 逗号分隔，别名 replica1、replica2…；
+# 本地用两个 SQLite 文件测试时设置 SQLITE_REPLICA_PATHS（用 manage.py sync_sqlite_replicas 从主库复制）
+REPLICA_DATABASES = []
+for n, url in enumerate(u for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u):
+    DATABASES[f"replica{n + 1}"] = dj_database_url.parse(url, conn_max_age=60, ssl_require=True)
+for n, path in enumerate((p for p in os.getenv("SQLITE_REPLICA_PATHS", "").split(",") if p), len(DATABASES)):
+    DATABASES[f"replica{n}"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": path}
+for alias in DATABASES:
+    if alias != "default":
+        DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+        REPLICA_DATABASES.append(alias)
+REPLICA_READ_MODELS = [m for m in os.getenv("REPLICA_READ_MODELS", "").split(",") if m]   # "restaurants.Tag" 这种 label
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin")                         # 或 least_latency
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", "10"))                     # 写过之后这么久内读主库
+REPLICA_HEALTH_SECONDS = float(os.getenv("REPLICA_HEALTH_SECONDS", "5"))
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ["server.db_router.ReplicaRouter"]
+    MIDDLEWARE.append("server.db_router.ReplicaRoutingMiddleware")
+
+# Cache：多 worker 部署时用 REDIS_URL 共享（需要 pip install redis），否则退回进程内 LocMem
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+
+# token_version（JWT 的 tv claim）在 cache 里存多少秒。LocMem 下改角色 / 停用账号后，别的 worker
+# 最多要这么久才拒绝旧 access token（Redis 下立即生效）；要求立即生效又没有 Redis 时设成 0（每个请求查库）
+TOKEN_VERSION_CACHE_SECONDS = float(os.getenv("TOKEN_VERSION_CACHE_SECONDS", "60"))
+
+# 请求 profiling（server/profiling.py）：默认关闭，打开时才挂进 MIDDLEWARE
+PROFILING_ENABLED = os.getenv("PROFILING", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))   # cProfile 抽样比例
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")                     # 请求头 X-Profile 等于它时强制 cProfile
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/ez-order-profiles")
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, "server.profiling.ProfilingMiddleware")
+
+# 响应压缩（server/compression.py）：/api/ 下超过阈值的响应按 Accept-Encoding 压缩，
+# br / zstd 要装 brotli / zstandard 才会启用，否则只有 gzip
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_ENCODINGS = [e for e in os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",") if e]   # 偏好顺序
+
+# gunicorn --preload：fork 前预加载 tag / 餐厅目录 / 菜单，worker 共享（restaurants/preload.py）
+PRELOAD_SHARED_CACHES = os.getenv("PRELOAD_SHARED_CACHES", "false").lower() == "true"
+
+# mmap 菜单快照（restaurants/snapshot.py），由 build_menu_snapshot 生成 / 后台重建；空 = 不用
+MENU_SNAPSHOT_PATH = os.getenv("MENU_SNAPSHOT_PATH", "")
+
+# /metrics（health/metrics.py）：多 worker 时每个进程写 METRICS_MULTIPROC_DIR 下自己的文件，启动前清空
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# /readyz（health/readiness.py）
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_DB_LATENCY_MS = float(os.getenv("READINESS_DB_LATENCY_MS", "500"))
+READINESS_DRAIN_FILE = os.getenv("READINESS_DRAIN_FILE", "")   # 文件存在时 /readyz 返回 503（下线前摘流量）
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "server.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -78,14 +194,29 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 # CORS
 CORS_ALLOWED_ORIGINS = [o for o in os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if o]
+# 前端用 ETag / If-None-Match 重新验证 profile（跨域时这两个 header 默认不放行）
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication",
+    ),
+    # 装了 orjson 时用它编解码，没装退回标准库（server/jsoncodec.py）
+    "DEFAULT_RENDERER_CLASSES": (
+        "server.jsoncodec.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "server.jsoncodec.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=12),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.ClaimsTokenRefreshSerializer",
 }
\ No newline at end of file
@@ -0,0 +1,136 @@
+# server/sqlite_backend/base.py
+"""
+SQLite 生产模式用的 backend（ENGINE = "server.sqlite_backend"），在 Django 自带的
+sqlite3 backend 上加一个进程内写队列：
+
+- atomic 块在 BEGIN（配合 OPTIONS["transaction_mode"] = "IMMEDIATE"）之前先排队，
+  commit / rollback 之后出队；
+- autocommit 下单条 INSERT / UPDATE / DELETE 也排队。
+
+同进程的多个线程不再同时抢 SQLite 的写锁（抢不到就按 busy_timeout 睡眠重试，
+高并发时容易超时报 "database is locked"），跨进程的竞争仍交给 busy_timeout。
+WAL 下读不需要锁，读请求不受写队列影响。
+
+OPTIONS["write_queue"] = False 时和自带 backend 行为一致。
+"""
+import threading
+
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.db.utils import OperationalError
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _gate_for(name):
+    """
+    同一个数据库文件一个队列（threading.Lock 排队，释放后由下一个等待的线程拿到）。
+    """
+    key = str(name)
+    with _gates_lock:
+        return _gates.setdefault(key, threading.Lock())
+
+
+def _is_write(query):
+    return query.lstrip()[:7].upper().startswith(WRITE_PREFIXES)
+
+
+class GatedCursorWrapper(sqlite3_base.SQLiteCursorWrapper):
+    db = None
+
+    def execute(self, query, params=None):
+        if self.db is not None and self.db.needs_statement_gate(query):
+            with self.db.write_gate():
+                return super().execute(query, params)
+        return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if self.db is not None and self.db.needs_statement_gate(query):
+            with self.db.write_gate():
+                return super().executemany(query, param_list)
+        return super().executemany(query, param_list)
+
+
+class _Held:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.acquire_write_gate()
+
+    def __exit__(self, *exc):
+        self.db.release_write_gate()
+
+
+class DatabaseWrapper(sqlite3_base.DatabaseWrapper):
+    _gate = None
+    _gate_held = False
+
+    def get_connection_params(self):
+        options = self.settings_dict["OPTIONS"]
+        self.write_queue = options.get("write_queue", True) and not self.is_in_memory_db()
+        # 排队最多等这么久（和 busy_timeout 同一个量级），超时按 SQLite 的锁超时报错
+        self.write_queue_timeout = options.get("timeout", 5)
+        self._gate = _gate_for(self.settings_dict["NAME"]) if self.write_queue else None
+        self._gate_held = False
+        return super().get_connection_params()
+
+    def get_new_connection(self, conn_params):
+        conn_params = {k: v for k, v in conn_params.items() if k != "write_queue"}
+        return super().get_new_connection(conn_params)
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=GatedCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    # ===== 写队列 =====
+
+    def acquire_write_gate(self):
+        if not self._gate.acquire(timeout=self.write_queue_timeout):
+            raise OperationalError("database is locked (write queue timeout)")
+        self._gate_held = True
+
+    def release_write_gate(self):
+        if self._gate_held:
+            self._gate_held = False
+            self._gate.release()
+
+    def write_gate(self):
+        return _Held(self)
+
+    def needs_statement_gate(self, query):
+        # atomic 块里已经在 BEGIN 时排过队了
+        return self._gate is not None and not self._gate_held and not self.in_atomic_block and _is_write(query)
+
+    def _start_transaction_under_autocommit(self):
+        if self._gate is not None and not self._gate_held:
+            self.acquire_write_gate()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.release_write_gate()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            if self._gate is not None:
+                self.release_write_gate()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            if self._gate is not None:
+                self.release_write_gate()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            if self._gate is not None:
+                self.release_write_gate()
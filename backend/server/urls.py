@@ -1,14 +1,16 @@
 from django.contrib import admin
 from django.urls import path
-from health.views import healthz
+from health.views import healthz, metrics, readyz
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from restaurants.views import resolve_restaurants, items_by_restaurant, ai_order, create_order, merchant_my_restaurants, merchant_item_detail, merchant_create_item, merchant_tags_overview
+from restaurants.views import resolve_restaurants, items_by_restaurant, ai_order, create_order, merchant_my_restaurants, merchant_item_detail, merchant_restaurant_items, merchant_bulk_import_items, merchant_bulk_item_action, merchant_tags_overview
 from accounts.views import register_customer, me, profile_detail, register_merchant
 
 urlpatterns = [
     # customer apis
     path("admin/", admin.site.urls),
     path("healthz", healthz),
+    path("readyz", readyz),
+    path("metrics", metrics),
     path("api/restaurants/resolve", resolve_restaurants),
     path("api/restaurants/<int:rest_id>/items", items_by_restaurant),
     path("api/restaurants/orders/", create_order, name="create_order"),
@@ -25,7 +27,9 @@ urlpatterns = [
 
     path("api/merchant/restaurants/my/", merchant_my_restaurants, name="merchant_my_restaurants"),
     path("api/merchant/items/<item_id>/", merchant_item_detail, name="merchant_item_detail"),
-    path("api/merchant/restaurants/<rest_id>/items/", merchant_create_item, name="merchant_create_item"),
+    path("api/merchant/restaurants/<rest_id>/items/", merchant_restaurant_items, name="merchant_restaurant_items"),
+    path("api/merchant/restaurants/<rest_id>/items:bulk", merchant_bulk_import_items, name="merchant_bulk_import_items"),
+    path("api/merchant/restaurants/<rest_id>/items:batch", merchant_bulk_item_action, name="merchant_bulk_item_action"),
     path("api/merchant/tags/", merchant_tags_overview, name="merchant_tags_overview")
 
 
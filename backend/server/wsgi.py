@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 application = get_wsgi_application()
+
+# gunicorn --preload 时这里在 master 里跑一次：fork 之前 load 好只读数据，worker 共享（restaurants/preload.py）
+if settings.PRELOAD_SHARED_CACHES:
+    from restaurants.preload import preload
+
+    preload()
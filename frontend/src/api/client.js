@@ -34,6 +34,8 @@ export async function apiAiOrder(restaurantIds) {
         const data = await resp.json().catch(() => ({}));
         throw new Error(data.detail || data.error || "AI order failed");
     }
+    // 下单会更新偏好分，bootstrap 里的 profile 过期了
+    resetBootstrap();
     return resp.json();
 }
 
@@ -75,15 +77,55 @@ export async function apiMe() {
     return r.json();
 }
 
+// 启动时一次拿齐 me + profile + tag 目录
+export async function apiBootstrap() {
+    const r = await fetch(`${BASE}/api/auth/me/?include=profile,tags`, {
+        headers: {
+            ...authHeaders(),
+        },
+    });
+    if (!r.ok) throw new Error("bootstrap failed");
+    return r.json();
+}
+
+// 各页面共用启动时那一份 bootstrap（按当前 token 缓存；登录 / 登出换了 token 会重新拿）
+let bootstrap = { token: null, promise: null };
+
+export function loadBootstrap() {
+    const token = localStorage.getItem("access");
+    if (!bootstrap.promise || bootstrap.token !== token) {
+        const promise = apiBootstrap().catch((err) => {
+            if (bootstrap.promise === promise) bootstrap = { token: null, promise: null };
+            throw err;
+        });
+        bootstrap = { token, promise };
+    }
+    return bootstrap.promise;
+}
+
+export function resetBootstrap() {
+    bootstrap = { token: null, promise: null };
+}
+
+// profile 按 ETag 重新验证：没变化时服务端返回 304，用上次拿到的那份
+let profileCache = { token: null, etag: null, data: null };
+
 export async function apiGetProfile() {
+    const token = localStorage.getItem("access");
+    const cached = profileCache.token === token ? profileCache : null;
     const r = await fetch(`${BASE}/api/auth/profile/`, {
+        // 自己带 If-None-Match，不让浏览器缓存插手，304 原样交给这里
+        cache: "no-store",
         headers: {
-            "Content-Type": "application/json",
             ...authHeaders(),
+            ...(cached?.etag ? { "If-None-Match": cached.etag } : {}),
         },
     });
-    if (!r.ok) throw new Error("profile get failed");
-    return r.json();
+    if (r.status === 304 && cached) return cached.data;
+    if (!r.ok) throw new Error("profile failed");
+    const data = await r.json();
+    profileCache = { token, etag: r.headers.get("ETag"), data };
+    return data;
 }
 
 export async function apiUpdateProfile(payload) {
@@ -96,7 +138,11 @@ export async function apiUpdateProfile(payload) {
         body: JSON.stringify(payload),
     });
     if (!r.ok) throw new Error("profile update failed");
-    return r.json();
+    // bootstrap 里的 profile 过期了；PUT 的响应带着新的 ETag，下次 GET 可以直接 304
+    resetBootstrap();
+    const data = await r.json();
+    profileCache = { token: localStorage.getItem("access"), etag: r.headers.get("ETag"), data };
+    return data;
 }
 
 export async function apiPlaceOrder(restaurantId, items) {
@@ -120,6 +166,8 @@ export async function apiPlaceOrder(restaurantId, items) {
         }
         throw new Error("order failed");
     }
+    // 下单会更新偏好分，bootstrap 里的 profile 过期了
+    resetBootstrap();
     return r.json();
 }
 
@@ -174,9 +222,24 @@ export async function apiMerchantUpdateItem(itemId, payload) {
 }
 
 
+// 商家菜单（带 tag），按 next_cursor 翻完所有页
 export async function apiMerchantRestaurantItems(restId) {
-    // 目前先直接复用客户端的 items 接口
-    return apiItems(restId);
+    const items = [];
+    let cursor = null;
+    do {
+        const qs = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+        const r = await fetch(`${BASE}/api/merchant/restaurants/${restId}/items/${qs}`, {
+            headers: {
+                "Content-Type": "application/json",
+                ...authHeaders(),
+            },
+        });
+        if (!r.ok) throw new Error("merchant items failed");
+        const d = await r.json();
+        items.push(...d.items);
+        cursor = d.next_cursor;
+    } while (cursor);
+    return { items };
 }
 
 export async function apiMerchantCreateItem(restId, payload) {
@@ -11,6 +11,7 @@ import MerchantAuth from "./pages/MerchantAuth.jsx";
 import MerchantDashboard from "./pages/MerchantDashboard.jsx";
 import MerchantMenu from "./pages/MerchantMenu.jsx";
 import MerchantItemEdit from "./pages/MerchantItemEdit.jsx";
+import { loadBootstrap } from "./api/client";
 
 if (!window.googleMapsScriptLoaded) {
   const apiKey = import.meta.env.VITE_GOOGLE_MAPS_API_KEY;
@@ -23,6 +24,11 @@ if (!window.googleMapsScriptLoaded) {
   window.googleMapsScriptLoaded = true;
 }
 
+// 已登录时启动就把 me + profile + tag 目录拿回来，页面里 loadBootstrap() 直接用这一份
+if (localStorage.getItem("access")) {
+  loadBootstrap().catch(() => {});
+}
+
 function AppRouter() {
   return (
     <BrowserRouter>
@@ -1,7 +1,7 @@
 // src/pages/Auth.jsx
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { apiLogin, apiRegisterCustomer, apiMe } from "../api/client";
+import { apiLogin, apiRegisterCustomer, loadBootstrap } from "../api/client";
 
 export default function Auth() {
     const navigate = useNavigate();
@@ -19,7 +19,7 @@ export default function Auth() {
             try {
                 const token = localStorage.getItem("access");
                 if (!token) return;
-                await apiMe();
+                await loadBootstrap();
                 navigate("/");
             } catch {
                 /* ignore */
@@ -45,8 +45,8 @@ export default function Auth() {
 
             await apiLogin(username, password);
 
-            // user data
-            await apiMe();
+            // user data（顺便把 profile / tag 目录拿好，进首页不用再请求）
+            await loadBootstrap();
 
             navigate("/");
         } catch (err) {
@@ -7,7 +7,7 @@ import {
     apiAiOrder,
     apiLogin,
     apiRegisterCustomer,
-    apiMe,
+    loadBootstrap,
     apiPlaceOrder,
 } from "../api/client";
 import logo from "../assets/ezlogo.png";
@@ -45,7 +45,7 @@ export default function Home() {
                 return;
             }
             try {
-                const me = await apiMe();
+                const me = await loadBootstrap();
                 setUser(me);
             } catch {
                 localStorage.removeItem("access");
@@ -326,7 +326,7 @@ export default function Home() {
             }
 
             await apiLogin(authUsername, authPassword);
-            const me = await apiMe();
+            const me = await loadBootstrap();
             if (me.user_type && me.user_type !== "customer") {
                 localStorage.removeItem("access");
                 localStorage.removeItem("refresh");
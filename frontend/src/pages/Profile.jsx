@@ -24,8 +24,9 @@ export default function Profile() {
     useEffect(() => {
         (async () => {
             try {
-                const d = await apiGetProfile();
-                setData(d);
+                // 不用启动时的 bootstrap（下单后偏好会变），带 ETag 重新验证，没变时只是一个 304
+                const profile = await apiGetProfile();
+                setData(profile);
                 // reset muted tags on load
                 setMuted({
                     cuisines: new Set(),